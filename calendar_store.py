@@ -0,0 +1,116 @@
+# calendar_store.py
+
+import datetime
+import json
+import os
+
+MAX_SPAN_DAYS = 62  # longest multi-day event we index under every day it covers
+
+
+def slim_event(e):
+    """Keep only what the dashboard needs from a Calendar API event."""
+    start = e['start'].get('dateTime', e['start'].get('date'))
+    end = e.get('end', {}).get('dateTime', e.get('end', {}).get('date', start))
+    return {
+        "id": e["id"],
+        "title": e.get("summary", "No Title"),
+        "start": start,
+        "end": end,
+        "all_day": 'date' in e['start'] and 'dateTime' not in e['start'],
+        "updated": e.get("updated"),
+    }
+
+
+def _event_dates(event):
+    start = datetime.date.fromisoformat(event["start"][:10])
+    end = datetime.date.fromisoformat(event["end"][:10])
+    if event["all_day"]:
+        end -= datetime.timedelta(days=1)  # all-day end dates are exclusive
+    days = max(0, min((end - start).days, MAX_SPAN_DAYS))
+    return [(start + datetime.timedelta(days=i)).isoformat() for i in range(days + 1)]
+
+
+class EventStore:
+    """Local copy of the calendar: events by id, a per-day index, and the sync token."""
+
+    def __init__(self, path):
+        self.path = path
+        self.sync_token = None
+        self.last_sync = None
+        self.events = {}
+        self.by_date = {}
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if "events" not in data:
+            return  # older list-shaped cache; the next sync rebuilds the store
+        self.sync_token = data.get("sync_token")
+        self.last_sync = data.get("last_sync")
+        self.events = data["events"]
+        self._reindex()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"sync_token": self.sync_token, "last_sync": self.last_sync, "events": self.events},
+                      f, separators=(",", ":"))
+        os.replace(tmp, self.path)
+
+    def clear(self):
+        self.sync_token = None
+        self.events = {}
+        self.by_date = {}
+
+    # === Updates ===
+    def apply(self, api_events):
+        """Upsert changed events and drop cancelled ones. Returns (upserted, removed)."""
+        upserted = removed = 0
+        for e in api_events:
+            event_id = e.get("id")
+            if not event_id:
+                continue
+            if e.get("status") == "cancelled":
+                old = self.events.pop(event_id, None)
+                if old is not None:
+                    self._unindex(event_id, old)
+                    removed += 1
+                continue
+            if "start" not in e:
+                continue
+            if event_id in self.events:
+                self._unindex(event_id, self.events[event_id])
+            self.events[event_id] = slim_event(e)
+            self._index(event_id)
+            upserted += 1
+        return upserted, removed
+
+    # === Date index ===
+    def _index(self, event_id):
+        for day in _event_dates(self.events[event_id]):
+            self.by_date.setdefault(day, []).append(event_id)
+
+    def _unindex(self, event_id, event):
+        for day in _event_dates(event):
+            ids = self.by_date.get(day, [])
+            if event_id in ids:
+                ids.remove(event_id)
+
+    def _reindex(self):
+        self.by_date = {}
+        for event_id in self.events:
+            self._index(event_id)
+
+    # === Reads ===
+    def on(self, date):
+        return [self.events[i] for i in self.by_date.get(date.isoformat(), [])]
+
+    def to_calendar_events(self, events=None):
+        """Events in the shape streamlit_calendar expects."""
+        events = self.events.values() if events is None else events
+        return [{"title": e["title"], "start": e["start"], "end": e["end"], "allDay": e["all_day"]}
+                for e in events]
@@ -3,73 +3,272 @@
 from __future__ import print_function
 import datetime
 import os.path
-import json
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from calendar_store import EventStore
+import perf_trace
 
 SCOPES = ['https://www.googleapis.com/auth/calendar']
-CACHE_FILE = "F:/OllamaModels/memory/calendar_cache.json"
+STORE_FILE = "F:/OllamaModels/memory/calendar_store.json"
+
+class AuthRequired(Exception):
+    """No usable token; CalendarClient.connect() has to run the interactive sign-in first."""
+
+
+class CalendarClient:
+    """Long-lived Calendar API client.
+
+    Builds the discovery service once, reuses its HTTP connection for every call,
+    refreshes the OAuth token with the refresh token (in the background, shortly
+    before it expires) instead of re-running the browser flow, and times each call.
+    Pass api_endpoint (and e.g. AnonymousCredentials) to point it at a fake server.
+    """
+
+    def __init__(self, token_path='token.json', credentials_path='credentials.json',
+                 api_endpoint=None, credentials=None, refresh_margin=300, background_refresh=True):
+        self.token_path = token_path
+        self.credentials_path = credentials_path
+        self.api_endpoint = api_endpoint
+        self.refresh_margin = refresh_margin
+        self.background_refresh = background_refresh
+        self.timings = {}
+        self._creds = credentials
+        self._service = None
+        self._timer = None
+        self._lock = threading.RLock()  # the underlying httplib2 connection is not thread-safe
+
+    # === Credentials ===
+    def _load_credentials(self, interactive=False):
+        # Google client libraries are slow to import, so load them on first use only.
+        from google.oauth2.credentials import Credentials
+        from google.auth.exceptions import RefreshError
+        from google.auth.transport.requests import Request
+
+        creds = None
+        if os.path.exists(self.token_path):
+            creds = Credentials.from_authorized_user_file(self.token_path, SCOPES)
+        if creds and not creds.valid and creds.expired and creds.refresh_token:
+            try:
+                creds.refresh(Request())
+                self._save_token(creds)
+            except RefreshError:
+                creds = None  # revoked or expired refresh token: only a new sign-in helps
+        if not creds or not creds.valid:
+            if not interactive:
+                raise AuthRequired("Google Calendar sign-in required (use Connect in the Calendar tab)")
+            from google_auth_oauthlib.flow import InstalledAppFlow
+
+            flow = InstalledAppFlow.from_client_secrets_file(
+                self.credentials_path, SCOPES
+            )
+            creds = flow.run_local_server(port=0)
+            self._save_token(creds)
+        return creds
+
+    def connect(self):
+        """Sign in, running the OAuth browser flow if the saved token can't be used.
+
+        Blocks until the user finishes in the browser, so call it from a UI action only;
+        everything else raises AuthRequired instead of opening the flow.
+        """
+        with self._lock:
+            self._creds = self._load_credentials(interactive=True)
+            self._service = None
+        return self.service
+
+    def _save_token(self, creds):
+        if hasattr(creds, "to_json"):
+            with open(self.token_path, 'w') as token:
+                token.write(creds.to_json())
+
+    def refresh(self):
+        """Refresh the access token now and schedule the next refresh."""
+        from google.auth.transport.requests import Request
+
+        with self._lock, self._auth_errors():
+            if getattr(self._creds, "refresh_token", None):
+                self._timed("auth.refresh", lambda: self._creds.refresh(Request()))
+                self._save_token(self._creds)
+        self._schedule_refresh()
+
+    @contextmanager
+    def _auth_errors(self):
+        # A revoked or expired refresh token surfaces as RefreshError from whichever call
+        # refreshes first (ours or the library's); only an interactive connect() fixes it.
+        from google.auth.exceptions import RefreshError
+
+        try:
+            yield
+        except RefreshError as e:
+            raise AuthRequired(f"Google Calendar sign-in expired (use Connect in the Calendar tab): {e}") from e
+
+    def _schedule_refresh(self):
+        expiry = getattr(self._creds, "expiry", None)
+        if not self.background_refresh or not expiry or not getattr(self._creds, "refresh_token", None):
+            return
+        delay = (expiry - datetime.datetime.utcnow()).total_seconds() - self.refresh_margin
+        if self._timer:
+            self._timer.cancel()
+        self._timer = threading.Timer(max(delay, 1), self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"Calendar token refresh failed: {e}")
+
+    # === Service ===
+    @property
+    def service(self):
+        with self._lock:
+            if self._service is None:
+                from googleapiclient.discovery import build
+
+                if self._creds is None:
+                    self._creds = self._load_credentials()
+                client_options = {"api_endpoint": self.api_endpoint} if self.api_endpoint else None
+                self._service = self._timed("build", lambda: build(
+                    'calendar', 'v3', credentials=self._creds, client_options=client_options,
+                    cache_discovery=False
+                ))
+                self._schedule_refresh()
+            return self._service
+
+    def execute(self, name, request):
+        """Run an API request under the connection lock, recording its latency under name."""
+        with self._lock, self._auth_errors():
+            return self._timed(name, request.execute)
+
+    def _timed(self, name, fn):
+        start = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            end = time.perf_counter()
+            self.timings.setdefault(name, deque(maxlen=200)).append(end - start)
+            perf_trace.record(f"calendar {name}", start, end, "calendar")
+
+    def timing_summary(self):
+        summary = {}
+        for name, samples in self.timings.items():
+            ordered = sorted(samples)
+            summary[name] = {
+                "calls": len(ordered),
+                "avg_ms": round(1000 * sum(ordered) / len(ordered), 1),
+                "p95_ms": round(1000 * ordered[int(0.95 * (len(ordered) - 1))], 1),
+                "last_ms": round(1000 * samples[-1], 1),
+            }
+        return summary
+
+    def close(self):
+        if self._timer:
+            self._timer.cancel()
+        with self._lock:
+            if self._service is not None and hasattr(self._service, "close"):
+                self._service.close()
+            self._service = None
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+def get_client():
+    """The process-wide CalendarClient used by the module-level helpers."""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = CalendarClient()
+        return _default_client
 
 def get_calendar_service():
-    creds = None
-    if os.path.exists('token.json'):
-        creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-    if not creds or not creds.valid:
-        flow = InstalledAppFlow.from_client_secrets_file(
-            'credentials.json', SCOPES
-        )
-        creds = flow.run_local_server(port=0)
-        with open('token.json', 'w') as token:
-            token.write(creds.to_json())
-    return build('calendar', 'v3', credentials=creds)
-
-def fetch_upcoming_events(n=10):
-    service = get_calendar_service()
+    return get_client().service
+
+def fetch_upcoming_events(n=10, client=None):
+    client = client or get_client()
     now = datetime.datetime.utcnow().isoformat() + 'Z'
-    events_result = service.events().list(
+    events_result = client.execute("events.list", client.service.events().list(
         calendarId='primary',
         timeMin=now,
         maxResults=n,
         singleEvents=True,
         orderBy='startTime'
-    ).execute()
+    ))
     return events_result.get('items', [])
 
-def fetch_all_events(days_past=30, days_future=90):
-    """Fetch events between now - N days and now + N days. Save to cache."""
-    service = get_calendar_service()
+def list_all_pages(client, **params):
+    """Run events.list across every page. Returns (items, next_sync_token)."""
+    items, page_token = [], None
+    while True:
+        result = client.execute("events.list", client.service.events().list(
+            calendarId='primary', pageToken=page_token, **params
+        ))
+        items.extend(result.get('items', []))
+        page_token = result.get('nextPageToken')
+        if not page_token:
+            return items, result.get('nextSyncToken')
+
+@perf_trace.traced("fetch_all_events", "calendar")
+def fetch_all_events(days_past=30, days_future=90, client=None):
+    """Fetch events between now - N days and now + N days, following every page."""
+    client = client or get_client()
     now = datetime.datetime.utcnow()
     time_min = (now - datetime.timedelta(days=days_past)).isoformat() + 'Z'
     time_max = (now + datetime.timedelta(days=days_future)).isoformat() + 'Z'
 
-    events_result = service.events().list(
-        calendarId='primary',
+    events, _ = list_all_pages(
+        client,
         timeMin=time_min,
         timeMax=time_max,
         singleEvents=True,
         orderBy='startTime'
-    ).execute()
-    events = events_result.get('items', [])
+    )
+    return events
 
-    # Save to cache
-    with open(CACHE_FILE, "w", encoding="utf-8") as f:
-        json.dump(events, f, indent=2)
+@perf_trace.traced("calendar sync", "calendar")
+def sync_events(store_path=STORE_FILE, days_past=30, client=None):
+    """Bring the local event store up to date.
 
-    return events
+    The first run does a full sync from now - days_past and keeps the nextSyncToken;
+    later runs send only that token and get back just the events changed since.
+    """
+    from googleapiclient.errors import HttpError
+
+    start = time.perf_counter()
+    store = EventStore(store_path)
+    client = client or get_client()
+    mode, items, token = "incremental", None, None
+    if store.sync_token:
+        try:
+            items, token = list_all_pages(client, syncToken=store.sync_token, singleEvents=True)
+        except HttpError as e:
+            if e.resp.status != 410:
+                raise
+            store.clear()  # 410 Gone: the sync token expired, start over
+
+    if items is None:
+        mode = "full"
+        time_min = (datetime.datetime.utcnow() - datetime.timedelta(days=days_past)).isoformat() + 'Z'
+        items, token = list_all_pages(client, timeMin=time_min, singleEvents=True)
+
+    upserted, removed = store.apply(items)
+    store.sync_token = token
+    store.last_sync = datetime.datetime.now().isoformat(timespec="seconds")
+    store.save()
+    return {"mode": mode, "received": len(items), "upserted": upserted, "removed": removed,
+            "total": len(store.events), "seconds": round(time.perf_counter() - start, 3)}
 
-def load_cached_events():
-    """Return events from local cache."""
-    if os.path.exists(CACHE_FILE):
-        with open(CACHE_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return []
+def load_event_store(store_path=STORE_FILE):
+    return EventStore(store_path)
 
-def add_event(summary, start_datetime, end_datetime):
-    service = get_calendar_service()
+def add_event(summary, start_datetime, end_datetime, client=None):
+    client = client or get_client()
     event = {
         'summary': summary,
         'start': {'dateTime': start_datetime.isoformat(), 'timeZone': 'America/Chicago'},
         'end': {'dateTime': end_datetime.isoformat(), 'timeZone': 'America/Chicago'},
     }
-    return service.events().insert(calendarId='primary', body=event).execute()
+    return client.execute("events.insert", client.service.events().insert(calendarId='primary', body=event))
@@ -0,0 +1,177 @@
+# chat_session.py
+
+# Prompt budget per model in tokens: context window minus room for the reply.
+# Kept below the models' full windows because prompt-processing time grows with it.
+MODEL_BUDGETS = {
+    "mistral": 3072,
+    "llama3": 6144,
+    "dolphin-mistral": 3072,
+    "phi3": 3072,
+    "openhermes": 3072,
+}
+DEFAULT_BUDGET = 2048
+CHARS_PER_TOKEN = 4  # rough average for English text with these tokenizers
+MESSAGE_OVERHEAD = 4  # role markers / template tokens per message
+SUMMARY_SHARE = 0.25  # the running summary never takes more than this share of the budget
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def message_tokens(message):
+    return estimate_tokens(message["content"]) + MESSAGE_OVERHEAD
+
+
+def budget_for(model):
+    return MODEL_BUDGETS.get(model.split(":")[0], DEFAULT_BUDGET)
+
+
+def extractive_summary(summary, dropped):
+    """Cheap fallback summary: keep the gist of each dropped user turn."""
+    lines = [summary] if summary else []
+    for m in dropped:
+        if m["role"] == "user":
+            first = m["content"].strip().splitlines()[0] if m["content"].strip() else ""
+            lines.append(f"- User asked: {first[:160]}")
+    return "\n".join(lines)
+
+
+class ChatSession:
+    """Multi-turn conversation with the persona as system message and a token budget.
+
+    When the history no longer fits, the oldest user/assistant pairs are dropped and
+    folded into a running summary that is appended to the system message. summarize is
+    an optional callable (summary, dropped_messages) -> str, e.g. an LLM call; without
+    it the summary lists the dropped user questions.
+    """
+
+    def __init__(self, system_prompt, model, budget=None, summarize=None):
+        self.system_prompt = system_prompt.strip()
+        self.model = model
+        self.budget = budget or budget_for(model)
+        self.summarize = summarize
+        self.history = []  # [{"role": "user" | "assistant", "content": str}]
+        self.summary = ""
+        self.dropped_turns = 0
+
+    def set_model(self, model, budget=None):
+        self.model = model
+        self.budget = budget or budget_for(model)
+
+    def add_user(self, text):
+        self.history.append({"role": "user", "content": text})
+
+    def add_assistant(self, text):
+        self.history.append({"role": "assistant", "content": text})
+
+    def reset(self):
+        self.history = []
+        self.summary = ""
+        self.dropped_turns = 0
+
+    # === Budget ===
+    def _system_message(self):
+        content = self.system_prompt
+        if self.summary:
+            content += f"\n\nSummary of the earlier conversation:\n{self.summary}"
+        return {"role": "system", "content": content}
+
+    def prompt_tokens(self, extra_messages=()):
+        messages = [self._system_message(), *extra_messages, *self.history]
+        return sum(message_tokens(m) for m in messages)
+
+    def fit(self, extra_messages=(), reserve=0):
+        """Drop (and summarize) the oldest turns until the prompt fits the budget.
+
+        Whole exchanges are dropped, so the history always starts with a user message,
+        and the latest exchange is kept even if it alone exceeds the budget. reserve
+        tokens of the budget are kept free for messages that are added afterwards.
+        """
+        budget = self.budget - reserve
+        if self.prompt_tokens(extra_messages) <= budget:
+            return []
+        # Drop down to the budget minus room for the summary that replaces the dropped turns.
+        summary_room = int(budget * SUMMARY_SHARE)
+        summary, self.summary = self.summary, ""
+        dropped = []
+        while self.prompt_tokens(extra_messages) > budget - summary_room:
+            next_user = next((i for i, m in enumerate(self.history) if i and m["role"] == "user"), None)
+            if next_user is None:
+                break
+            dropped.extend(self.history[:next_user])
+            del self.history[:next_user]
+        self.summary = summary
+        if dropped:
+            self.dropped_turns += sum(1 for m in dropped if m["role"] == "user")
+            summary = None
+            if self.summarize:
+                try:
+                    summary = self.summarize(self.summary, dropped)
+                except Exception:
+                    summary = None  # fall back to the extractive summary below
+            if not summary:
+                summary = extractive_summary(self.summary, dropped)
+            # Minus the summary heading; a budget this small has no room for a summary at all.
+            max_chars = max(0, (summary_room - 2 * MESSAGE_OVERHEAD) * CHARS_PER_TOKEN)
+            lines = summary.splitlines()
+            while len(lines) > 1 and sum(len(line) + 1 for line in lines) > max_chars:
+                lines.pop(0)  # forget the oldest points first
+            self.summary = "\n".join(lines)[-max_chars:] if max_chars else ""
+        return dropped
+
+    def messages(self, extra_messages=(), reserve=0):
+        """The Ollama messages list: system prompt (+ summary), the history, and the latest message.
+
+        extra_messages (e.g. retrieved memory) go right before the latest message, so the
+        system prompt and earlier turns stay an unchanged prefix from one turn to the next.
+        Pass reserve instead to fit the history first and add_context() the messages later.
+        """
+        self.fit(extra_messages, reserve)
+        return add_context([self._system_message(), *self.history], extra_messages)
+
+    def stats(self):
+        return {
+            "turns": sum(1 for m in self.history if m["role"] == "user"),
+            "dropped_turns": self.dropped_turns,
+            "prompt_tokens_est": self.prompt_tokens(),
+            "budget": self.budget,
+        }
+
+
+def add_context(messages, extra_messages):
+    """Splice extra_messages into a ChatSession.messages() list, right before the latest message."""
+    return [*messages[:-1], *extra_messages, *messages[-1:]]
+
+
+def memory_context_message(hits, max_tokens):
+    """Pack retrieved memory chunks, best first, into one system message of at most max_tokens.
+
+    Returns None when nothing fits.
+    """
+    header = "Relevant excerpts from the user's past conversations (use them only if they help):"
+    remaining = (max_tokens - MESSAGE_OVERHEAD - estimate_tokens(header)) * CHARS_PER_TOKEN
+    parts = []
+    for i, hit in enumerate(hits, start=1):
+        label = f"[{i}] ({hit['source']})\n"
+        room = remaining - len(label) - 2
+        if room < 200:  # a chunk cut shorter than this is more noise than context
+            break
+        text = hit["text"].strip()[:room]
+        parts.append(label + text)
+        remaining -= len(label) + len(text) + 2
+    if not parts:
+        return None
+    return {"role": "system", "content": header + "\n\n" + "\n\n".join(parts)}
+
+
+def llm_summarizer(ollama, model, max_tokens=200):
+    """summarize callable for ChatSession that asks the model itself for a short summary."""
+    def summarize(summary, dropped):
+        transcript = "\n".join(f"{m['role'].upper()}: {m['content']}" for m in dropped)
+        prompt = (f"Previous summary:\n{summary or '(none)'}\n\nNew conversation turns:\n{transcript}\n\n"
+                  "Update the summary in a few short bullet points. Keep names, decisions and open tasks.")
+        response = ollama.chat(model=model, messages=[{"role": "user", "content": prompt}],
+                               options={"num_predict": max_tokens})
+        return response["message"]["content"].strip()
+    return summarize
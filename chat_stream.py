@@ -0,0 +1,123 @@
+# chat_stream.py
+
+import json
+import time
+import datetime
+import ollama
+import perf_trace
+
+
+class ChatStream:
+    """Iterate over an Ollama chat reply token by token and record timing stats."""
+
+    def __init__(self, model, messages, **kwargs):
+        self.model = model
+        self.messages = messages
+        self.kwargs = kwargs
+        self.text = ""
+        self.done = False
+        self.cancelled = False
+        self.error = None
+        self.started_at = None
+        self.first_token_at = None
+        self.finished_at = None
+        self.eval_count = 0
+        self.eval_duration_ns = 0
+        self.prompt_eval_count = 0
+        self._chunks = None
+
+    def __iter__(self):
+        self.started_at = time.perf_counter()
+        try:
+            self._chunks = ollama.chat(model=self.model, messages=self.messages, stream=True, **self.kwargs)
+            for chunk in self._chunks:
+                token = chunk["message"]["content"]
+                if token and self.first_token_at is None:
+                    self.first_token_at = time.perf_counter()
+                self.text += token
+                if chunk.get("done"):
+                    self.done = True
+                    self.eval_count = chunk.get("eval_count") or 0
+                    self.eval_duration_ns = chunk.get("eval_duration") or 0
+                    self.prompt_eval_count = chunk.get("prompt_eval_count") or 0
+                if token:
+                    yield token
+        except Exception as e:
+            self.error = e
+            raise
+        finally:
+            self.close()
+            perf_trace.record("ollama.chat", self.started_at, self.finished_at, "ollama", model=self.model,
+                              tokens=self.eval_count, stream=True, cancelled=self.cancelled)
+
+    def close(self):
+        """Release the HTTP stream. Marks the reply cancelled if it never finished."""
+        if self.finished_at is None:
+            self.finished_at = time.perf_counter()
+        if not self.done and self.error is None:
+            self.cancelled = True
+        if self._chunks is not None and hasattr(self._chunks, "close"):
+            self._chunks.close()
+        self._chunks = None
+
+    # === Stats ===
+    @property
+    def time_to_first_token(self):
+        if self.started_at is None or self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started_at
+
+    @property
+    def tokens(self):
+        # Ollama only reports eval_count on the final chunk; fall back to a rough estimate.
+        if self.eval_count:
+            return self.eval_count
+        return max(1, len(self.text) // 4) if self.text else 0
+
+    @property
+    def tokens_per_sec(self):
+        if self.eval_count and self.eval_duration_ns:
+            return self.eval_count / (self.eval_duration_ns / 1e9)
+        if self.first_token_at is None or self.finished_at is None:
+            return None
+        elapsed = self.finished_at - self.first_token_at
+        return self.tokens / elapsed if elapsed > 0 else None
+
+    def stats(self):
+        return {
+            "model": self.model,
+            "ttft_s": round(self.time_to_first_token, 3) if self.time_to_first_token is not None else None,
+            "tokens": self.tokens,
+            "prompt_tokens": self.prompt_eval_count,
+            "tokens_per_sec": round(self.tokens_per_sec, 2) if self.tokens_per_sec else None,
+            "total_s": round(self.finished_at - self.started_at, 3) if self.finished_at and self.started_at else None,
+            "cancelled": self.cancelled,
+            "error": str(self.error) if self.error else None,
+        }
+
+
+def response_stats(model, response, total_s, error=None):
+    """ChatStream.stats()-shaped dict for a non-streaming ollama.chat response."""
+    response = response or {}
+    ns = 1e9
+    first_token = ((response.get("load_duration") or 0) + (response.get("prompt_eval_duration") or 0)) / ns
+    eval_s = (response.get("eval_duration") or 0) / ns
+    tokens = response.get("eval_count") or 0
+    return {
+        "model": model,
+        "ttft_s": round(first_token, 3) if first_token else None,
+        "tokens": tokens,
+        "prompt_tokens": response.get("prompt_eval_count") or 0,
+        "tokens_per_sec": round(tokens / eval_s, 2) if eval_s else None,
+        "total_s": total_s,
+        "cancelled": False,
+        "error": str(error) if error else None,
+    }
+
+
+def log_stream_stats(path, persona, stats):
+    """Append one reply's stats as a JSON line."""
+    record = {"time": datetime.datetime.now().isoformat(timespec="seconds"), "persona": persona, **stats}
+    with perf_trace.span("log write", "io", file="stream_stats"):
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
@@ -0,0 +1,184 @@
+# conversation_store.py
+
+import atexit
+import datetime
+import json
+import os
+import re
+import threading
+import time
+import uuid
+
+import perf_trace
+
+SCHEMA_VERSION = 1
+FLUSH_INTERVAL_S = 1.0
+FILE_RE = re.compile(r"^chat_(?P<date>\d{4}-\d{2}-\d{2})_(?P<seq>\d{3})\.jsonl$")
+
+
+def new_turn(persona, model, mood, user, assistant, session_id=None, **stats):
+    """Build one structured turn record. Extra keyword stats (latency_s, ttft_s, ...) are kept as-is."""
+    record = {
+        "v": SCHEMA_VERSION,
+        "id": uuid.uuid4().hex,
+        "ts": datetime.datetime.now().isoformat(timespec="seconds"),
+        "session_id": session_id,
+        "persona": persona,
+        "model": model,
+        "mood": mood,
+        "user": user,
+        "assistant": assistant,
+    }
+    record.update(stats)
+    return record
+
+
+def format_turn(record):
+    """Render a record the way the old .md logs looked."""
+    return f"USER: {record.get('user', '')}\nAI:\n{record.get('assistant', '')}\n"
+
+
+class ConversationLog:
+    """Append-only JSONL store of chat turns, one file per day, rotated by size.
+
+    Files are logs/conversations/chat_<date>_<seq>.jsonl. The current file stays open
+    and writes go through its buffer; it is flushed at most every flush_interval
+    seconds (a timer picks up whatever the last append left buffered), on rotation,
+    and at exit. flush_interval=0 flushes every append.
+    """
+
+    def __init__(self, directory, max_bytes=5 * 1024 * 1024, flush_interval=FLUSH_INTERVAL_S):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self._file = None
+        self._path = None
+        self._date = None
+        self._last_flush = 0.0
+        self._timer = None
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        atexit.register(self.close)
+
+    def _target_path(self, today):
+        seqs = [int(m["seq"]) for m in map(FILE_RE.match, os.listdir(self.directory))
+                if m and m["date"] == today]
+        seq = max(seqs, default=0)
+        path = os.path.join(self.directory, f"chat_{today}_{seq:03d}.jsonl")
+        if os.path.exists(path) and os.path.getsize(path) >= self.max_bytes:
+            path = os.path.join(self.directory, f"chat_{today}_{seq + 1:03d}.jsonl")
+        return path
+
+    def _open_for_append(self):
+        today = datetime.date.today().isoformat()
+        needs_rotation = self._file is not None and self._file.tell() >= self.max_bytes
+        if self._file is None or self._date != today or needs_rotation:
+            self._close_file()
+            self._path = self._target_path(today)
+            self._file = open(self._path, "a", encoding="utf-8", buffering=64 * 1024)
+            self._date = today
+
+    def append(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock, perf_trace.span("log write", "io", file="conversations"):
+            self._open_for_append()
+            self._file.write(line)
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                self._file.flush()
+                self._last_flush = time.monotonic()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        return record
+
+    def flush(self):
+        with self._lock:
+            self._timer = None
+            if self._file:
+                self._file.flush()
+                self._last_flush = time.monotonic()
+
+    def _close_file(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            self._close_file()
+
+
+# === Readers ===
+def conversation_files(directory):
+    """Conversation files in chronological order."""
+    if not os.path.isdir(directory):
+        return []
+    names = sorted(n for n in os.listdir(directory) if FILE_RE.match(n))
+    return [os.path.join(directory, n) for n in names]
+
+
+def iter_records(path, start=0):
+    """Yield (offset, length, record) for each complete line from byte offset start."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        offset = start
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                return  # a writer is mid-line; pick it up next time
+            try:
+                record = json.loads(raw)
+            except ValueError:
+                record = None
+            if record is not None:
+                yield offset, len(raw), record
+            offset += len(raw)
+
+
+# === Converter for the old USER:/AI: markdown logs ===
+MD_NAME_RE = re.compile(r"^(?P<persona>.+)_(?P<date>\d{4}-\d{2}-\d{2})\.md$")
+MD_TURN_RE = re.compile(r"(?ms)^USER: (?P<user>.*?)\nAI:\n(?P<assistant>.*?)(?=^USER: |\Z)")
+
+
+def convert_markdown_logs(log_dir, store, archive_dir=None):
+    """Append every turn of logs/<persona>_<date>.md into store. Returns (files, turns).
+
+    Converted files are moved into archive_dir when given, so they aren't indexed twice.
+    """
+    files = turns = 0
+    if archive_dir:
+        os.makedirs(archive_dir, exist_ok=True)
+    for name in sorted(os.listdir(log_dir)):
+        match = MD_NAME_RE.match(name)
+        if not match:
+            continue
+        path = os.path.join(log_dir, name)
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        for turn in MD_TURN_RE.finditer(text):
+            record = new_turn(match["persona"], None, None, turn["user"].strip(), turn["assistant"].strip(),
+                              source="md-import")
+            record["ts"] = f"{match['date']}T00:00:00"
+            store.append(record)
+            turns += 1
+        files += 1
+        if archive_dir:
+            os.replace(path, os.path.join(archive_dir, name))
+    store.flush()
+    return files, turns
+
+
+# === Process-wide store ===
+_logs = {}
+_logs_lock = threading.Lock()
+
+
+def get_conversation_log(directory, **kwargs):
+    key = os.path.abspath(str(directory))
+    with _logs_lock:
+        if key not in _logs:
+            _logs[key] = ConversationLog(directory, **kwargs)
+        return _logs[key]
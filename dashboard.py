@@ -1,63 +1,219 @@
+import time
+_script_start = time.perf_counter()
+
 import streamlit as st
 from pathlib import Path
 import datetime
-import chromadb
-from llama_index.core import VectorStoreIndex, StorageContext, load_index_from_storage
-from llama_index.vector_stores.chroma import ChromaVectorStore
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
-from llama_index.core.settings import Settings
-from streamlit_calendar import calendar
-from calendar_utils import fetch_upcoming_events, add_event
-from notion_tasks import fetch_notion_tasks, mark_task_complete
+import json
+import uuid
+import startup_profiler
+import perf_trace
+from startup_profiler import lazy_import, timed
+from memory_engine import get_memory_engine, synthesize_answer
+from model_manager import get_model_manager
+from response_cache import get_response_cache
+from model_router import get_model_router
+from chat_session import estimate_tokens
+from job_scheduler import get_scheduler, SkipRun
+from persona_registry import get_persona_registry, prefix_cache_stats
+import os
+import subprocess
+import sys
 
 # === CONFIGURATION ===
 persona_dir = Path("F:/Important Projects/Local Ai Dashboard/prompts/personas")
 plans_path = Path("F:/Important Projects/Local Ai Dashboard/plans.md")
 log_dir = Path("F:/Important Projects/Local Ai Dashboard/logs")
 persist_dir = "F:/Important Projects/Local Ai Dashboard/memory/vectorstore/"
+notion_mirror_path = Path("F:/Important Projects/Local Ai Dashboard/memory/notion_tasks.sqlite")
+calendar_store_path = Path("F:/Important Projects/Local Ai Dashboard/memory/calendar_store.json")
+response_cache_path = Path("F:/Important Projects/Local Ai Dashboard/memory/response_cache.sqlite")
+scheduler_state_path = Path("F:/Important Projects/Local Ai Dashboard/memory/scheduler_state.json")
+chatgpt_extract_dir = Path("F:/Important Projects/Local Ai Dashboard/memory/chatgpt-extracted")
+trace_dir = Path("F:/Important Projects/Local Ai Dashboard/memory/traces")  # not logs/: that is chat JSON only
 log_dir.mkdir(parents=True, exist_ok=True)
+response_cache_path.parent.mkdir(parents=True, exist_ok=True)
+stream_stats_path = log_dir / "stream_stats.jsonl"
+
+# "lazy": only the selected section runs, so each tab's imports and clients are created
+# the first time it is opened. "tabs": classic st.tabs layout where every tab runs on every rerun.
+STARTUP_MODE = "lazy"
+WARM_MEMORY_ON_STARTUP = True
+
+# Chat + memory: retrieved chunks may use this share of the model's prompt budget, and the
+# chat never waits longer than RAG_TIMEOUT_S for them.
+RAG_SHARE = 0.3
+RAG_TIMEOUT_S = 2.0
+
+# === SHARED MEMORY ENGINE (loads once per process, warms up in the background) ===
+# The engine also sets Settings.llm = None so llama_index never falls back to OpenAI.
+memory_engine = get_memory_engine(persist_dir)
+
+# === LOAD PERSONAS (once per process; edited files are reloaded on the next rerun) ===
+with timed("personas"):
+    persona_registry = get_persona_registry(persona_dir)
+    persona_registry.refresh()
+
+# === SIDEBAR ===
+st.sidebar.title("\U0001f9e0 Rogue AI Copilot")
+engine_icons = {"cold": "\u26aa", "warming": "\U0001f7e1", "ready": "\U0001f7e2", "error": "\U0001f534"}
+st.sidebar.caption(f"{engine_icons.get(memory_engine.state, '')} Memory engine: {memory_engine.state}")
+persona_choice = st.sidebar.selectbox("Choose Persona", persona_registry.names())
+persona = persona_registry.get(persona_choice)
+for error in persona_registry.errors.values():
+    st.sidebar.warning(f"Persona metadata ignored: {error}")
+model_options = ["auto", "mistral", "llama3", "dolphin-mistral", "phi3", "openhermes"]
+# The default follows the persona's sidecar metadata, if it names a model.
+model_setting = st.sidebar.selectbox("Base Model", model_options,
+                                     index=model_options.index(persona.model) if persona.model in model_options else 0)
+
+# === MODEL MANAGER (prewarms the selected model, evicts LRU models when RAM is tight) ===
+model_manager = get_model_manager()
+try:
+    resident = model_manager.resident()
+    resident_error = None
+except Exception as e:
+    resident, resident_error = [], e
+
+# === MODEL ROUTER (live per-model stats; picks a model per request in "auto") ===
+model_router = get_model_router(stream_stats_path)
+
+
+def route_auto(latency_target, resident_names, persona_tokens):
+    """Submit callback in "auto": route the message being sent before the rerun that sends it."""
+    session = st.session_state.get("chat_session")
+    expected_prompt_tokens = estimate_tokens(st.session_state.get("chat_input", "")) + (
+        session.prompt_tokens() if session else persona_tokens)
+    st.session_state.auto_route = model_router.choose(expected_prompt_tokens, latency_target, resident=resident_names)
+
+
+submit_routing = {}
+if model_setting == "auto":
+    latency_target = st.sidebar.slider("Latency target (s)", 2, 60, 20)
+    resident_names = {m["name"].split(":")[0] for m in resident}
+    # Only a submitted message is routed; reruns in between (typing, widget changes) keep
+    # the last route so the selected model isn't swapped and prewarmed along the way.
+    if "auto_route" not in st.session_state:
+        st.session_state.auto_route = model_router.choose(
+            estimate_tokens(persona.prompt), latency_target, resident=resident_names)
+    submit_routing = dict(on_click=route_auto, args=(latency_target, resident_names, estimate_tokens(persona.prompt)))
+    model_choice, estimated_s, route_reason = st.session_state.auto_route
+    st.sidebar.caption(f"\U0001f916 auto \u2192 `{model_choice}` (~{estimated_s:.0f}s, {route_reason})")
+else:
+    model_choice = model_setting
+
+model_manager.select(model_choice)
+st.sidebar.caption(f"`{model_choice}`: {model_manager.status(model_choice)}")
+st.sidebar.markdown(f"\U0001f4a1 {model_router.describe(model_choice)}")
+with st.sidebar.expander("\U0001f4ca Model stats"):
+    for name in model_router.models:
+        st.markdown(f"- **{name}**: {model_router.describe(name)}")
+with st.sidebar.expander("\U0001f4be Resident models"):
+    if resident_error:
+        st.caption(f"Ollama not reachable: {resident_error}")
+    for m in resident:
+        gpu_share = f", {m['size_vram'] / m['size']:.0%} on GPU" if m["size"] and m["size_vram"] else ""
+        st.markdown(f"- `{m['name']}` {m['size'] / 1024 ** 3:.1f} GB{gpu_share}")
+    if not resident:
+        st.caption("No models loaded.")
+
+xp = st.sidebar.slider("Daily XP", 0, 100, 50)
+mood = st.sidebar.selectbox("Mood", ["Focused", "Burnt Out", "Creative", "Lazy Genius", "Shadow Mode"])
+stream_mode = st.sidebar.toggle("Stream tokens", value=True)
+rag_mode = st.sidebar.toggle("Use memory in chat", value=False,
+                             help="Retrieve matching chunks from the memory index and add them to the prompt.")
+rag_k = st.sidebar.slider("Memory chunks", 1, 8, 4, disabled=not rag_mode)
+bypass_cache = st.sidebar.toggle("Bypass response cache", value=False,
+                                 help="Always generate a fresh reply for the next request.")
+response_cache = get_response_cache(response_cache_path)
+hit_rate = response_cache.hit_rate
+st.sidebar.caption(f"\u26a1 Response cache: {response_cache.count()} entries | hit rate "
+                   f"{'n/a' if hit_rate is None else f'{hit_rate:.0%}'} "
+                   f"({response_cache.stats['hits']} exact, {response_cache.stats['similar_hits']} similar)")
+prefix_hit_rate = prefix_cache_stats.hit_rate
+st.sidebar.caption(f"\u267b Persona prefix cache: "
+                   f"{'n/a' if prefix_hit_rate is None else f'{prefix_hit_rate:.0%}'} of replies reused it "
+                   f"(~{prefix_cache_stats.counts['tokens_saved']} prompt tokens skipped)")
+summarize_history = st.sidebar.toggle("Summarize old turns", value=False,
+                                      help="Ask the model to summarize turns that no longer fit the context "
+                                           "budget instead of just listing them.")
+notion_refresh_minutes = st.sidebar.number_input("Notion refresh (min)", min_value=1, max_value=240, value=5)
+
+if plans_path.exists():
+    st.sidebar.markdown("### \U0001f4cb Life Plans")
+    st.sidebar.text(plans_path.read_text(encoding='utf-8')[:1000])
+
+
+# === BACKGROUND SYNC JOBS ===
+# Calendar, Notion and the memory ingest run on a small worker pool; the tabs only
+# ever read the local stores these jobs keep up to date.
+CALENDAR_SYNC_MINUTES = 15
+INGEST_MINUTES = 60  # incremental: each run only embeds what changed since the last one
+
+
+def sync_calendar_job():
+    calendar_utils = lazy_import("calendar_utils", "google calendar")
+    if not os.path.exists(calendar_utils.get_client().token_path):
+        raise SkipRun("Google Calendar not connected yet (use Connect in the Calendar tab)")
+    try:
+        return calendar_utils.sync_events(store_path=str(calendar_store_path))
+    except calendar_utils.AuthRequired as e:
+        raise SkipRun(str(e))  # never open the browser sign-in from a worker thread
+
+
+def sync_notion_job():
+    if not lazy_import("notion_tasks", "notion").ENV_PATH.exists():
+        raise SkipRun("Notion not configured yet (add notion.env with NOTION_TOKEN and NOTION_DATABASE_ID)")
+    get_mirror = lazy_import("notion_mirror", "notion").get_mirror
+    return get_mirror(str(notion_mirror_path)).sync()
+
+
+def ingest_memory_job():
+    # A separate process keeps the ingest embedding workers out of the dashboard's memory.
+    # It writes to the memory engine's own collection, which reloads when the store changes.
+    script = Path(__file__).parent / "scripts" / "ingest_memory.py"
+    proc = subprocess.run([sys.executable, str(script), "--persist-dir", persist_dir,
+                           "--logs-dir", str(log_dir), "--chatgpt-dir", str(chatgpt_extract_dir),
+                           "--plans", str(plans_path), "--notion-db", str(notion_mirror_path),
+                           "--calendar-store", str(calendar_store_path)],
+                          capture_output=True, text=True, encoding="utf-8", errors="replace")
+    output = (proc.stdout + proc.stderr).strip().splitlines()[-3:]
+    if proc.returncode == lazy_import("ingest_pipeline", "memory ingest").REBUILD_REQUIRED_EXIT:
+        raise SkipRun(output[-1] if output else "memory store needs a one-time --full ingest")
+    if proc.returncode:
+        raise RuntimeError(" | ".join(output) or f"exit code {proc.returncode}")
+    return {"output": output}
+
+
+scheduler = get_scheduler(scheduler_state_path)
+scheduler.add("calendar", sync_calendar_job, CALENDAR_SYNC_MINUTES * 60)
+scheduler.add("notion", sync_notion_job, notion_refresh_minutes * 60)
+scheduler.add("ingest", ingest_memory_job, INGEST_MINUTES * 60, run_on_start=False)
+scheduler.start()
+
+job_icons = {"ok": "\u2705", "error": "\u274c", "running": "\u23f3", "skipped": "\u23f8"}
+with st.sidebar.expander("\U0001f501 Background jobs"):
+    for job in scheduler.status():
+        duration = f" in {job['duration_s']}s" if job["duration_s"] is not None else ""
+        icon = job_icons.get(job["status"], "\u26aa")
+        col_job, col_run = st.columns([0.75, 0.25])
+        col_job.markdown(f"{icon} **{job['job']}** {job['status']}{duration}")
+        col_job.caption(f"last {job['last_finished'] or 'never'} | next in {job['next_in_s']}s"
+                        + (f" | {job['error']}" if job["error"] else ""))
+        col_run.button("\u25b6", key=f"run_job_{job['job']}", on_click=scheduler.run_now, args=(job["job"],),
+                       disabled=job["status"] == "running", help=f"Run {job['job']} now")
 
-# === ENSURE NO DEFAULT OPENAI USAGE ===
-Settings.llm = None
-
-# === LOAD PERSONAS ===
-personas = {
-    f.stem: f.read_text(encoding='utf-8')
-    for f in persona_dir.glob("*.txt")
-}
-
-# === STREAMLIT TABS ===
-tab1, tab2, tab3, tab4 = st.tabs(["\U0001f9e0 Chat", "\U0001f9e0 Memory Search", "\U0001f4c5 Calendar", "\U0001f4cb Notion Tasks"])
 
 # === TAB 1: Persona Chat UI ===
-with tab1:
-    import ollama
-
-    st.sidebar.title("\U0001f9e0 Rogue AI Copilot")
-    persona_choice = st.sidebar.selectbox("Choose Persona", sorted(personas.keys()))
-    model_choice = st.sidebar.selectbox("Base Model", ["mistral", "llama3", "dolphin-mistral", "phi3", "openhermes"])
-
-    # Model Descriptions
-    model_descriptions = {
-        "llama3": "Best for logic-heavy chats and code.",
-        "mistral": "General-purpose fast model.",
-        "dolphin-mistral": "Fine-tuned for instruction following.",
-        "phi3": "Small + fast with solid reasoning.",
-        "openhermes": "Balanced mix of speed and creativity."
-    }
-    selected_description = model_descriptions.get(model_choice, "No description available.")
-    st.sidebar.markdown(f"\U0001f4a1 {selected_description}")
-
-    xp = st.sidebar.slider("Daily XP", 0, 100, 50)
-    mood = st.sidebar.selectbox("Mood", ["Focused", "Burnt Out", "Creative", "Lazy Genius", "Shadow Mode"])
-
-    if plans_path.exists():
-        st.sidebar.markdown("### \U0001f4cb Life Plans")
-        st.sidebar.text(plans_path.read_text(encoding='utf-8')[:1000])
+def render_chat():
+    ollama = lazy_import("ollama")
+    chat_stream = lazy_import("chat_stream", "ollama")
+    ChatStream, log_stream_stats = chat_stream.ChatStream, chat_stream.log_stream_stats
+    response_stats = chat_stream.response_stats
 
     st.title(f"\U0001f4ac {persona_choice} Mode")
     st.markdown(f"**Model:** `{model_choice}` | **Mood:** *{mood}*")
-    initial_prompt = personas[persona_choice]
+    initial_prompt = persona.prompt
 
     st.markdown("### \U0001f9e0 Persona Prompt")
     st.code(initial_prompt.strip(), language="markdown")
@@ -74,94 +230,295 @@ with tab1:
         icon = "\U0001f525" if xp > 60 else "\U0001f4a1"
         st.markdown(f"- {task} {icon}")
 
-    user_input = st.text_area("You:", "", height=100)
-
-    if st.button("Submit"):
-        st.markdown("### \U0001f916 Prompt Sent to AI")
-        full_prompt = f"{initial_prompt.strip()}\n\nUser: {user_input.strip()}\nAI:"
-
-        with st.spinner("Sending prompt to model..."):
-            try:
-                response = ollama.chat(
-                    model=model_choice,
-                    messages=[{"role": "user", "content": full_prompt}]
-                )
-                ai_reply = response['message']['content']
-            except Exception as e:
-                ai_reply = f"Error: {e}"
+    # === Multi-turn session (persona as system message, per-model token budget) ===
+    # The persona text is always the first, unchanged part of the prompt, so Ollama can
+    # reuse its KV-cache for it from one request to the next.
+    chat_session = lazy_import("chat_session")
+    session = st.session_state.get("chat_session")
+    if session is None or st.session_state.get("chat_persona") != persona_choice:
+        session = chat_session.ChatSession(initial_prompt, model_choice, budget=persona.budget)
+        st.session_state.chat_session = session
+        st.session_state.chat_persona = persona_choice
+        st.session_state.session_id = uuid.uuid4().hex
+    elif session.system_prompt != initial_prompt:
+        session.system_prompt = initial_prompt  # the persona file was edited; keep the conversation
+    session.set_model(model_choice, budget=persona.budget)
+    session.summarize = chat_session.llm_summarizer(ollama, model_choice) if summarize_history else None
+
+    st.markdown("### \U0001f5e8 Conversation")
+    for message in session.history:
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
+    session_stats = session.stats()
+    st.caption(f"{session_stats['turns']} turns in context | ~{session_stats['prompt_tokens_est']}/"
+               f"{session_stats['budget']} tokens | {session_stats['dropped_turns']} older turns summarized")
+    if st.button("\U0001f195 New conversation"):
+        session.reset()
+        st.session_state.session_id = uuid.uuid4().hex
+        st.rerun()
+
+    user_input = st.text_area("You:", "", height=100, key="chat_input")
+
+    conversation_store = lazy_import("conversation_store")
+    conversation_log = conversation_store.get_conversation_log(log_dir / "conversations")
+    session_id = st.session_state.setdefault("session_id", uuid.uuid4().hex)
+
+    def save_reply(reply, **stats):
+        conversation_log.append(conversation_store.new_turn(
+            persona_choice, model_choice, mood, user_input, reply, session_id=session_id, **stats))
+
+    def finish_turn(reply_text):
+        # Keep only real replies in the context; a failed turn is taken back out.
+        if reply_text:
+            session.add_assistant(reply_text)
+        else:
+            session.history.pop()
+
+    if st.button("Submit", **submit_routing) and user_input.strip():
+        prompt = user_input.strip()
+        # Only the opening turn of a conversation is cached: once earlier turns are in the
+        # context, the same question can deserve a different answer.
+        cacheable = not session.history
+        cache_embed = memory_engine.embedding_service.embed_query if memory_engine.state == "ready" else None
+        cache_scope = dict(prefix_hash=persona.prefix_hash, rag=f"k={rag_k}" if rag_mode else None)
+        cached = None
+        if cacheable and bypass_cache:
+            response_cache.bypass()
+        elif cacheable:
+            cached = response_cache.get(model_choice, persona_choice, mood, prompt, embed=cache_embed,
+                                        **cache_scope)
+
+        if cached:
+            ai_reply, similarity = cached
+            session.add_user(prompt)
+            session.add_assistant(ai_reply)
+            match = "exact match" if similarity == 1.0 else f"similar prompt, {similarity:.2f}"
+            st.markdown(f"**AI:** \u26a1 *cached reply ({match})*")
+            st.markdown(ai_reply)
+            save_reply(ai_reply, cached=True, cache_similarity=round(similarity, 3))
+        else:
+            rag_timings, rag_hits, rag_record = {}, [], {}
+            rag_budget = int(session.budget * RAG_SHARE) if rag_mode else 0
+            if rag_mode:
+                # Retrieval runs on the engine's worker thread while the history is fitted below,
+                # with room for the memory context kept free; the context is spliced in afterwards.
+                memory_search = memory_engine.search_async(prompt, k=rag_k, timings=rag_timings)
+            session.add_user(prompt)
+            with perf_trace.span("prompt build", "dashboard", rag=rag_mode):
+                messages = session.messages(reserve=rag_budget)
+            extra_messages = []
+            if rag_mode:
+                try:
+                    rag_hits, rag_mode_used = memory_search.result(timeout=RAG_TIMEOUT_S)
+                except Exception as e:
+                    rag_mode_used = "skipped"
+                    st.warning(f"Memory lookup skipped: {e or 'timed out'}")
+                context = chat_session.memory_context_message(rag_hits, rag_budget)
+                if context:
+                    extra_messages.append(context)
+                    messages = chat_session.add_context(messages, extra_messages)
+                rag_record = {"rag_mode": rag_mode_used, "rag_sources": [h["source"] for h in rag_hits],
+                              "embed_s": round(rag_timings.get("embed_s", 0.0), 4),
+                              "search_s": round(rag_timings.get("search_s", 0.0), 4)}
+            prompt_tokens_est = session.prompt_tokens(extra_messages)
+            chat_options = model_manager.request_options(model_choice)
+            if persona.options():
+                chat_options["options"] = persona.options()
+            with st.expander(f"\U0001f916 Prompt sent to AI ({len(messages)} messages, "
+                             f"~{prompt_tokens_est} tokens)"):
+                st.json(messages)
+
+            if stream_mode:
+                # Clicking Stop triggers a rerun, which interrupts the loop below; the
+                # finally block still logs whatever was generated up to that point.
+                st.button("\u23f9 Stop generating")
+                st.markdown("**AI:**")
+                reply_box = st.empty()
+                stream = ChatStream(model_choice, messages, **chat_options)
+                try:
+                    for _ in stream:
+                        reply_box.markdown(stream.text + "\u258c")
+                    reply_box.markdown(stream.text)
+                except Exception as e:
+                    reply_box.error(f"Error: {e}")
+                finally:
+                    stream.close()
+                    stats = stream.stats()
+                    stats["prefix_cache_hit"] = prefix_cache_stats.record(
+                        model_choice, persona, prompt_tokens_est, stats["prompt_tokens"])
+                    st.session_state.last_stream_stats = stats
+                    log_stream_stats(stream_stats_path, persona_choice, stats)
+                    model_router.record(stats)
+                    if stream.cancelled:
+                        ai_reply = (stream.text + "\n[generation cancelled]" if stream.text
+                                    else "[generation stopped before the first token]")
+                        if not stream.text:
+                            reply_box.caption("\u23f9 Stopped before the first token.")
+                    elif stream.error is not None:
+                        ai_reply = stream.text or f"Error: {stream.error}"
+                    else:
+                        ai_reply = stream.text
+                    finish_turn(stream.text)
+                    save_reply(ai_reply, latency_s=stats["total_s"], ttft_s=stats["ttft_s"],
+                               prompt_tokens=stats["prompt_tokens"], completion_tokens=stats["tokens"],
+                               tokens_per_sec=stats["tokens_per_sec"], cancelled=stats["cancelled"],
+                               error=stats["error"], **rag_record)
+                    generate_s = stats["total_s"]
+                    reply_ok = stream.done and not stream.cancelled and stream.error is None
+            else:
+                with st.spinner("Sending prompt to model..."):
+                    started, response, error = time.perf_counter(), {}, None
+                    try:
+                        with perf_trace.span("ollama.chat", "ollama", model=model_choice, stream=False):
+                            response = ollama.chat(
+                                model=model_choice,
+                                messages=messages,
+                                **chat_options
+                            )
+                        ai_reply = response['message']['content']
+                    except Exception as e:
+                        ai_reply, error = f"Error: {e}", str(e)
+
+                st.text_area("AI:", value=ai_reply, height=200)
+                finish_turn(None if error else ai_reply)
+                reply_ok = error is None
+                generate_s = round(time.perf_counter() - started, 3)
+                stats = response_stats(model_choice, response, generate_s, error)
+                stats["prefix_cache_hit"] = prefix_cache_stats.record(
+                    model_choice, persona, prompt_tokens_est, stats["prompt_tokens"])
+                log_stream_stats(stream_stats_path, persona_choice, stats)
+                model_router.record(stats)
+                save_reply(ai_reply, latency_s=generate_s,
+                           prompt_tokens=response.get("prompt_eval_count"),
+                           completion_tokens=response.get("eval_count"), error=error, **rag_record)
+
+            if rag_record:
+                st.session_state.last_rag = dict(rag_record, chunks=len(rag_hits), generate_s=generate_s)
+            else:
+                st.session_state.pop("last_rag", None)
+
+            if cacheable and not bypass_cache and reply_ok:
+                response_cache.put(model_choice, persona_choice, mood, prompt, ai_reply, embed=cache_embed,
+                                   **cache_scope)
+
+    last_stats = st.session_state.get("last_stream_stats")
+    if last_stats:
+        status = "cancelled" if last_stats["cancelled"] else "done"
+        st.caption(
+            f"\u23f1 Last reply ({last_stats['model']}, {status}): "
+            f"first token {last_stats['ttft_s']}s | {last_stats['tokens_per_sec']} tok/s | "
+            f"{last_stats['tokens']} tokens in {last_stats['total_s']}s"
+            + {True: " | persona prefix reused", False: " | prefix re-evaluated"}.get(last_stats.get("prefix_cache_hit"), "")
+        )
+    last_rag = st.session_state.get("last_rag")
+    if last_rag:
+        st.caption(
+            f"\U0001f9e0 Memory ({last_rag['rag_mode']}): {last_rag['chunks']} chunks | "
+            f"embed {last_rag['embed_s'] * 1000:.0f}ms | search {last_rag['search_s'] * 1000:.0f}ms | "
+            f"generate {last_rag['generate_s']}s"
+        )
+
+    render_log_history()
+
+
+def render_log_history(page_size=20):
+    st.markdown("### \U0001f553 Chat Log History")
+    log_index = lazy_import("log_index").get_log_index(log_dir)
+    log_index.update()
 
-        st.text_area("Prompt", full_prompt, height=300)
-        st.text_area("AI:", value=ai_reply, height=200)
+    col_persona, col_from, col_to = st.columns([0.5, 0.25, 0.25])
+    persona_filter = col_persona.multiselect("Persona", log_index.personas())
+    date_from = col_from.date_input("From", value=None)
+    date_to = col_to.date_input("To", value=None)
+    search = st.text_input("Search logs", "")
 
-        # Save to log
-        log_file = log_dir / f"{persona_choice}_{datetime.date.today()}.md"
-        with open(log_file, "a", encoding="utf-8") as f:
-            f.write(f"USER: {user_input}\nAI:\n{ai_reply}\n\n")
+    filters = dict(personas=persona_filter, date_from=date_from, date_to=date_to, search=search.strip() or None)
+    total = log_index.count(**filters)
+    pages = max(1, -(-total // page_size))
+    page = st.number_input(f"Page (of {pages}, {total} turns)", min_value=1, max_value=pages, value=1) - 1
 
-    st.markdown("### \U0001f553 Chat Log History")
-    for log_file in sorted(log_dir.glob("*.md"), reverse=True):
-        with st.expander(f"\U0001f5c2 {log_file.name}"):
-            st.text(log_file.read_text(encoding='utf-8'))
+    for turn in log_index.page(page=page, page_size=page_size, **filters):
+        with st.expander(f"\U0001f5c2 {turn['date']} \u00b7 {turn['persona']} \u00b7 {turn['preview'][:80]}"):
+            st.text(log_index.read_turn(turn))
 
 
 # === TAB 2: MEMORY SEARCH  ===
-with tab2:
+def render_memory():
     st.title("\U0001f9e0 Memory Search")
     try:
-        embed_model = HuggingFaceEmbedding(model_name="nomic-ai/nomic-embed-text-v1", trust_remote_code=True)
-        chroma_client = chromadb.PersistentClient(path=persist_dir)
-        chroma_collection = chroma_client.get_or_create_collection("chatgpt-index")
-        vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
-        storage_context = StorageContext.from_defaults(persist_dir=persist_dir)
-        index = load_index_from_storage(storage_context, vector_store=vector_store, embed_model=embed_model)
-        query_engine = index.as_query_engine()
+        st.caption(f"Memory engine: {memory_engine.status()}")
 
         memory_input = st.text_input("Ask your memory something:")
+        col_k, col_cutoff = st.columns(2)
+        top_k = col_k.slider("Results (k)", 1, 20, 5)
+        score_cutoff = col_cutoff.slider("Min similarity", 0.0, 1.0, 0.0, 0.05)
+        search_modes = {"Hybrid": "hybrid", "Vector": "vector", "Keyword (instant)": "lexical"}
+        search_mode = st.radio("Search mode", list(search_modes), horizontal=True)
+        synthesize = st.checkbox(f"Synthesize an answer with {model_choice}", value=False)
+
         if memory_input:
-            memory_response = query_engine.query(memory_input)
-            st.success(memory_response.response)
+            start = time.perf_counter()
+            hits, mode_used = memory_engine.search(memory_input, k=top_k, score_cutoff=score_cutoff,
+                                                   mode=search_modes[search_mode])
+            report = f" | {memory_engine.embedding_service.report()}" if memory_engine.embedding_service else ""
+            st.caption(f"{len(hits)} chunks via {mode_used} in {(time.perf_counter() - start) * 1000:.0f} ms{report}")
+            if mode_used != search_modes[search_mode] and memory_engine.state == "error":
+                st.error(f"Vector search unavailable, showing keyword (BM25) matches only: {memory_engine.error}")
+                st.button("\U0001f501 Retry loading the memory engine", on_click=memory_engine.retry)
+            elif mode_used != search_modes[search_mode]:
+                st.info("Embedding model is still warming up, so these are keyword (BM25) matches only.")
+
+            if synthesize and hits:
+                with st.spinner(f"Asking {model_choice}..."):
+                    st.success(synthesize_answer(memory_input, hits, model=model_choice))
+
+            for hit in hits:
+                score = f"{hit['score']:.3f}" if hit["score"] is not None else "n/a"
+                with st.expander(f"#{hit['rank']} \u00b7 {score} \u00b7 {hit['source']}", expanded=hit["rank"] == 1):
+                    if hit["before"]:
+                        st.caption(f"\u2026{hit['before']}")
+                    st.markdown(hit["text"])
+                    if hit["after"]:
+                        st.caption(f"{hit['after']}\u2026")
 
     except Exception as e:
         st.error(f"Memory engine error: {e}")
 
 # === TAB 3: CALENDAR VIEWER + Add Event ===
-import json
-from calendar_utils import fetch_all_events, load_cached_events
-
-calendar_cache_path = Path("F:/Important Projects/Local Ai Dashboard/memory/calendar_cache.json")
+def render_calendar():
+    calendar = lazy_import("streamlit_calendar", "calendar widget").calendar
+    calendar_utils = lazy_import("calendar_utils", "google calendar")
+    add_event = calendar_utils.add_event
 
-with tab3:
     st.title("📅 Calendar")
 
-    if "cached_events" not in st.session_state:
-        st.session_state.cached_events = []
-
     try:
-        # Manual Sync Button
-        if st.button("🔄 Sync Calendar Events"):
-            with st.spinner("Fetching Google Calendar data..."):
-                events = fetch_all_events()
-                formatted_events = []
-                for e in events:
-                    start = e['start'].get('dateTime', e['start'].get('date'))
-                    end = e['end'].get('dateTime', start)
-                    formatted_events.append({
-                        "title": e.get("summary", "No Title"),
-                        "start": start,
-                        "end": end
-                    })
-
-                # Save to cache (file)
-                calendar_cache_path.write_text(json.dumps(formatted_events, indent=2), encoding="utf-8")
-
-                # Save to session state (live cache)
-                st.session_state.cached_events = formatted_events
-
-                st.success("✅ Calendar synced and cached!")
-
-        # Load from file if no session cache
-        if not st.session_state.cached_events and calendar_cache_path.exists():
-            st.session_state.cached_events = json.loads(calendar_cache_path.read_text(encoding="utf-8"))
+        # Syncs run in the background scheduler; this tab only reads the local store.
+        client = calendar_utils.get_client()
+        job = next(j for j in scheduler.status() if j["job"] == "calendar")
+        if not os.path.exists(client.token_path) or job["status"] == "skipped":
+            if st.button("\U0001f511 Connect Google Calendar"):
+                with st.spinner("Waiting for Google sign-in..."):
+                    client.connect()  # runs the OAuth browser flow if needed and saves the token
+                scheduler.run_now("calendar")
+        elif st.button("\U0001f504 Sync Calendar Events"):
+            scheduler.run_now("calendar")
+        if job["status"] == "running":
+            st.caption("\u23f3 Syncing in the background...")
+        elif job["status"] == "ok" and job["result"]:
+            result = job["result"]
+            st.caption(f"\u2705 {result['mode'].title()} sync: {result['upserted']} updated, "
+                       f"{result['removed']} removed, {result['total']} events in {result['seconds']}s")
+        elif job["error"]:
+            st.caption(f"\u26a0\ufe0f Last sync: {job['error']}")
+
+        # The local store is the single source for the widget; it only changes on sync.
+        event_store = calendar_utils.load_event_store(str(calendar_store_path))
+        if event_store.last_sync:
+            st.caption(f"Last synced {event_store.last_sync}")
+        todays_events = event_store.on(datetime.date.today())
+        if todays_events:
+            st.markdown("**Today:** " + " · ".join(e["title"] for e in todays_events))
 
         calendar_options = {
             "initialView": "dayGridMonth",
@@ -175,7 +532,12 @@ with tab3:
             }
         }
 
-        calendar(events=st.session_state.cached_events, options=calendar_options)
+        calendar(events=event_store.to_calendar_events(), options=calendar_options)
+
+        api_timings = calendar_utils.get_client().timing_summary()
+        if api_timings:
+            with st.expander("\u23f1 Calendar API timings"):
+                st.dataframe([{"call": name, **t} for name, t in api_timings.items()], hide_index=True)
 
         # Add new event form
         with st.expander("➕ Add New Event"):
@@ -190,27 +552,61 @@ with tab3:
                     start_dt = datetime.datetime.combine(date, start_time)
                     end_dt = start_dt + datetime.timedelta(hours=duration)
                     new_event = add_event(title, start_dt, end_dt)
+                    # The calendar job owns the store file; its incremental sync brings the event in.
                     st.success(f"✅ Event added: {new_event.get('summary')}")
+                    if not scheduler.run_now("calendar"):
+                        st.caption("A sync is already running; the event shows up after the next one.")
 
     except Exception as e:
         st.error(f"❌ Calendar Error: {e}")
 
 # === TAB 4: NOTION TASKS ===
-with tab4:
+def render_notion():
+    notion_api = lazy_import("notion_tasks", "notion")
+    write_queue = notion_api.get_write_queue()
+    get_mirror = lazy_import("notion_mirror", "notion").get_mirror
+
     st.title("\U0001f4cb Synced Notion Tasks")
     try:
-        raw_tasks = fetch_notion_tasks(limit=100)
+        # The scheduler's "notion" job keeps the mirror fresh; this tab never waits on Notion.
+        mirror = get_mirror(str(notion_mirror_path))
+        job = next(j for j in scheduler.status() if j["job"] == "notion")
+
+        col_sync, col_status = st.columns([0.25, 0.75])
+        col_sync.button("\U0001f504 Sync now", on_click=scheduler.run_now, args=("notion",),
+                        disabled=job["status"] == "running")
+        if mirror.last_sync is None:
+            col_status.info("First sync of your Notion tasks is running in the background...")
+        col_status.caption(f"{mirror.count()} tasks mirrored locally | last sync {mirror.last_sync}"
+                           + (" | \u23f3 syncing" if job["status"] == "running" else "")
+                           + (f" | \u26a0\ufe0f {job['error']}" if job["error"] else ""))
+
         sort_by = st.selectbox("Sort by", ["xp", "roi", "name"])
-        category_list = sorted({t.get("category", "None") or "None" for t in raw_tasks})
-        status_list = sorted({t.get("status", "None") or "None" for t in raw_tasks})
-        category = st.selectbox("Filter by Category", ["All"] + category_list)
-        status = st.selectbox("Filter by Status", ["All"] + status_list)
+        show_done = st.checkbox("Show completed", value=False)
+        facets = mirror.facets(include_done=show_done)
+        category_list = list(facets["category"])
+        status_list = list(facets["status"])
+        category = st.selectbox("Filter by Category", ["All"] + category_list,
+                                format_func=lambda c: c if c == "All" else f"{c} ({facets['category'][c]})")
+        status = st.selectbox("Filter by Status", ["All"] + status_list,
+                              format_func=lambda s: s if s == "All" else f"{s} ({facets['status'][s]})")
 
-        notion_tasks = [
-            t for t in raw_tasks
-            if (category == "All" or t.get("category", "None") == category)
-            and (status == "All" or t.get("status", "None") == status)
-        ]
+        def complete_task(task):
+            # Optimistic: mark it Done locally right away, send the write in the background,
+            # and put the old status back if Notion rejects it.
+            previous = mirror.set_status(task["id"], "Done")
+
+            def on_done(page_id, ok, error):
+                if not ok:
+                    mirror.set_status(page_id, previous)
+
+            write_queue.submit_complete(task["id"], on_done=on_done)
+
+        if write_queue.pending or write_queue.failures:
+            st.caption(f"\u23f3 {write_queue.pending} updates sending to Notion"
+                       + (f" | \u26a0\ufe0f last failure: {write_queue.failures[-1][1]}" if write_queue.failures else ""))
+
+        notion_tasks = mirror.tasks(category=category, status=status, sort_by=sort_by, include_done=show_done)
 
         st.markdown("""
         <div style='max-height: 500px; overflow-y: auto; padding-right: 10px;'>
@@ -227,13 +623,70 @@ with tab4:
                 <hr style=\"margin: 6px 0;\">
                 """, unsafe_allow_html=True)
             with col2:
-                if st.button("✅", key=task['name']):
-                    success = mark_task_complete(task['name'])
-                    if success:
-                        st.success(f"Marked '{task['name']}' as Done")
-                        st.rerun()
+                st.button("✅", key=task['id'], on_click=complete_task, args=(task,))
 
         st.markdown("</div>", unsafe_allow_html=True)
 
     except Exception as e:
         st.error(f"Failed to fetch Notion tasks: {e}")
+
+
+# === TAB 5 (hidden, open with ?perf=1): PERF TRACES ===
+def render_perf():
+    st.title("\u23f1 Perf")
+    rows = perf_trace.stage_stats()
+    if not rows:
+        st.info("No spans recorded yet.")
+        return
+    st.dataframe(rows, hide_index=True)
+
+    reruns = perf_trace.spans("rerun")
+    if reruns:
+        durations = sorted(s["dur"] * 1000 for s in reruns)
+        st.markdown("### \U0001f501 Rerun cost")
+        st.caption(f"last {reruns[-1]['dur'] * 1000:.0f}ms | p50 {durations[len(durations) // 2]:.0f}ms | "
+                   f"max {durations[-1]:.0f}ms over {len(reruns)} reruns")
+        st.line_chart({"rerun_ms": [round(s["dur"] * 1000, 1) for s in reruns[-200:]]})
+
+    st.markdown("### \U0001f4ca Latency histogram")
+    stage = st.selectbox("Stage", [r["stage"] for r in rows])
+    buckets = perf_trace.histogram(stage)
+    st.bar_chart({"ms": [b for b, _ in buckets], "count": [c for _, c in buckets]}, x="ms", y="count")
+
+    col_export, col_download = st.columns(2)
+    if col_export.button("\U0001f4be Export trace file"):
+        trace_dir.mkdir(parents=True, exist_ok=True)
+        path = perf_trace.export_chrome_trace(trace_dir / "perf_trace.json")
+        col_export.caption(f"Saved {path} (open in chrome://tracing or ui.perfetto.dev)")
+    col_download.download_button("\u2b07 Download trace JSON", json.dumps(perf_trace.chrome_trace(), default=str),
+                                 file_name="perf_trace.json", mime="application/json")
+
+
+# === NAVIGATION ===
+TAB_NAMES = ["\U0001f9e0 Chat", "\U0001f9e0 Memory Search", "\U0001f4c5 Calendar", "\U0001f4cb Notion Tasks"]
+tab_renderers = dict(zip(TAB_NAMES, [render_chat, render_memory, render_calendar, render_notion]))
+if st.query_params.get("perf") == "1":
+    TAB_NAMES.append("\u23f1 Perf")
+    tab_renderers["\u23f1 Perf"] = render_perf
+
+if STARTUP_MODE == "lazy":
+    active_tab = st.radio("Section", TAB_NAMES, horizontal=True, label_visibility="collapsed")
+    with timed(active_tab, "first render"):
+        tab_renderers[active_tab]()
+else:
+    for tab, name in zip(st.tabs(TAB_NAMES), TAB_NAMES):
+        with tab:
+            with timed(name, "first render"):
+                tab_renderers[name]()
+
+# === STARTUP TIMING REPORT ===
+with st.sidebar.expander("\u23f1 Startup timing"):
+    st.caption(f"This rerun: {time.perf_counter() - _script_start:.3f}s")
+    st.dataframe(startup_profiler.report(), hide_index=True)
+
+perf_trace.record("rerun", _script_start, time.perf_counter(), "dashboard",
+                  tab=active_tab if STARTUP_MODE == "lazy" else "all")
+
+# Warm the memory engine only after the page has been sent, so it never delays first paint.
+if WARM_MEMORY_ON_STARTUP:
+    memory_engine.warm_up()
@@ -0,0 +1,191 @@
+# embedding_service.py
+
+import array
+import hashlib
+import math
+import sqlite3
+import threading
+import time
+
+import perf_trace
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Persistent embedding store keyed by (model name, text hash)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.commit()
+
+    def get_many(self, model, hashes):
+        found = {}
+        hashes = list(set(hashes))
+        with self._lock:
+            for i in range(0, len(hashes), 500):
+                batch = hashes[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch],
+                )
+                for h, blob in rows:
+                    found[h] = array.array("f", blob).tolist()
+        return found
+
+    def put_many(self, model, items):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)",
+                [(model, h, array.array("f", vec).tobytes()) for h, vec in items],
+            )
+            self._conn.commit()
+
+    def count(self, model=None):
+        with self._lock:
+            if model:
+                return self._conn.execute("SELECT COUNT(*) FROM embeddings WHERE model = ?", [model]).fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+class EmbeddingService:
+    """Batched sentence-transformers embedding with an on-disk cache.
+
+    Exposes embed_documents/embed_query, so it can be handed to langchain's Chroma
+    as an embedding function, and llama_index_embedding() wraps it for llama_index.
+    """
+
+    def __init__(self, model_name, batch_size=32, num_threads=None, num_workers=1, cache_path=None,
+                 normalize=False, trust_remote_code=False, query_instruction="", text_instruction=""):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.num_workers = num_workers
+        self.normalize = normalize
+        self.trust_remote_code = trust_remote_code
+        self.query_instruction = query_instruction
+        self.text_instruction = text_instruction
+        self.cache = EmbeddingCache(cache_path) if cache_path else None
+        self._model = None
+        self._pool = None
+        self._model_lock = threading.Lock()
+        self.stats = {"requested": 0, "cache_hits": 0, "embedded": 0, "embed_seconds": 0.0}
+
+    # === Model ===
+    @property
+    def model(self):
+        with self._model_lock:
+            if self._model is None:
+                if self.num_threads:
+                    import torch
+                    torch.set_num_threads(self.num_threads)
+                from sentence_transformers import SentenceTransformer
+                self._model = SentenceTransformer(self.model_name, device="cpu",
+                                                  trust_remote_code=self.trust_remote_code)
+            return self._model
+
+    def _encode(self, texts):
+        # A process pool only pays off when there are several batches to spread out.
+        if self.num_workers > 1 and len(texts) > self.batch_size * self.num_workers:
+            if self._pool is None:
+                self._pool = self.model.start_multi_process_pool(["cpu"] * self.num_workers)
+            vectors = self.model.encode_multi_process(texts, self._pool, batch_size=self.batch_size)
+        else:
+            vectors = self.model.encode(texts, batch_size=self.batch_size, show_progress_bar=False)
+        return [list(map(float, v)) for v in vectors]
+
+    def close(self):
+        if self._pool is not None:
+            self.model.stop_multi_process_pool(self._pool)
+            self._pool = None
+
+    # === Embedding ===
+    def embed(self, texts):
+        """Embed texts, reusing cached vectors and embedding each distinct text only once."""
+        self.stats["requested"] += len(texts)
+        hashes = [text_hash(t) for t in texts]
+        found = self.cache.get_many(self.model_name, hashes) if self.cache else {}
+        self.stats["cache_hits"] += sum(1 for h in hashes if h in found)
+
+        missing = {}
+        for h, t in zip(hashes, texts):
+            if h not in found and h not in missing:
+                missing[h] = t
+        if missing:
+            start = time.perf_counter()
+            vectors = self._encode(list(missing.values()))
+            end = time.perf_counter()
+            self.stats["embed_seconds"] += end - start
+            perf_trace.record("embedding", start, end, "memory", texts=len(missing), model=self.model_name)
+            self.stats["embedded"] += len(vectors)
+            fresh = list(zip(missing.keys(), vectors))
+            found.update(fresh)
+            if self.cache:
+                self.cache.put_many(self.model_name, fresh)
+
+        vectors = [found[h] for h in hashes]
+        return [self._normalize(v) for v in vectors] if self.normalize else vectors
+
+    @staticmethod
+    def _normalize(vector):
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+    def embed_documents(self, texts):
+        return self.embed([self.text_instruction + t for t in texts])
+
+    def embed_query(self, text):
+        return self.embed([self.query_instruction + text])[0]
+
+    # === Reporting ===
+    @property
+    def embeddings_per_sec(self):
+        if not self.stats["embed_seconds"]:
+            return None
+        return self.stats["embedded"] / self.stats["embed_seconds"]
+
+    def report(self):
+        requested = self.stats["requested"]
+        rate = self.embeddings_per_sec
+        hit_rate = self.stats["cache_hits"] / requested if requested else 0.0
+        return (f"{self.model_name}: {requested} requested, {self.stats['embedded']} embedded, "
+                f"{hit_rate:.0%} cache hits, {rate:.1f} emb/s" if rate else
+                f"{self.model_name}: {requested} requested, {hit_rate:.0%} cache hits")
+
+
+def llama_index_embedding(service):
+    """Wrap an EmbeddingService as a llama_index BaseEmbedding."""
+    from llama_index.core.base.embeddings.base import BaseEmbedding
+    from llama_index.core.bridge.pydantic import PrivateAttr
+
+    class CachedEmbedding(BaseEmbedding):
+        _service = PrivateAttr()
+
+        def __init__(self, service, **kwargs):
+            super().__init__(model_name=service.model_name, embed_batch_size=service.batch_size, **kwargs)
+            self._service = service
+
+        def _get_query_embedding(self, query):
+            return self._service.embed_query(query)
+
+        async def _aget_query_embedding(self, query):
+            return self._get_query_embedding(query)
+
+        def _get_text_embedding(self, text):
+            return self._service.embed_documents([text])[0]
+
+        def _get_text_embeddings(self, texts):
+            return self._service.embed_documents(texts)
+
+    return CachedEmbedding(service)
@@ -1,14 +1,14 @@
 import streamlit as st
 from pathlib import Path
 import datetime
-import chromadb
-from llama_index.core import VectorStoreIndex, StorageContext, load_index_from_storage
-from llama_index.vector_stores.chroma import ChromaVectorStore
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
-from llama_index.core.settings import Settings
 from streamlit_calendar import calendar
-from calendar_utils import fetch_upcoming_events, add_event
+from calendar_utils import AuthRequired, add_event, get_client, sync_events, load_event_store
 from notion_tasks import fetch_notion_tasks, mark_task_complete
+from memory_engine import get_memory_engine
+from conversation_store import get_conversation_log, new_turn
+from log_index import get_log_index
+from persona_registry import get_persona_registry, prefix_cache_stats
+from chat_session import message_tokens
 
 # === CONFIGURATION ===
 persona_dir = Path("F:/OllamaModels/prompts/personas")
@@ -16,15 +16,16 @@ plans_path = Path("F:/OllamaModels/plans.md")
 log_dir = Path("F:/OllamaModels/logs")
 persist_dir = "F:/OllamaModels/memory/vectorstore/"
 log_dir.mkdir(parents=True, exist_ok=True)
+conversation_log = get_conversation_log(log_dir / "conversations")
 
-# === ENSURE NO DEFAULT OPENAI USAGE ===
-Settings.llm = None
+# === SHARED MEMORY ENGINE (loads once per process, warms up in the background) ===
+# The engine also sets Settings.llm = None so llama_index never falls back to OpenAI.
+memory_engine = get_memory_engine(persist_dir)
+memory_engine.warm_up()
 
-# === LOAD PERSONAS ===
-personas = {
-    f.stem: f.read_text(encoding='utf-8')
-    for f in persona_dir.glob("*.txt")
-}
+# === LOAD PERSONAS (once per process; edited files are reloaded on the next rerun) ===
+persona_registry = get_persona_registry(persona_dir)
+persona_registry.refresh()
 
 # === STREAMLIT TABS ===
 tab1, tab2, tab3, tab4 = st.tabs(["\U0001f9e0 Chat", "\U0001f9e0 Memory Search", "\U0001f4c5 Calendar", "\U0001f4cb Notion Tasks"])
@@ -34,8 +35,13 @@ with tab1:
     import ollama
 
     st.sidebar.title("\U0001f9e0 Rogue AI Copilot")
-    persona_choice = st.sidebar.selectbox("Choose Persona", sorted(personas.keys()))
-    model_choice = st.sidebar.selectbox("Base Model", ["mistral", "llama3", "dolphin-mistral", "phi3", "openhermes"])
+    engine_icons = {"cold": "\u26aa", "warming": "\U0001f7e1", "ready": "\U0001f7e2", "error": "\U0001f534"}
+    st.sidebar.caption(f"{engine_icons.get(memory_engine.state, '')} Memory engine: {memory_engine.state}")
+    persona_choice = st.sidebar.selectbox("Choose Persona", persona_registry.names())
+    persona = persona_registry.get(persona_choice)
+    model_options = ["mistral", "llama3", "dolphin-mistral", "phi3", "openhermes"]
+    model_choice = st.sidebar.selectbox("Base Model", model_options,
+                                        index=model_options.index(persona.model) if persona.model in model_options else 0)
 
     # Model Descriptions
     model_descriptions = {
@@ -47,6 +53,8 @@ with tab1:
     }
     selected_description = model_descriptions.get(model_choice, "No description available.")
     st.sidebar.markdown(f"\U0001f4a1 {selected_description}")
+    if prefix_cache_stats.hit_rate is not None:
+        st.sidebar.caption(f"\u267b Persona prefix cache: {prefix_cache_stats.hit_rate:.0%} of replies reused it")
 
     xp = st.sidebar.slider("Daily XP", 0, 100, 50)
     mood = st.sidebar.selectbox("Mood", ["Focused", "Burnt Out", "Creative", "Lazy Genius", "Shadow Mode"])
@@ -57,7 +65,7 @@ with tab1:
 
     st.title(f"\U0001f4ac {persona_choice} Mode")
     st.markdown(f"**Model:** `{model_choice}` | **Mood:** *{mood}*")
-    initial_prompt = personas[persona_choice]
+    initial_prompt = persona.prompt
 
     st.markdown("### \U0001f9e0 Persona Prompt")
     st.code(initial_prompt.strip(), language="markdown")
@@ -78,46 +86,54 @@ with tab1:
 
     if st.button("Submit"):
         st.markdown("### \U0001f916 Prompt Sent to AI")
-        full_prompt = f"{initial_prompt.strip()}\n\nUser: {user_input.strip()}\nAI:"
+        # The persona goes first as an unchanged system message, so Ollama can reuse its KV-cache.
+        messages = [{"role": "system", "content": initial_prompt},
+                    {"role": "user", "content": user_input.strip()}]
+        chat_options = {"options": persona.options()} if persona.options() else {}
 
         with st.spinner("Sending prompt to model..."):
             try:
                 response = ollama.chat(
                     model=model_choice,
-                    messages=[{"role": "user", "content": full_prompt}]
+                    messages=messages,
+                    **chat_options
                 )
                 ai_reply = response['message']['content']
+                prefix_cache_stats.record(model_choice, persona,
+                                          sum(message_tokens(m) for m in messages),
+                                          response.get("prompt_eval_count"))
             except Exception as e:
                 ai_reply = f"Error: {e}"
 
-        st.text_area("Prompt", full_prompt, height=300)
+        st.json(messages)
         st.text_area("AI:", value=ai_reply, height=200)
 
         # Save to log
-        log_file = log_dir / f"{persona_choice}_{datetime.date.today()}.md"
-        with open(log_file, "a", encoding="utf-8") as f:
-            f.write(f"USER: {user_input}\nAI:\n{ai_reply}\n\n")
+        conversation_log.append(new_turn(persona_choice, model_choice, mood, user_input, ai_reply))
 
+    # The index only parses what was appended since the last rerun and reads one page of turns.
     st.markdown("### \U0001f553 Chat Log History")
-    for log_file in sorted(log_dir.glob("*.md"), reverse=True):
-        with st.expander(f"\U0001f5c2 {log_file.name}"):
-            st.text(log_file.read_text(encoding='utf-8'))
+    log_index = get_log_index(log_dir)
+    log_index.update()
+    history_filters = dict(personas=st.multiselect("Persona", log_index.personas()),
+                           search=st.text_input("Search logs", "").strip() or None)
+    history_pages = max(1, -(-log_index.count(**history_filters) // 20))
+    history_page = st.number_input(f"Page (of {history_pages})", min_value=1, max_value=history_pages, value=1) - 1
+    for turn in log_index.page(page=history_page, page_size=20, **history_filters):
+        with st.expander(f"\U0001f5c2 {turn['date']} \u00b7 {turn['persona']} \u00b7 {turn['preview'][:80]}"):
+            st.text(log_index.read_turn(turn))
 
 
 # === TAB 2: MEMORY SEARCH  ===
 with tab2:
     st.title("\U0001f9e0 Memory Search")
     try:
-        embed_model = HuggingFaceEmbedding(model_name="nomic-ai/nomic-embed-text-v1", trust_remote_code=True)
-        chroma_client = chromadb.PersistentClient(path=persist_dir)
-        chroma_collection = chroma_client.get_or_create_collection("chatgpt-index")
-        vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
-        storage_context = StorageContext.from_defaults(persist_dir=persist_dir)
-        index = load_index_from_storage(storage_context, vector_store=vector_store, embed_model=embed_model)
-        query_engine = index.as_query_engine()
+        st.caption(f"Memory engine: {memory_engine.status()}")
 
         memory_input = st.text_input("Ask your memory something:")
         if memory_input:
+            with st.spinner("Loading memory engine..."):
+                query_engine = memory_engine.query_engine()
             memory_response = query_engine.query(memory_input)
             st.success(memory_response.response)
 
@@ -125,43 +141,25 @@ with tab2:
         st.error(f"Memory engine error: {e}")
 
 # === TAB 3: CALENDAR VIEWER + Add Event ===
-import json
-from calendar_utils import fetch_all_events, load_cached_events
-
-calendar_cache_path = Path("F:/OllamaModels/memory/calendar_cache.json")
-
 with tab3:
     st.title("📅 Calendar")
 
-    if "cached_events" not in st.session_state:
-        st.session_state.cached_events = []
-
     try:
-        # Manual Sync Button
+        # Manual Sync Button: incremental after the first run, into the same local event
+        # store the dashboard uses.
         if st.button("🔄 Sync Calendar Events"):
             with st.spinner("Fetching Google Calendar data..."):
-                events = fetch_all_events()
-                formatted_events = []
-                for e in events:
-                    start = e['start'].get('dateTime', e['start'].get('date'))
-                    end = e['end'].get('dateTime', start)
-                    formatted_events.append({
-                        "title": e.get("summary", "No Title"),
-                        "start": start,
-                        "end": end
-                    })
-
-                # Save to cache (file)
-                calendar_cache_path.write_text(json.dumps(formatted_events, indent=2), encoding="utf-8")
-
-                # Save to session state (live cache)
-                st.session_state.cached_events = formatted_events
-
-                st.success("✅ Calendar synced and cached!")
-
-        # Load from file if no session cache
-        if not st.session_state.cached_events and calendar_cache_path.exists():
-            st.session_state.cached_events = json.loads(calendar_cache_path.read_text(encoding="utf-8"))
+                try:
+                    result = sync_events()
+                except AuthRequired:
+                    get_client().connect()  # first run or revoked token: sign in, then retry
+                    result = sync_events()
+                st.success(f"✅ {result['mode'].title()} sync: {result['upserted']} updated, "
+                           f"{result['removed']} removed, {result['total']} events")
+
+        event_store = load_event_store()
+        if event_store.last_sync:
+            st.caption(f"Last synced {event_store.last_sync}")
 
         calendar_options = {
             "initialView": "dayGridMonth",
@@ -175,7 +173,7 @@ with tab3:
             }
         }
 
-        calendar(events=st.session_state.cached_events, options=calendar_options)
+        calendar(events=event_store.to_calendar_events(), options=calendar_options)
 
         # Add new event form
         with st.expander("➕ Add New Event"):
@@ -190,6 +188,8 @@ with tab3:
                     start_dt = datetime.datetime.combine(date, start_time)
                     end_dt = start_dt + datetime.timedelta(hours=duration)
                     new_event = add_event(title, start_dt, end_dt)
+                    event_store.apply([new_event])
+                    event_store.save()
                     st.success(f"✅ Event added: {new_event.get('summary')}")
 
     except Exception as e:
@@ -227,8 +227,8 @@ with tab4:
                 <hr style=\"margin: 6px 0;\">
                 """, unsafe_allow_html=True)
             with col2:
-                if st.button("✅", key=task['name']):
-                    success = mark_task_complete(task['name'])
+                if st.button("✅", key=task['id']):
+                    success = mark_task_complete(task['id'])
                     if success:
                         st.success(f"Marked '{task['name']}' as Done")
                         st.rerun()
@@ -0,0 +1,457 @@
+# ingest_pipeline.py
+#
+# One ingestion path into the memory engine's collection (chatgpt-index under
+# memory/vectorstore/, embedded with the engine's model). Each source is a loader
+# with its own watermark, so a run only chunks and embeds what is new since the last
+# one. Embedding runs in a process pool; at most max_pending batches are in flight,
+# and finished batches are upserted by the parent process, the store's only writer.
+#
+#   python scripts/ingest_memory.py --persist-dir memory/vectorstore --logs-dir logs --plans plans.md
+
+import copy
+import hashlib
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from conversation_store import conversation_files, format_turn, iter_records
+from memory_engine import COLLECTION_NAME, EMBED_MODEL_NAME, _text_instruction
+
+STATE_NAME = "ingest_state.json"
+LOCK_NAME = "ingest.lock"
+STALE_LOCK_SECONDS = 6 * 3600
+REBUILD_REQUIRED_EXIT = 3  # ingest_memory.py's exit code when only a --full run may proceed
+
+
+class RebuildRequired(Exception):
+    """The collection can't be ingested into incrementally; only an explicit full run may rebuild it."""
+
+
+# === Chunking + hashing ===
+def sha256(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_text(text, chunk_size=1000):
+    """Greedily pack paragraphs into chunks of roughly chunk_size characters.
+
+    Packing always starts from the top of the file, so appending to a log only
+    changes its last chunk and every earlier chunk keeps the same hash.
+    """
+    chunks, current = [], ""
+    for para in text.split("\n\n"):
+        if not para.strip():
+            continue
+        while len(para) > chunk_size:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(para[:chunk_size])
+            para = para[chunk_size:]
+        if current and len(current) + len(para) + 2 > chunk_size:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{para}" if current else para
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def chunk_ids(source, chunks):
+    """One stable id per chunk: source + content hash (+ a counter for repeated chunks)."""
+    ids, seen = [], {}
+    for chunk in chunks:
+        digest = sha256(chunk)[:24]
+        n = seen.get(digest, 0)
+        seen[digest] = n + 1
+        ids.append(f"{source}:{digest}" + (f":{n}" if n else ""))
+    return ids
+
+
+def acquire_lock(path):
+    """Create the lock file atomically; clear it if a previous run died long ago."""
+    if os.path.exists(path) and time.time() - os.path.getmtime(path) > STALE_LOCK_SECONDS:
+        os.remove(path)
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    os.write(fd, str(os.getpid()).encode())
+    os.close(fd)
+    return True
+
+
+# === Loaders ===
+# A loader's load(watermark) yields documents: dicts with source, text and metadata.
+# replace=True means the text is the source's whole current content (its old chunks
+# are dropped); an empty text with replace=True deletes the source. After a run,
+# loader.watermark is saved and handed back to load() next time.
+def _file_signature(path):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _changed_files(paths, seen, prefix):
+    """Yield replace-documents for new/modified files in paths and deletions for vanished ones."""
+    current = {}
+    for path, read in paths:
+        name = os.path.basename(path)
+        signature = _file_signature(path)
+        current[name] = signature
+        if seen.get(name) != signature:
+            yield {"source": f"{prefix}{name}", "text": read(path), "replace": True}
+            seen[name] = signature
+    for name in [n for n in seen if n not in current]:
+        yield {"source": f"{prefix}{name}", "text": "", "replace": True}
+        del seen[name]
+
+
+def _read_text(path):
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def read_chat_json(path):
+    """Text of a legacy logs/*.json chat log, or "" for JSON that isn't a list of role/content messages."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            messages = json.load(f)
+    except ValueError:
+        return ""
+    if not isinstance(messages, list) or not all(isinstance(m, dict) and "role" in m and "content" in m
+                                                 for m in messages):
+        return ""
+    return "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+
+
+def _read_log(path):
+    return read_chat_json(path) if path.endswith(".json") else _read_text(path)
+
+
+class ChatLogLoader:
+    """The dashboard's JSONL conversation store (new turns only) plus legacy logs/*.md|txt|json files."""
+
+    name = "chat_logs"
+
+    def __init__(self, log_dir):
+        self.log_dir = str(log_dir)
+        self.watermark = None
+
+    def load(self, watermark):
+        self.watermark = watermark = copy.deepcopy(watermark) or {"offsets": {}, "files": {}}
+        for path in conversation_files(os.path.join(self.log_dir, "conversations")):
+            source = f"conversations/{os.path.basename(path)}"
+            start = watermark["offsets"].get(source, 0)
+            if os.path.getsize(path) < start:
+                start = 0  # the file was replaced
+            for offset, length, record in iter_records(path, start):
+                yield {"source": source, "key": record.get("id") or str(offset), "text": format_turn(record),
+                       "metadata": {"persona": record.get("persona"), "date": (record.get("ts") or "")[:10]}}
+                watermark["offsets"][source] = offset + length
+        logs = [(os.path.join(self.log_dir, fn), _read_log) for fn in sorted(os.listdir(self.log_dir))
+                if fn.endswith((".json", ".md", ".txt")) and os.path.isfile(os.path.join(self.log_dir, fn))]
+        yield from _changed_files(logs, watermark["files"], "")
+
+
+class ChatGPTExportLoader:
+    """Per-conversation .txt files written by scripts/extract_chatgpt_logs.py."""
+
+    name = "chatgpt"
+
+    def __init__(self, directory):
+        self.directory = str(directory)
+        self.watermark = None
+
+    def load(self, watermark):
+        self.watermark = watermark = copy.deepcopy(watermark) or {"files": {}}
+        files = []
+        if os.path.isdir(self.directory):
+            files = [(os.path.join(self.directory, fn), _read_text) for fn in sorted(os.listdir(self.directory))
+                     if fn.endswith(".txt")]
+        yield from _changed_files(files, watermark["files"], "chatgpt/")
+
+
+class PlansLoader:
+    """plans.md, re-embedded whenever its content changes."""
+
+    name = "plans"
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.watermark = None
+
+    def load(self, watermark):
+        self.watermark = watermark
+        text = _read_text(self.path) if os.path.exists(self.path) else ""
+        digest = sha256(text)
+        if digest != watermark:
+            yield {"source": os.path.basename(self.path), "text": text, "replace": True}
+            self.watermark = digest
+
+
+class NotionLoader:
+    """Task text from the local Notion mirror, by last_edited_time."""
+
+    name = "notion"
+
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        self.watermark = None
+
+    def load(self, watermark):
+        from notion_mirror import get_mirror
+        self.watermark = watermark = copy.deepcopy(watermark) or {"edited": None, "ids": []}
+        if not os.path.exists(self.db_path):
+            return
+        mirror = get_mirror(self.db_path)
+        for task in mirror.changed_since(watermark["edited"]):
+            text = (f"Notion task: {task['name']}\nStatus: {task['status']} | Category: {task['category']} | "
+                    f"XP: {task['xp']} | ROI: {task['roi']}\nReason: {task['reason'] or ''}")
+            yield {"source": f"notion/{task['id']}", "text": text, "replace": True,
+                   "metadata": {"status": task["status"], "category": task["category"]}}
+            watermark["edited"] = max(watermark["edited"] or "", task["last_edited_time"] or "") or None
+        current = mirror.page_ids()
+        for page_id in set(watermark["ids"]) - current:
+            yield {"source": f"notion/{page_id}", "text": "", "replace": True}
+        watermark["ids"] = sorted(current)
+
+
+class CalendarLoader:
+    """Event summaries from the local calendar store, by the events' updated time."""
+
+    name = "calendar"
+
+    def __init__(self, store_path):
+        self.store_path = str(store_path)
+        self.watermark = None
+
+    def load(self, watermark):
+        from calendar_store import EventStore
+        self.watermark = watermark = copy.deepcopy(watermark) or {"updated": None, "ids": []}
+        events = EventStore(self.store_path).events
+        for event_id, e in sorted(events.items(), key=lambda item: item[1].get("updated") or ""):
+            if watermark["updated"] and (e.get("updated") or "") < watermark["updated"]:
+                continue
+            when = e["start"][:10] if e["all_day"] else f"{e['start']} to {e['end']}"
+            yield {"source": f"calendar/{event_id}", "text": f"Calendar event: {e['title']}\nWhen: {when}",
+                   "replace": True, "metadata": {"date": e["start"][:10]}}
+            watermark["updated"] = max(watermark["updated"] or "", e.get("updated") or "") or None
+        for event_id in set(watermark["ids"]) - set(events):
+            yield {"source": f"calendar/{event_id}", "text": "", "replace": True}
+        watermark["ids"] = sorted(events)
+
+
+# === Embedding workers ===
+_embedder = None
+
+
+def _init_worker(model_name, num_threads, batch_size):
+    global _embedder
+    from embedding_service import EmbeddingService
+    _embedder = EmbeddingService(model_name, batch_size=batch_size, num_threads=num_threads, normalize=True,
+                                 trust_remote_code=True, text_instruction=_text_instruction(model_name))
+
+
+def _embed_batch(texts):
+    return _embedder.embed_documents(texts)
+
+
+class _InlineFuture:
+    """Stands in for a Future when embedding runs in-process (workers=0)."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def result(self):
+        return self.value
+
+
+# === Pipeline ===
+class IngestPipeline:
+    """Chunks, embeds and upserts loader documents into one Chroma collection.
+
+    Chunk ids are source + content hash, so unchanged chunks are never embedded twice
+    even when a watermark is lost; a loader's watermark is saved only after all of its
+    chunks are stored, so an interrupted run redoes at most that loader.
+    """
+
+    def __init__(self, persist_dir, collection_name=COLLECTION_NAME, model_name=EMBED_MODEL_NAME, workers=2,
+                 batch_size=64, max_pending=4, chunk_size=1000, num_threads=None, state_path=None):
+        self.persist_dir = str(persist_dir)
+        self.collection_name = collection_name
+        self.model_name = model_name
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.chunk_size = chunk_size
+        self.num_threads = num_threads
+        # Outside persist_dir, so saving it never looks like an index change to the engine.
+        parent = os.path.dirname(os.path.normpath(self.persist_dir))
+        self.state_path = state_path or os.path.join(parent, STATE_NAME)
+        self.lock_path = os.path.join(parent, LOCK_NAME)
+        self.collection = None
+        self._pool = None
+
+    # === State ===
+    def _load_state(self):
+        if os.path.exists(self.state_path):
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return {"embed_model": self.model_name, "watermarks": {}}
+
+    def _save_state(self, state):
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp, self.state_path)
+
+    # === Store ===
+    def _stored_count(self):
+        """Chunks already in the collection, without creating anything if it doesn't exist."""
+        if not os.path.isdir(self.persist_dir):
+            return 0
+        import chromadb
+        try:
+            return chromadb.PersistentClient(path=self.persist_dir).get_collection(self.collection_name).count()
+        except Exception:
+            return 0  # no such collection yet
+
+    def _open(self, reset=False):
+        import chromadb
+        os.makedirs(self.persist_dir, exist_ok=True)
+        client = chromadb.PersistentClient(path=self.persist_dir)
+        if reset:
+            try:
+                client.delete_collection(self.collection_name)
+            except Exception:
+                pass  # nothing to drop yet
+        self.collection = client.get_or_create_collection(self.collection_name)
+        self._ensure_index_storage()
+
+    def _ensure_index_storage(self):
+        """The engine loads llama_index storage files next to the collection; create them for a new store."""
+        if os.path.exists(os.path.join(self.persist_dir, "index_store.json")):
+            return
+        from llama_index.core import StorageContext, VectorStoreIndex
+        from llama_index.vector_stores.chroma import ChromaVectorStore
+        from embedding_service import EmbeddingService, llama_index_embedding
+        storage = StorageContext.from_defaults(vector_store=ChromaVectorStore(chroma_collection=self.collection))
+        # The service loads its model lazily; building an empty index never embeds anything.
+        VectorStoreIndex([], storage_context=storage,
+                         embed_model=llama_index_embedding(EmbeddingService(self.model_name)))
+        storage.persist(persist_dir=self.persist_dir)
+
+    def _metadatas(self, items):
+        from llama_index.core.schema import TextNode
+        from llama_index.core.vector_stores.utils import node_to_metadata_dict
+        return [node_to_metadata_dict(TextNode(id_=chunk_id, text=text, metadata=metadata), remove_text=True,
+                                      flat_metadata=True)
+                for chunk_id, text, metadata in items]
+
+    # === Embedding ===
+    def _submit(self, texts):
+        if not self.workers:
+            if self._pool is None:
+                _init_worker(self.model_name, self.num_threads, self.batch_size)
+                self._pool = "inline"
+            return _InlineFuture(_embed_batch(texts))
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                             initargs=(self.model_name, self.num_threads, self.batch_size))
+        return self._pool.submit(_embed_batch, texts)
+
+    def _upsert(self, future, items, stats):
+        vectors = future.result()
+        self.collection.upsert(ids=[i for i, _, _ in items], embeddings=vectors,
+                               documents=[t for _, t, _ in items], metadatas=self._metadatas(items))
+        stats["chunks_added"] += len(items)
+
+    def close(self):
+        if self._pool not in (None, "inline"):
+            self._pool.shutdown()
+        self._pool = None
+
+    # === Run ===
+    def _document_chunks(self, loader, doc, stats):
+        """(id, text, metadata) for the document's chunks that aren't stored yet; drops stale ones."""
+        source = doc["source"]
+        chunks = chunk_text(doc["text"], self.chunk_size) if doc["text"].strip() else []
+        ids = chunk_ids(f"{source}:{doc['key']}" if doc.get("key") else source, chunks)
+        if doc.get("replace"):
+            old = set(self.collection.get(where={"source": source}, include=[])["ids"])
+            stale = old - set(ids)
+            if stale:
+                self.collection.delete(ids=list(stale))
+                stats["chunks_removed"] += len(stale)
+        existing = set(self.collection.get(ids=ids, include=[])["ids"]) if ids else set()
+        metadata = {k: v for k, v in (doc.get("metadata") or {}).items() if v is not None}
+        return [(chunk_id, chunk, dict(metadata, source=source, kind=loader.name, chunk_hash=sha256(chunk)[:24]))
+                for chunk_id, chunk in zip(ids, chunks) if chunk_id not in existing]
+
+    def run_loader(self, loader, watermark):
+        stats = {"documents": 0, "chunks_added": 0, "chunks_removed": 0}
+        pending, batch = deque(), []
+        start = time.perf_counter()
+
+        def submit(items):
+            # Backpressure: wait for (and store) the oldest batch before queueing another.
+            if len(pending) >= self.max_pending:
+                self._upsert(*pending.popleft(), stats)
+            pending.append((self._submit([t for _, t, _ in items]), items))
+
+        for doc in loader.load(watermark):
+            stats["documents"] += 1
+            batch.extend(self._document_chunks(loader, doc, stats))
+            while len(batch) >= self.batch_size:
+                submit(batch[:self.batch_size])
+                batch = batch[self.batch_size:]
+        if batch:
+            submit(batch)
+        while pending:
+            self._upsert(*pending.popleft(), stats)
+        stats["seconds"] = round(time.perf_counter() - start, 2)
+        return stats
+
+    def _check_incremental(self, has_state, state):
+        if not has_state:
+            stored = self._stored_count()
+            if stored:
+                # Chunks stored without ingest state (e.g. by the old llama_index ingest) have ids
+                # this pipeline can't match, so adding to them would store every chunk twice.
+                raise RebuildRequired(f"the collection holds {stored} chunks from an earlier ingest; run "
+                                      f"scripts/ingest_memory.py --full once to rebuild it from the sources")
+        elif state.get("embed_model") != self.model_name:
+            raise RebuildRequired(f"the collection was embedded with {state.get('embed_model')}, not "
+                                  f"{self.model_name}; run scripts/ingest_memory.py --full once to rebuild it")
+
+    def run(self, loaders, full=False):
+        """Ingest every loader; returns {loader name: stats}, or None if another run holds the lock.
+
+        Only full=True ever drops the collection. When an incremental run can't safely add
+        to it, run() raises RebuildRequired before touching the store or the state file.
+        """
+        if not acquire_lock(self.lock_path):
+            return None
+        try:
+            has_state = os.path.exists(self.state_path)
+            state = self._load_state()
+            if not full:
+                self._check_incremental(has_state, state)
+            else:
+                state = {"embed_model": self.model_name, "watermarks": {}}
+            self._open(reset=full)
+            results = {}
+            for loader in loaders:
+                try:
+                    results[loader.name] = self.run_loader(loader, state["watermarks"].get(loader.name))
+                except Exception as e:
+                    results[loader.name] = {"error": f"{type(e).__name__}: {e}"}
+                    continue  # keep the old watermark; the next run retries this source
+                state["watermarks"][loader.name] = loader.watermark
+                self._save_state(state)
+            return results
+        finally:
+            self.close()
+            os.remove(self.lock_path)
@@ -0,0 +1,179 @@
+# job_scheduler.py
+
+import datetime
+import json
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+OK = "ok"
+ERROR = "error"
+RUNNING = "running"
+SKIPPED = "skipped"
+
+
+class SkipRun(Exception):
+    """Raised by a job to report that it had nothing to do (e.g. not authorized yet)."""
+
+
+class Job:
+    def __init__(self, name, func, interval, run_on_start=True):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.run_on_start = run_on_start
+        self.added = time.time()
+        self.future = None
+
+    @property
+    def running(self):
+        return self.future is not None and not self.future.done()
+
+
+class Scheduler:
+    """Runs sync jobs on intervals in a small thread pool, off the Streamlit script thread.
+
+    A job never overlaps itself: a run that comes due (or is requested) while the previous
+    one is still going is dropped. Each job's last status, duration, result and error are
+    kept in a JSON file, so the status panel survives restarts and next runs are timed
+    from the last persisted run.
+    """
+
+    def __init__(self, state_path, max_workers=2, tick=1.0):
+        self.state_path = str(state_path)
+        self.tick = tick
+        self.jobs = {}
+        self.state = self._load_state()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # === State file ===
+    def _load_state(self):
+        if os.path.exists(self.state_path):
+            try:
+                with open(self.state_path, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+            except ValueError:
+                return {}
+            for entry in state.values():
+                if entry.get("status") == RUNNING:
+                    entry["status"] = ERROR  # the process stopped mid-run
+                    entry["error"] = "interrupted"
+            return state
+        return {}
+
+    def _save_state(self):
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2, default=str)
+        os.replace(tmp, self.state_path)
+
+    # === Jobs ===
+    def add(self, name, func, interval, run_on_start=True):
+        """Register a job, or update its function/interval if already registered (safe on every rerun)."""
+        with self._lock:
+            job = self.jobs.get(name)
+            if job is None:
+                self.jobs[name] = Job(name, func, interval, run_on_start)
+            else:
+                job.func, job.interval = func, interval
+            self.state.setdefault(name, {"runs": 0})
+
+    def run_now(self, name):
+        """Start a job now unless it is already running. Returns True if a run was started."""
+        with self._lock:
+            job = self.jobs[name]
+            if job.running:
+                return False
+            entry = self.state[name]
+            entry.update(status=RUNNING, started=_now())
+            job.future = self._pool.submit(self._run, job)
+            return True
+
+    def _run(self, job):
+        start = time.perf_counter()
+        status, result, error = OK, None, None
+        try:
+            result = job.func()
+        except SkipRun as e:
+            status, error = SKIPPED, str(e)
+        except Exception as e:
+            status, error = ERROR, f"{type(e).__name__}: {e}"
+            traceback.print_exc()
+        with self._lock:
+            entry = self.state[job.name]
+            entry.update(status=status, error=error, result=result, finished=_now(),
+                         duration_s=round(time.perf_counter() - start, 3), last_run=time.time(),
+                         runs=entry.get("runs", 0) + 1)
+            self._save_state()
+        return result
+
+    def next_run(self, job):
+        """Epoch seconds when the job is next due."""
+        last = self.state.get(job.name, {}).get("last_run")
+        if last is None:
+            return job.added if job.run_on_start else job.added + job.interval
+        return last + job.interval
+
+    def due(self, job):
+        return time.time() >= self.next_run(job)
+
+    # === Ticker ===
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            with self._lock:
+                for job in list(self.jobs.values()):
+                    if not job.running and self.due(job):
+                        self.run_now(job.name)
+            self._stop.wait(self.tick)
+
+    def status(self):
+        """One dict per job for the status panel."""
+        rows = []
+        with self._lock:
+            for name, job in self.jobs.items():
+                entry = self.state.get(name, {})
+                rows.append({
+                    "job": name,
+                    "status": RUNNING if job.running else entry.get("status", "never run"),
+                    "last_finished": entry.get("finished"),
+                    "duration_s": entry.get("duration_s"),
+                    "next_in_s": max(0, round(self.next_run(job) - time.time())),
+                    "runs": entry.get("runs", 0),
+                    "error": entry.get("error"),
+                    "result": entry.get("result"),
+                })
+        return rows
+
+
+def _now():
+    return datetime.datetime.now().isoformat(timespec="seconds")
+
+
+# === Process-wide scheduler ===
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler(state_path, **kwargs):
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler(state_path, **kwargs)
+        return _scheduler
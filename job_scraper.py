@@ -0,0 +1,295 @@
+# job_scraper.py
+#
+# Sweep many job searches with a pool of headless Chrome workers and keep the
+# results in a local SQLite store:
+#
+#   python job_scraper.py --query "IT Support@Remote" --query "Help Desk@Austin, TX" --workers 4
+#   python job_scraper.py --queries-file searches.txt --mock          # local fake job board
+#   python job_scraper.py --queries-file searches.txt --fixtures saved_pages/
+
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from urllib.parse import urlencode, urljoin, urlparse, parse_qs
+
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+BASE_URL = "https://www.indeed.com"
+STORE_PATH = "jobs.sqlite"
+RESULTS_PER_PAGE = 10
+MAX_PAGES = 5
+WAIT_SECONDS = 15
+
+# Indeed's search result markup; the mock site serves the same structure.
+SELECTORS = {
+    "card": "div.job_seen_beacon",
+    "title": "h2.jobTitle a",
+    "company": "[data-testid='company-name']",
+    "location": "[data-testid='text-location']",
+    "snippet": ".job-snippet",
+    "no_results": ".jobsearch-NoResult-messageContainer",
+    "next": "a[data-testid='pagination-page-next']",
+}
+
+
+def search_url(base_url, title, location, page=0):
+    return f"{base_url.rstrip('/')}/jobs?" + urlencode({"q": title, "l": location, "start": page * RESULTS_PER_PAGE})
+
+
+def listing_key(listing):
+    """Stable id for a listing: the job key in its URL, else a hash of what identifies it."""
+    query = parse_qs(urlparse(listing["url"] or "").query)
+    if query.get("jk"):
+        return f"jk:{query['jk'][0]}"
+    raw = "|".join((listing[f] or "").strip().lower() for f in ("title", "company", "location"))
+    return "h:" + hashlib.sha256(raw.encode("utf-8")).hexdigest()[:24]
+
+
+def page_hash(listings):
+    return hashlib.sha256("\n".join(sorted(l["key"] for l in listings)).encode("utf-8")).hexdigest()
+
+
+# === Local store ===
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    key TEXT PRIMARY KEY,
+    url TEXT,
+    title TEXT,
+    company TEXT,
+    location TEXT,
+    snippet TEXT,
+    query TEXT,
+    first_seen TEXT,
+    last_seen TEXT
+);
+CREATE TABLE IF NOT EXISTS pages (
+    query TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    listing_hash TEXT,
+    crawled_at TEXT,
+    PRIMARY KEY (query, page)
+);
+"""
+
+
+class ListingStore:
+    """Job listings deduplicated by listing_key, plus a hash of each result page's listing set."""
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def page_hash(self, query, page):
+        with self._connect() as conn:
+            row = conn.execute("SELECT listing_hash FROM pages WHERE query = ? AND page = ?", (query, page)).fetchone()
+        return row[0] if row else None
+
+    def save_page(self, query, page, listings):
+        """Upsert a page's listings and its hash. Returns how many listings were new."""
+        now = datetime.datetime.now().isoformat(timespec="seconds")
+        new = 0
+        with self._lock, self._connect() as conn:
+            for l in listings:
+                cur = conn.execute(
+                    "INSERT OR IGNORE INTO listings (key, url, title, company, location, snippet, query, first_seen, "
+                    "last_seen) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (l["key"], l["url"], l["title"], l["company"], l["location"], l["snippet"], query, now, now),
+                )
+                if cur.rowcount:
+                    new += 1
+                else:
+                    conn.execute("UPDATE listings SET last_seen = ? WHERE key = ?", (now, l["key"]))
+            conn.execute("INSERT OR REPLACE INTO pages (query, page, listing_hash, crawled_at) VALUES (?, ?, ?, ?)",
+                         (query, page, page_hash(listings), now))
+        return new
+
+    def count(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM listings").fetchone()[0]
+
+    def listings(self, query=None, limit=100):
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            sql = "SELECT * FROM listings" + (" WHERE query = ?" if query else "") + " ORDER BY first_seen DESC LIMIT ?"
+            return [dict(r) for r in conn.execute(sql, (query, limit) if query else (limit,))]
+
+
+# === Browser workers ===
+def make_driver(headless=True):
+    options = webdriver.ChromeOptions()
+    if headless:
+        options.add_argument("--headless=new")
+    options.add_argument("--window-size=1280,1024")
+    options.add_argument("--blink-settings=imagesEnabled=false")
+    options.page_load_strategy = "eager"  # the result cards are in the HTML; don't wait for ads/trackers
+    return webdriver.Chrome(options=options)
+
+
+def _text(card, selector):
+    found = card.find_elements(By.CSS_SELECTOR, selector)
+    return found[0].text.strip() if found else ""
+
+
+def extract_listings(driver, wait_seconds=WAIT_SECONDS):
+    """Wait until results (or the no-results message) render, then read every job card."""
+    try:
+        WebDriverWait(driver, wait_seconds).until(EC.any_of(
+            EC.presence_of_element_located((By.CSS_SELECTOR, SELECTORS["card"])),
+            EC.presence_of_element_located((By.CSS_SELECTOR, SELECTORS["no_results"])),
+        ))
+    except TimeoutException:
+        return [], False
+    listings = []
+    for card in driver.find_elements(By.CSS_SELECTOR, SELECTORS["card"]):
+        links = card.find_elements(By.CSS_SELECTOR, SELECTORS["title"])
+        href = links[0].get_attribute("href") if links else None
+        listing = {
+            "url": urljoin(driver.current_url, href) if href else None,
+            "title": links[0].text.strip() if links else "",
+            "company": _text(card, SELECTORS["company"]),
+            "location": _text(card, SELECTORS["location"]),
+            "snippet": _text(card, SELECTORS["snippet"]),
+        }
+        listing["key"] = listing_key(listing)
+        listings.append(listing)
+    has_next = bool(driver.find_elements(By.CSS_SELECTOR, SELECTORS["next"]))
+    return listings, has_next
+
+
+class JobScraper:
+    """Runs searches concurrently, one headless Chrome per worker thread.
+
+    Paging for a search stops at the first page whose listing set matches the last
+    crawl: results are newest-first, so an unchanged page means the pages behind it
+    have nothing new either.
+    """
+
+    def __init__(self, store, base_url=BASE_URL, workers=4, max_pages=MAX_PAGES, headless=True):
+        self.store = store
+        self.base_url = base_url
+        self.workers = workers
+        self.max_pages = max_pages
+        self.headless = headless
+        self._local = threading.local()
+        self._drivers = []
+        self._drivers_lock = threading.Lock()
+
+    def _driver(self):
+        driver = getattr(self._local, "driver", None)
+        if driver is None:
+            driver = self._local.driver = make_driver(self.headless)
+            with self._drivers_lock:
+                self._drivers.append(driver)
+        return driver
+
+    def crawl_query(self, title, location):
+        query = f"{title}@{location}"
+        stats = {"query": query, "pages": 0, "unchanged": 0, "listings": 0, "new": 0, "error": None}
+        driver = self._driver()
+        for page in range(self.max_pages):
+            driver.get(search_url(self.base_url, title, location, page))
+            listings, has_next = extract_listings(driver)
+            stats["pages"] += 1
+            stats["listings"] += len(listings)
+            if listings and self.store.page_hash(query, page) == page_hash(listings):
+                stats["unchanged"] += 1
+                break
+            stats["new"] += self.store.save_page(query, page, listings)
+            if not has_next or not listings:
+                break
+        return stats
+
+    def run(self, searches):
+        """Crawl (title, location) pairs. Returns per-query stats and totals."""
+        start = time.perf_counter()
+        results = []
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="scraper") as pool:
+            futures = {pool.submit(self.crawl_query, t, l): f"{t}@{l}" for t, l in searches}
+            for future in as_completed(futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    results.append({"query": futures[future], "pages": 0, "unchanged": 0, "listings": 0,
+                                    "new": 0, "error": f"{type(e).__name__}: {e}"})
+        elapsed = time.perf_counter() - start
+        totals = {k: sum(r[k] for r in results) for k in ("pages", "unchanged", "listings", "new")}
+        return {"queries": results, "totals": totals, "failed": sum(1 for r in results if r["error"]),
+                "seconds": round(elapsed, 2)}
+
+    def close(self):
+        with self._drivers_lock:
+            for driver in self._drivers:
+                driver.quit()
+            self._drivers = []
+
+
+def parse_search(text):
+    """'IT Support@Remote' -> ('IT Support', 'Remote')."""
+    title, _, location = text.partition("@")
+    return title.strip(), location.strip()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep job searches with headless Chrome workers.")
+    parser.add_argument("--query", action="append", default=[], help="'title@location'; repeatable")
+    parser.add_argument("--queries-file", help="one 'title@location' per line")
+    parser.add_argument("--store", default=STORE_PATH)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--max-pages", type=int, default=MAX_PAGES)
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--mock", action="store_true", help="crawl a local fake job board instead")
+    parser.add_argument("--fixtures", help="crawl saved HTML pages from this directory instead")
+    parser.add_argument("--show", action="store_true", help="show the browser windows")
+    args = parser.parse_args()
+
+    searches = [parse_search(q) for q in args.query]
+    if args.queries_file:
+        with open(args.queries_file, "r", encoding="utf-8") as f:
+            searches += [parse_search(line) for line in f if line.strip() and not line.startswith("#")]
+    if not searches:
+        parser.error("give at least one --query or a --queries-file")
+
+    base_url, server = args.base_url, None
+    if args.mock or args.fixtures:
+        import sys
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+        from mock_job_site import serve
+        server, _ = serve(port=0, fixtures_dir=args.fixtures)
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    scraper = JobScraper(ListingStore(args.store), base_url=base_url, workers=args.workers,
+                         max_pages=args.max_pages, headless=not args.show)
+    try:
+        report = scraper.run(searches)
+    finally:
+        scraper.close()
+        if server:
+            server.shutdown()
+
+    totals = report["totals"]
+    print(json.dumps(report["queries"], indent=2))
+    print(f"✅ {len(searches)} searches in {report['seconds']}s: {totals['pages']} pages, "
+          f"{totals['unchanged']} unchanged, {totals['new']} new listings "
+          f"({scraper.store.count()} stored), {report['failed']} failed.")
@@ -0,0 +1,167 @@
+# lexical_index.py
+
+import heapq
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+
+# Keeps tokens like "0x80070005", "az-900", "sec+" and "john.doe" in one piece.
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9_\-\.+#]*")
+
+
+def tokenize(text):
+    return [t.rstrip(".-") for t in TOKEN_RE.findall(text.lower()) if t.rstrip(".-")]
+
+
+class LexicalIndex:
+    """In-memory BM25 inverted index over the same chunks stored in the Chroma collection."""
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs = []        # [{"node_id", "text", "source", "prev", "next"}]
+        self.doc_lens = []
+        self.postings = {}    # term -> [[doc_idx, bm25 term weight], ...]
+        self.avg_len = 0.0
+        self.signature = None
+        self._by_id = {}
+
+    # === Build ===
+    @classmethod
+    def build(cls, docs, signature=None, **kwargs):
+        index = cls(**kwargs)
+        term_counts = []
+        for doc in docs:
+            tokens = tokenize(doc["text"])
+            term_counts.append(Counter(tokens))
+            index.docs.append(doc)
+            index.doc_lens.append(len(tokens))
+        index.avg_len = sum(index.doc_lens) / len(index.doc_lens) if index.doc_lens else 0.0
+
+        # Store the document-dependent half of BM25 per posting so a query only
+        # multiplies by idf and adds.
+        postings = defaultdict(list)
+        for doc_idx, counts in enumerate(term_counts):
+            norm = 1 - index.b + index.b * index.doc_lens[doc_idx] / (index.avg_len or 1)
+            for term, tf in counts.items():
+                weight = tf * (index.k1 + 1) / (tf + index.k1 * norm)
+                postings[term].append([doc_idx, round(weight, 4)])
+        index.postings = dict(postings)
+        index.signature = signature
+        index._by_id = {d["node_id"]: i for i, d in enumerate(index.docs)}
+        return index
+
+    # === Query ===
+    def search(self, query, k=5, context_chars=300):
+        n = len(self.docs)
+        if not n:
+            return []
+        plists = [self.postings[t] for t in set(tokenize(query)) if t in self.postings]
+        # Terms found in most chunks add almost nothing to the ranking but cost the most
+        # to score, so drop them whenever the query has something more selective.
+        selective = [pl for pl in plists if len(pl) <= n // 2]
+        scores = defaultdict(float)
+        for plist in selective or plists:
+            idf = math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            for doc_idx, weight in plist:
+                scores[doc_idx] += idf * weight
+
+        top = heapq.nlargest(k, scores.items(), key=lambda kv: kv[1])
+        hits = []
+        for rank, (doc_idx, score) in enumerate(top, start=1):
+            doc = self.docs[doc_idx]
+            hits.append({
+                "rank": rank,
+                "score": score,
+                "source": doc["source"],
+                "text": doc["text"],
+                "before": self._neighbour(doc.get("prev"), context_chars, tail=True),
+                "after": self._neighbour(doc.get("next"), context_chars, tail=False),
+                "node_id": doc["node_id"],
+            })
+        return hits
+
+    def _neighbour(self, node_id, context_chars, tail):
+        idx = self._by_id.get(node_id)
+        if idx is None or not context_chars:
+            return ""
+        text = self.docs[idx]["text"]
+        return text[-context_chars:] if tail else text[:context_chars]
+
+    # === Persistence ===
+    def save(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"signature": self.signature, "k1": self.k1, "b": self.b, "docs": self.docs,
+                       "doc_lens": self.doc_lens, "postings": self.postings}, f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls(k1=data["k1"], b=data["b"])
+        index.docs = data["docs"]
+        index.doc_lens = data["doc_lens"]
+        index.postings = data["postings"]
+        index.avg_len = sum(index.doc_lens) / len(index.doc_lens) if index.doc_lens else 0.0
+        index.signature = data["signature"]
+        index._by_id = {d["node_id"]: i for i, d in enumerate(index.docs)}
+        return index
+
+
+# === Reading chunks out of Chroma ===
+def chroma_docs(collection, page_size=1000):
+    """Yield chunk dicts from a Chroma collection written by llama_index (or plain Chroma)."""
+    offset = 0
+    while True:
+        page = collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+        ids = page["ids"]
+        if not ids:
+            return
+        for node_id, text, metadata in zip(ids, page["documents"], page["metadatas"]):
+            metadata = metadata or {}
+            prev_id = next_id = None
+            node_content = metadata.get("_node_content")
+            if node_content:
+                try:
+                    relationships = json.loads(node_content).get("relationships", {})
+                    prev_id = (relationships.get("2") or {}).get("node_id")
+                    next_id = (relationships.get("3") or {}).get("node_id")
+                except (ValueError, AttributeError):
+                    pass
+            yield {
+                "node_id": node_id,
+                "text": text or "",
+                "source": metadata.get("file_name") or metadata.get("source") or metadata.get("file_path") or "unknown",
+                "prev": prev_id,
+                "next": next_id,
+            }
+        offset += len(ids)
+
+
+# === Reciprocal-rank fusion ===
+def reciprocal_rank_fusion(result_lists, k=5, rrf_k=60):
+    """Merge ranked hit lists: each hit scores sum(1 / (rrf_k + rank)) across lists."""
+    fused, hits_by_id = defaultdict(float), {}
+    for name, hits in result_lists.items():
+        for hit in hits:
+            node_id = hit["node_id"]
+            fused[node_id] += 1.0 / (rrf_k + hit["rank"])
+            merged = hits_by_id.setdefault(node_id, dict(hit))
+            merged[f"{name}_score"] = hit["score"]
+            if not merged.get("before"):
+                merged["before"] = hit.get("before", "")
+            if not merged.get("after"):
+                merged["after"] = hit.get("after", "")
+
+    ranked = sorted(fused.items(), key=lambda kv: kv[1], reverse=True)[:k]
+    results = []
+    for rank, (node_id, score) in enumerate(ranked, start=1):
+        hit = hits_by_id[node_id]
+        hit["rank"] = rank
+        hit["score"] = score
+        results.append(hit)
+    return results
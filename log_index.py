@@ -0,0 +1,236 @@
+# log_index.py
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from conversation_store import FILE_RE as JSONL_NAME_RE, format_turn, iter_records
+
+CONVERSATIONS_DIR = "conversations"
+LOG_NAME_RE = re.compile(r"^(?P<persona>.+)_(?P<date>\d{4}-\d{2}-\d{2})\.md$")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    name TEXT PRIMARY KEY,
+    persona TEXT,
+    date TEXT,
+    size INTEGER,
+    mtime REAL
+);
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY,
+    file TEXT NOT NULL,
+    persona TEXT,
+    date TEXT,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    preview TEXT
+);
+CREATE INDEX IF NOT EXISTS turns_file ON turns(file, offset);
+CREATE INDEX IF NOT EXISTS turns_filter ON turns(persona, date);
+"""
+
+
+def split_turns(data, base_offset=0):
+    """Yield (offset, length) for each USER/AI turn in a chunk of log bytes."""
+    starts = [m.start() for m in re.finditer(rb"(?m)^USER: ", data)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    for i, start in enumerate(starts):
+        end = starts[i + 1] if i + 1 < len(starts) else len(data)
+        if data[start:end].strip():
+            yield base_offset + start, end - start
+
+
+class LogIndex:
+    """Incrementally maintained index of chat log turns.
+
+    Stores, per turn, the file, persona, date and byte range, plus a full-text index
+    of the turn text. Appended logs are parsed only from the last indexed byte, and
+    the viewer reads just the turns on the current page from disk. Covers both the
+    JSONL conversation store (log_dir/conversations) and legacy <persona>_<date>.md logs.
+    """
+
+    def __init__(self, log_dir, db_path=None, check_interval=2.0):
+        self.log_dir = str(log_dir)
+        self.db_path = db_path or os.path.join(self.log_dir, ".log_index.sqlite")
+        self.check_interval = check_interval
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            try:
+                conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS turns_fts USING fts5(body)")
+                self.has_fts = True
+            except sqlite3.OperationalError:
+                self.has_fts = False
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # === Incremental update ===
+    def update(self, force=False):
+        """Index new logs and newly appended turns. Returns the number of turns added."""
+        now = time.monotonic()
+        if not force and now - self._last_check < self.check_interval:
+            return 0
+        self._last_check = now
+        added = 0
+        with self._lock, self._connect() as conn:
+            known = {row[0]: row[1:] for row in conn.execute("SELECT name, size, mtime FROM files")}
+            on_disk = set()
+            for name, path, stat, match in self._log_files():
+                on_disk.add(name)
+                size, mtime = known.get(name, (0, None))
+                if mtime == stat.st_mtime and size <= stat.st_size:
+                    continue
+                if stat.st_size < size:
+                    self._drop_file(conn, name)  # rewritten or truncated: start over
+                    size = 0
+                if match.re is JSONL_NAME_RE:
+                    count, size = self._index_jsonl(conn, path, name, size)
+                    persona = None
+                else:
+                    count = self._index_range(conn, path, name, match["persona"], match["date"], size, stat.st_size)
+                    persona, size = match["persona"], stat.st_size
+                added += count
+                conn.execute("INSERT OR REPLACE INTO files (name, persona, date, size, mtime) VALUES (?, ?, ?, ?, ?)",
+                             (name, persona, match["date"], size, stat.st_mtime))
+            for name in set(known) - on_disk:
+                self._drop_file(conn, name)
+        return added
+
+    def _log_files(self):
+        """Yield (name relative to log_dir, path, stat, name match) for every log file."""
+        for subdir, name_re in ((CONVERSATIONS_DIR, JSONL_NAME_RE), ("", LOG_NAME_RE)):
+            directory = os.path.join(self.log_dir, subdir)
+            if not os.path.isdir(directory):
+                continue
+            for entry in os.scandir(directory):
+                match = name_re.match(entry.name)
+                if match and entry.is_file():
+                    name = f"{subdir}/{entry.name}" if subdir else entry.name
+                    yield name, entry.path, entry.stat(), match
+
+    def _index_jsonl(self, conn, path, name, start):
+        """Index complete records from byte start. Returns (turns added, end of last complete line)."""
+        count, end = 0, start
+        for offset, length, record in iter_records(path, start):
+            body = format_turn(record)
+            cur = conn.execute(
+                "INSERT INTO turns (file, persona, date, offset, length, preview) VALUES (?, ?, ?, ?, ?, ?)",
+                (name, record.get("persona"), (record.get("ts") or "")[:10], offset, length, _preview(body)),
+            )
+            if self.has_fts:
+                conn.execute("INSERT INTO turns_fts (rowid, body) VALUES (?, ?)", (cur.lastrowid, body))
+            count += 1
+            end = offset + length
+        return count, end
+
+    def _index_range(self, conn, path, name, persona, date, start, end):
+        with open(path, "rb") as f:
+            f.seek(start)
+            data = f.read(end - start)
+        count = 0
+        for offset, length in split_turns(data, base_offset=start):
+            body = data[offset - start:offset - start + length].decode("utf-8", errors="replace")
+            cur = conn.execute(
+                "INSERT INTO turns (file, persona, date, offset, length, preview) VALUES (?, ?, ?, ?, ?, ?)",
+                (name, persona, date, offset, length, _preview(body)),
+            )
+            if self.has_fts:
+                conn.execute("INSERT INTO turns_fts (rowid, body) VALUES (?, ?)", (cur.lastrowid, body))
+            count += 1
+        return count
+
+    def _drop_file(self, conn, name):
+        if self.has_fts:
+            conn.execute("DELETE FROM turns_fts WHERE rowid IN (SELECT id FROM turns WHERE file = ?)", (name,))
+        conn.execute("DELETE FROM turns WHERE file = ?", (name,))
+        conn.execute("DELETE FROM files WHERE name = ?", (name,))
+
+    # === Queries ===
+    def _where(self, personas, date_from, date_to, search):
+        clauses, params = [], []
+        if personas:
+            clauses.append(f"t.persona IN ({','.join('?' * len(personas))})")
+            params.extend(personas)
+        if date_from:
+            clauses.append("t.date >= ?")
+            params.append(str(date_from))
+        if date_to:
+            clauses.append("t.date <= ?")
+            params.append(str(date_to))
+        if search:
+            if self.has_fts:
+                clauses.append("t.id IN (SELECT rowid FROM turns_fts WHERE turns_fts MATCH ?)")
+                params.append(_fts_query(search))
+            else:
+                clauses.append("t.preview LIKE ?")
+                params.append(f"%{search}%")
+        return (f"WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+    def count(self, personas=None, date_from=None, date_to=None, search=None):
+        where, params = self._where(personas, date_from, date_to, search)
+        with self._connect() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM turns t {where}", params).fetchone()[0]
+
+    def page(self, page=0, page_size=20, personas=None, date_from=None, date_to=None, search=None):
+        """Newest-first turns for one page: dicts with file, persona, date, offset, length, preview."""
+        where, params = self._where(personas, date_from, date_to, search)
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(
+                f"SELECT t.file, t.persona, t.date, t.offset, t.length, t.preview FROM turns t {where} "
+                "ORDER BY t.date DESC, t.file DESC, t.offset DESC LIMIT ? OFFSET ?",
+                [*params, page_size, page * page_size],
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def personas(self):
+        with self._connect() as conn:
+            return [r[0] for r in conn.execute(
+                "SELECT DISTINCT persona FROM turns WHERE persona IS NOT NULL ORDER BY persona")]
+
+    def read_turn(self, turn):
+        """Read one turn's text straight from its log file."""
+        with open(os.path.join(self.log_dir, turn["file"]), "rb") as f:
+            f.seek(turn["offset"])
+            data = f.read(turn["length"])
+        if turn["file"].endswith(".jsonl"):
+            return format_turn(json.loads(data))
+        return data.decode("utf-8", errors="replace")
+
+
+def _preview(body, limit=160):
+    first = body.strip().splitlines()[0] if body.strip() else ""
+    return first[:limit]
+
+
+def _fts_query(search):
+    # Quote each word so user input like "AZ-900" or "C++" isn't parsed as FTS syntax.
+    words = [w.replace('"', '""') for w in search.split()]
+    return " ".join(f'"{w}"' for w in words)
+
+
+# === Process-wide index ===
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_log_index(log_dir, **kwargs):
+    key = os.path.abspath(str(log_dir))
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = LogIndex(log_dir, **kwargs)
+        return _indexes[key]
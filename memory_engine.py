@@ -0,0 +1,339 @@
+# memory_engine.py
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import perf_trace
+from startup_profiler import timed
+from lexical_index import LexicalIndex, chroma_docs, reciprocal_rank_fusion
+
+COLLECTION_NAME = "chatgpt-index"
+EMBED_MODEL_NAME = "nomic-ai/nomic-embed-text-v1"
+
+
+def _query_instruction(model_name):
+    """Use the same query prefix llama_index's HuggingFaceEmbedding would, so stored vectors still match."""
+    try:
+        from llama_index.embeddings.huggingface.utils import get_query_instruct_for_model_name
+    except ImportError:
+        return ""
+    return get_query_instruct_for_model_name(model_name) or ""
+
+
+def _text_instruction(model_name):
+    """Document-side counterpart of _query_instruction, for code that embeds chunks itself."""
+    try:
+        from llama_index.embeddings.huggingface.utils import get_text_instruct_for_model_name
+    except ImportError:
+        return ""
+    return get_text_instruct_for_model_name(model_name) or ""
+
+
+# === Engine states ===
+COLD = "cold"
+WARMING = "warming"
+READY = "ready"
+ERROR = "error"
+
+
+class MemoryEngine:
+    """Loads the embedding model and the Chroma-backed index once per process.
+
+    Streamlit re-executes the dashboard script on every widget click, but imported
+    modules stay in memory, so the engine kept here survives reruns. The index is
+    reloaded only when the files under persist_dir change.
+    """
+
+    def __init__(self, persist_dir, collection_name=COLLECTION_NAME, embed_model_name=EMBED_MODEL_NAME,
+                 check_interval=2.0, embed_cache_path=None, embed_threads=None, lexical_index_path=None):
+        self.persist_dir = persist_dir
+        self.collection_name = collection_name
+        self.embed_model_name = embed_model_name
+        # Keep the cache outside persist_dir so writing to it never looks like an index change.
+        self.embed_cache_path = embed_cache_path or os.path.join(
+            os.path.dirname(os.path.normpath(persist_dir)), "embedding_cache.sqlite")
+        self.embed_threads = embed_threads
+        self.lexical_index_path = lexical_index_path or os.path.join(
+            os.path.dirname(os.path.normpath(persist_dir)), "lexical_index.json")
+        self._lexical = None
+        self._lexical_checked = 0.0
+        self._lexical_lock = threading.Lock()
+        self.embedding_service = None
+        self.check_interval = check_interval
+        self.state = COLD
+        self.error = None
+        self.load_seconds = None
+        self.embed_model = None
+        self.vector_store = None
+        self.index = None
+        self._query_engine = None
+        self._retrievers = {}
+        self._signature = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._executor = None
+        self._executor_lock = threading.Lock()  # not self._lock, which is held while loading
+
+    # === Change detection ===
+    def _dir_signature(self):
+        count, size, newest = 0, 0, 0.0
+        for root, _, files in os.walk(self.persist_dir):
+            for fn in files:
+                try:
+                    st = os.stat(os.path.join(root, fn))
+                except OSError:
+                    continue
+                count += 1
+                size += st.st_size
+                newest = max(newest, st.st_mtime)
+        return count, size, newest
+
+    def is_stale(self):
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return False
+        self._last_check = now
+        return self._dir_signature() != self._signature
+
+    # === Loading ===
+    def _load(self):
+        start = time.perf_counter()
+        with timed("chromadb", "import"):
+            import chromadb
+        with timed("llama_index", "import"):
+            from llama_index.core import StorageContext, load_index_from_storage
+            from llama_index.core.settings import Settings
+            from llama_index.vector_stores.chroma import ChromaVectorStore
+        with timed("embedding model", "import"):
+            from embedding_service import EmbeddingService, llama_index_embedding
+
+        Settings.llm = None
+        signature = self._dir_signature()
+        if self.embed_model is None:
+            with timed("embedding model"):
+                self.embedding_service = EmbeddingService(
+                    self.embed_model_name, trust_remote_code=True, normalize=True,
+                    cache_path=self.embed_cache_path, num_threads=self.embed_threads,
+                    query_instruction=_query_instruction(self.embed_model_name),
+                )
+                self.embed_model = llama_index_embedding(self.embedding_service)
+        with timed("chromadb"):
+            if self.vector_store is not None:
+                # Chroma caches one client per path; drop it so a reload sees what the
+                # ingest process wrote since.
+                chromadb.api.client.SharedSystemClient.clear_system_cache()
+            chroma_client = chromadb.PersistentClient(path=self.persist_dir)
+            chroma_collection = chroma_client.get_or_create_collection(self.collection_name)
+            self.vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
+        with timed("llama_index"):
+            storage_context = StorageContext.from_defaults(persist_dir=self.persist_dir)
+            self.index = load_index_from_storage(storage_context, vector_store=self.vector_store,
+                                                 embed_model=self.embed_model)
+        self._query_engine = None
+        self._retrievers = {}
+        self._signature = signature
+        self._last_check = time.monotonic()
+        self.load_seconds = time.perf_counter() - start
+
+    def _load_locked(self):
+        with self._lock:
+            if self.state == READY and self.index is not None and self._signature == self._dir_signature():
+                return
+            self.state = WARMING
+            try:
+                self._load()
+                self.state = READY
+                self.error = None
+            except Exception as e:
+                self.state = ERROR
+                self.error = e
+
+    def warm_up(self, background=True):
+        """Start loading if nothing has been loaded yet. Returns immediately when background=True."""
+        if self.state != COLD or (self._thread and self._thread.is_alive()):
+            return
+        self.state = WARMING
+        if background:
+            self._thread = threading.Thread(target=self._load_locked, name="memory-warmup", daemon=True)
+            self._thread.start()
+        else:
+            self._load_locked()
+
+    def retry(self):
+        """Clear a failed load and start warming up again."""
+        if self.state == ERROR:
+            self.state, self.error = COLD, None
+            self.warm_up()
+
+    def get_index(self):
+        """Return the loaded index, loading or reloading it first if needed."""
+        if self.state != READY or self.index is None or self.is_stale():
+            self._load_locked()
+        if self.state == ERROR:
+            raise self.error
+        return self.index
+
+    def query_engine(self):
+        index = self.get_index()
+        if self._query_engine is None:
+            self._query_engine = index.as_query_engine()
+        return self._query_engine
+
+    def retriever(self, k):
+        index = self.get_index()
+        if k not in self._retrievers:
+            self._retrievers[k] = index.as_retriever(similarity_top_k=k)
+        return self._retrievers[k]
+
+    def retrieve(self, query, k=5, score_cutoff=0.0, context_chars=300, timings=None):
+        """Return the top-k matching chunks as dicts, skipping the LLM synthesis step entirely.
+
+        Each hit carries its similarity score, source file, text, and the tail/head of the
+        neighbouring chunks (when the docstore knows them) as surrounding context. The query
+        is embedded up front so embed_s and search_s can be reported separately in timings.
+        """
+        from llama_index.core import QueryBundle
+
+        retriever = self.retriever(k)
+        start = time.perf_counter()
+        embedding = self.embedding_service.embed_query(query)
+        embedded = time.perf_counter()
+        results = retriever.retrieve(QueryBundle(query_str=query, embedding=embedding))
+        searched = time.perf_counter()
+        perf_trace.record("query embedding", start, embedded, "memory")
+        perf_trace.record("vector search", embedded, searched, "memory", k=k)
+        if timings is not None:
+            timings["embed_s"] = embedded - start
+            timings["search_s"] = timings.get("search_s", 0.0) + searched - embedded
+        hits = []
+        for rank, result in enumerate(results, start=1):
+            if result.score is not None and result.score < score_cutoff:
+                continue
+            node = result.node
+            metadata = node.metadata or {}
+            hits.append({
+                "rank": rank,
+                "score": result.score,
+                "source": metadata.get("file_name") or metadata.get("source") or metadata.get("file_path") or "unknown",
+                "text": node.get_content(),
+                "before": self._neighbour_text(node.prev_node, context_chars, tail=True),
+                "after": self._neighbour_text(node.next_node, context_chars, tail=False),
+                "node_id": node.node_id,
+            })
+        return hits
+
+    def _neighbour_text(self, related, context_chars, tail):
+        if related is None or not context_chars:
+            return ""
+        try:
+            text = self.index.docstore.get_node(related.node_id).get_content()
+        except Exception:
+            return ""
+        return text[-context_chars:] if tail else text[:context_chars]
+
+    # === Lexical (BM25) companion index ===
+    def lexical(self):
+        """Return the BM25 index over the collection's chunks, rebuilding it if the store changed.
+
+        Needs only chromadb (and only when rebuilding), never the embedding model, so it
+        answers while the engine is still warming up.
+        """
+        now = time.monotonic()
+        if self._lexical is not None and now - self._lexical_checked < self.check_interval:
+            return self._lexical
+        with self._lexical_lock:
+            self._lexical_checked = now
+            signature = list(self._dir_signature())
+            if self._lexical is not None and self._lexical.signature == signature:
+                return self._lexical
+            if os.path.exists(self.lexical_index_path):
+                with timed("lexical index", "load"):
+                    index = LexicalIndex.load(self.lexical_index_path)
+                if index.signature == signature:
+                    self._lexical = index
+                    return index
+            with timed("lexical index", "build"):
+                import chromadb
+                chroma_client = chromadb.PersistentClient(path=self.persist_dir)
+                collection = chroma_client.get_or_create_collection(self.collection_name)
+                index = LexicalIndex.build(chroma_docs(collection), signature=signature)
+                index.save(self.lexical_index_path)
+            self._lexical = index
+            return index
+
+    def lexical_retrieve(self, query, k=5, timings=None):
+        index = self.lexical()
+        start = time.perf_counter()
+        hits = index.search(query, k=k)
+        searched = time.perf_counter()
+        perf_trace.record("keyword search", start, searched, "memory", k=k)
+        if timings is not None:
+            timings["search_s"] = timings.get("search_s", 0.0) + searched - start
+        return hits
+
+    def hybrid_retrieve(self, query, k=5, score_cutoff=0.0, rrf_k=60, timings=None):
+        """Fuse vector and BM25 rankings with reciprocal-rank fusion."""
+        vector_hits = self.retrieve(query, k=k * 2, score_cutoff=score_cutoff, timings=timings)
+        lexical_hits = self.lexical_retrieve(query, k=k * 2, timings=timings)
+        return reciprocal_rank_fusion({"vector": vector_hits, "lexical": lexical_hits}, k=k, rrf_k=rrf_k)
+
+    def search(self, query, k=5, score_cutoff=0.0, mode="hybrid", timings=None):
+        """Return (hits, mode_used). Falls back to lexical-only while the vector side is not ready.
+
+        After a failed load the engine stays in ERROR (see self.error) until retry() is called.
+        If timings is a dict, embed_s and search_s are added to it.
+        """
+        if mode != "lexical" and self.state != READY:
+            if self.state != ERROR:
+                self.warm_up()
+            mode = "lexical"
+        if mode == "lexical":
+            return self.lexical_retrieve(query, k=k, timings=timings), mode
+        if mode == "vector":
+            return self.retrieve(query, k=k, score_cutoff=score_cutoff, timings=timings), mode
+        return self.hybrid_retrieve(query, k=k, score_cutoff=score_cutoff, timings=timings), mode
+
+    def search_async(self, query, **kwargs):
+        """Run search() on the engine's worker thread; returns a Future of (hits, mode_used)."""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory-search")
+        return self._executor.submit(self.search, query, **kwargs)
+
+    def status(self):
+        if self.state == READY and self.load_seconds is not None:
+            return f"{READY} (loaded in {self.load_seconds:.1f}s)"
+        if self.state == ERROR:
+            return f"{ERROR}: {self.error}"
+        return self.state
+
+
+# === Optional answer synthesis ===
+def synthesize_answer(query, hits, model="mistral"):
+    """Ask a local Ollama model to answer the query from already-retrieved chunks."""
+    import ollama
+
+    context = "\n\n".join(f"[{h['rank']}] ({h['source']})\n{h['text']}" for h in hits)
+    prompt = (
+        "Answer the question using only the memory excerpts below. "
+        "Cite excerpt numbers in brackets.\n\n"
+        f"{context}\n\nQuestion: {query}\nAnswer:"
+    )
+    response = ollama.chat(model=model, messages=[{"role": "user", "content": prompt}])
+    return response["message"]["content"]
+
+
+# === Process-wide singletons ===
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_memory_engine(persist_dir, **kwargs):
+    """Return the shared engine for persist_dir, creating it on first use."""
+    key = os.path.abspath(persist_dir)
+    with _engines_lock:
+        if key not in _engines:
+            _engines[key] = MemoryEngine(persist_dir, **kwargs)
+        return _engines[key]
@@ -0,0 +1,170 @@
+# model_manager.py
+
+import threading
+import time
+
+# keep_alive values Ollama understands: a duration string, seconds, 0 (unload now) or -1 (forever).
+DEFAULT_POLICY = {
+    "active": "30m",   # the model selected in the sidebar
+    "recent": "5m",    # any other model after it served a request
+    "min_free_gb": 2.0,  # evict LRU models when a load would leave less free RAM than this
+    "max_resident": 2,   # never keep more models loaded than this
+}
+
+# Loading into memory takes more than the weights on disk (KV cache, graph buffers).
+LOAD_OVERHEAD = 1.2
+
+LOADING = "loading"
+RESIDENT = "resident"
+FAILED = "failed"
+
+
+def _available_bytes():
+    """Free RAM in bytes, or None when psutil isn't installed."""
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.virtual_memory().available
+
+
+class ModelManager:
+    """Keeps the chosen Ollama model warm and the set of loaded models within RAM.
+
+    Pre-warms a model (an empty generate call) on a background thread when it is selected,
+    hands out keep_alive values per request, and unloads least-recently-used models
+    (keep_alive=0) when loading another would leave too little free memory.
+    """
+
+    def __init__(self, policy=None):
+        self.policy = dict(DEFAULT_POLICY, **(policy or {}))
+        self.active = None
+        self.last_used = {}     # model -> time.time() of its last request or prewarm
+        self.load_state = {}    # model -> LOADING / RESIDENT / FAILED
+        self.load_seconds = {}  # model -> seconds the last prewarm took
+        self.errors = {}
+        self._sizes = {}        # model -> bytes it took when resident (or its disk size)
+        self._lock = threading.Lock()
+
+    # === Ollama queries ===
+    def resident(self):
+        """Models Ollama currently has loaded: dicts with name, size, size_vram, expires_at."""
+        import ollama
+
+        models = []
+        for m in ollama.ps()["models"]:
+            name = m.get("name") or m.get("model")
+            self._sizes[_base_name(name)] = m.get("size") or 0
+            models.append({
+                "name": name,
+                "size": m.get("size") or 0,
+                "size_vram": m.get("size_vram") or 0,
+                "expires_at": m.get("expires_at"),
+                "last_used": self.last_used.get(_base_name(name)),
+            })
+        return models
+
+    def _estimated_size(self, model):
+        if model in self._sizes:
+            return self._sizes[model]
+        import ollama
+
+        for m in ollama.list()["models"]:
+            if _base_name(m.get("name") or m.get("model")) == model:
+                self._sizes[model] = int((m.get("size") or 0) * LOAD_OVERHEAD)
+                return self._sizes[model]
+        return 0
+
+    # === Policy ===
+    def keep_alive(self, model):
+        return self.policy["active"] if model == self.active else self.policy["recent"]
+
+    def touch(self, model):
+        self.last_used[model] = time.time()
+
+    def request_options(self, model):
+        """kwargs to pass to ollama.chat for this model (and mark it recently used)."""
+        self.touch(model)
+        return {"keep_alive": self.keep_alive(model)}
+
+    # === Selection / prewarm ===
+    def select(self, model):
+        """Call on every rerun with the sidebar choice; prewarms only when it changed."""
+        if model == self.active:
+            return False
+        previous, self.active = self.active, model
+        threading.Thread(target=self._switch, args=(model, previous), daemon=True,
+                         name=f"prewarm-{model}").start()
+        return True
+
+    def _switch(self, model, previous):
+        with self._lock:
+            try:
+                import ollama
+
+                resident = {_base_name(m["name"]) for m in self.resident()}
+                if previous in resident:
+                    # Let the old model expire on the shorter idle timer instead of holding RAM for 30m.
+                    # (An empty generate loads a model, so only do this while it is still loaded.)
+                    ollama.generate(model=previous, prompt="", keep_alive=self.policy["recent"])
+                self.make_room(model)
+                self.load_state[model] = LOADING
+                start = time.perf_counter()
+                ollama.generate(model=model, prompt="", keep_alive=self.keep_alive(model))
+                self.load_seconds[model] = time.perf_counter() - start
+                self.load_state[model] = RESIDENT
+                self.errors.pop(model, None)
+                self.touch(model)
+            except Exception as e:
+                self.load_state[model] = FAILED
+                self.errors[model] = str(e)
+
+    def make_room(self, model):
+        """Unload least-recently-used models until model fits. Returns the names unloaded."""
+        import ollama
+
+        loaded = [m for m in self.resident() if _base_name(m["name"]) != model]
+        need = self._estimated_size(model)
+        evicted = []
+        # Oldest first; models this process never used count as the oldest.
+        loaded.sort(key=lambda m: m["last_used"] or 0)
+        # Ollama frees memory asynchronously, so count evicted sizes rather than re-reading RAM.
+        free = _available_bytes()
+        while loaded:
+            too_many = len(loaded) + 1 > self.policy["max_resident"]
+            too_tight = free is not None and free - need < self.policy["min_free_gb"] * 1024 ** 3
+            if not (too_many or too_tight):
+                break
+            victim = loaded.pop(0)
+            ollama.generate(model=victim["name"], prompt="", keep_alive=0)
+            if free is not None:
+                free += victim["size"]
+            self.load_state.pop(_base_name(victim["name"]), None)
+            evicted.append(victim["name"])
+        return evicted
+
+    def status(self, model):
+        state = self.load_state.get(model)
+        if state == RESIDENT and model in self.load_seconds:
+            return f"{RESIDENT} (warmed in {self.load_seconds[model]:.1f}s)"
+        if state == FAILED:
+            return f"{FAILED}: {self.errors.get(model)}"
+        return state or "cold"
+
+
+def _base_name(name):
+    """'mistral:latest' -> 'mistral', matching the names used in the sidebar."""
+    return name.split(":")[0] if name and name.endswith(":latest") else name
+
+
+# === Process-wide manager ===
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_model_manager(**kwargs):
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = ModelManager(**kwargs)
+        return _manager
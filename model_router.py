@@ -0,0 +1,170 @@
+# model_router.py
+
+import json
+import os
+import statistics
+import threading
+from collections import deque
+
+# Best-first order used when several models can meet the latency target.
+PREFERENCE = ["llama3", "mistral", "openhermes", "dolphin-mistral", "phi3"]
+
+WINDOW = 50                  # recent requests kept per model
+DEFAULT_TTFT_S = 2.0         # priors for models with no measurements yet
+DEFAULT_TOKENS_PER_SEC = 15.0
+DEFAULT_REPLY_TOKENS = 200
+DEFAULT_LOAD_S = 15.0        # cold-load penalty when a model isn't resident
+MAX_FAILURE_RATE = 0.3
+SLOWDOWN_FACTOR = 0.5        # recent tok/s below this share of the median counts as overloaded
+
+
+class ModelStats:
+    """Rolling window of measured requests for one model."""
+
+    def __init__(self, window=WINDOW):
+        self.samples = deque(maxlen=window)
+
+    def add(self, stats):
+        self.samples.append({
+            "ttft_s": stats.get("ttft_s"),
+            "prompt_tokens": stats.get("prompt_tokens") or 0,
+            "tokens": stats.get("tokens") or 0,
+            "tokens_per_sec": stats.get("tokens_per_sec"),
+            "failed": bool(stats.get("error")),
+        })
+
+    def _values(self, field, samples=None):
+        return [s[field] for s in (samples or self.samples) if not s["failed"] and s[field]]
+
+    @property
+    def count(self):
+        return len(self.samples)
+
+    @property
+    def failure_rate(self):
+        return sum(s["failed"] for s in self.samples) / len(self.samples) if self.samples else 0.0
+
+    @property
+    def ttft_s(self):
+        values = self._values("ttft_s")
+        return statistics.median(values) if values else None
+
+    @property
+    def tokens_per_sec(self):
+        values = self._values("tokens_per_sec")
+        return statistics.median(values) if values else None
+
+    @property
+    def reply_tokens(self):
+        values = self._values("tokens")
+        return statistics.median(values) if values else DEFAULT_REPLY_TOKENS
+
+    def prefill_s_per_token(self):
+        """Median prompt-processing seconds per prompt token, from ttft / prompt_tokens."""
+        values = [s["ttft_s"] / s["prompt_tokens"] for s in self.samples
+                  if not s["failed"] and s["ttft_s"] and s["prompt_tokens"] > 20]
+        return statistics.median(values) if values else None
+
+    def overloaded(self):
+        """The last few requests failed, or ran much slower than this model usually does."""
+        recent = list(self.samples)[-3:]
+        if len(recent) == 3 and all(s["failed"] for s in recent):
+            return True
+        median, recent_rates = self.tokens_per_sec, self._values("tokens_per_sec", recent)
+        return bool(median and len(recent_rates) == 3 and max(recent_rates) < median * SLOWDOWN_FACTOR)
+
+
+class ModelRouter:
+    """Picks a model per request from measured TTFT, tokens/sec and failure rate.
+
+    The estimate for a request is time to first token (scaled by prompt length when
+    there is enough data) plus the model's typical reply length divided by its speed,
+    plus a load penalty when the model isn't resident. The most preferred model that
+    fits the latency target wins; if none does, the fastest estimate does.
+    """
+
+    def __init__(self, models=None, preference=None):
+        self.models = list(models or PREFERENCE)
+        self.preference = list(preference or PREFERENCE)
+        self.stats = {m: ModelStats() for m in self.models}
+        self.last_choice = None
+        self._lock = threading.Lock()
+
+    # === Measurements ===
+    def record(self, stats):
+        """Add one request's stats (the dict ChatStream.stats() returns)."""
+        model = (stats.get("model") or "").split(":")[0]
+        if model not in self.stats or (stats.get("cancelled") and not stats.get("tokens")):
+            return
+        with self._lock:
+            self.stats[model].add(stats)
+
+    def load_history(self, path, max_lines=2000):
+        """Seed the windows from a stream_stats.jsonl log written by chat_stream.log_stream_stats."""
+        if not os.path.exists(path):
+            return 0
+        with open(path, "r", encoding="utf-8") as f:
+            lines = deque(f, maxlen=max_lines)
+        loaded = 0
+        for line in lines:
+            try:
+                self.record(json.loads(line))
+                loaded += 1
+            except ValueError:
+                continue
+        return loaded
+
+    # === Routing ===
+    def estimate(self, model, prompt_tokens, resident=None):
+        """Estimated seconds for a full reply, or None if the model should be avoided."""
+        s = self.stats[model]
+        if s.count >= 5 and s.failure_rate > MAX_FAILURE_RATE:
+            return None
+        per_token = s.prefill_s_per_token()
+        ttft = per_token * prompt_tokens if per_token else (s.ttft_s or DEFAULT_TTFT_S)
+        seconds = ttft + s.reply_tokens / (s.tokens_per_sec or DEFAULT_TOKENS_PER_SEC)
+        if resident is not None and model not in resident:
+            seconds += DEFAULT_LOAD_S
+        return seconds
+
+    def choose(self, prompt_tokens, target_s, resident=None):
+        """Return (model, estimated seconds, reason)."""
+        with self._lock:
+            estimates = {m: self.estimate(m, prompt_tokens, resident) for m in self.models}
+            usable = {m: e for m, e in estimates.items() if e is not None and not self.stats[m].overloaded()}
+        usable = usable or {m: e for m, e in estimates.items() if e is not None} or {
+            m: DEFAULT_TTFT_S for m in self.models}
+        for model in self.preference:
+            if model in usable and usable[model] <= target_s:
+                choice = (model, usable[model], "best model within target")
+                break
+        else:
+            model = min(usable, key=usable.get)
+            choice = (model, usable[model], "fastest available (nothing meets the target)")
+        self.last_choice = choice
+        return choice
+
+    def describe(self, model):
+        s = self.stats[model]
+        if not s.count:
+            return "No measurements yet."
+        ttft = f"{s.ttft_s:.1f}s" if s.ttft_s is not None else "n/a"
+        speed = f"{s.tokens_per_sec:.0f} tok/s" if s.tokens_per_sec else "n/a"
+        text = f"first token {ttft} · {speed} · {s.failure_rate:.0%} failed (last {s.count})"
+        return text + (" · slow right now" if s.overloaded() else "")
+
+
+# === Process-wide router ===
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_model_router(history_path=None, **kwargs):
+    """Return the shared router, seeding it from history_path the first time."""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = ModelRouter(**kwargs)
+            if history_path:
+                _router.load_history(history_path)
+        return _router
@@ -0,0 +1,178 @@
+# notion_mirror.py
+
+import datetime
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+import notion_tasks
+
+SORT_COLUMNS = {"xp": "xp DESC", "roi": "roi DESC", "name": "name COLLATE NOCASE ASC"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    page_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    status TEXT,
+    category TEXT,
+    xp REAL,
+    roi REAL,
+    reason TEXT,
+    last_edited_time TEXT
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks(status);
+CREATE INDEX IF NOT EXISTS tasks_category ON tasks(category);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+class NotionMirror:
+    """Local SQLite copy of the Notion task database.
+
+    sync() pulls only pages edited since the last watermark (following every page of
+    results); a periodic full sync also drops rows for pages deleted in Notion. All
+    filtering, sorting and facet counts run against the local table.
+    """
+
+    def __init__(self, db_path, full_sync_interval=24 * 3600):
+        self.db_path = db_path
+        self.full_sync_interval = full_sync_interval
+        self._sync_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # === Metadata ===
+    def _get_meta(self, key, default=None):
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, conn, key, value):
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    @property
+    def last_sync(self):
+        return self._get_meta("last_sync")
+
+    # === Sync ===
+    def sync(self, full=False):
+        """Pull changes from Notion. Returns a small stats dict."""
+        with self._sync_lock:
+            start = time.perf_counter()
+            last_full = float(self._get_meta("last_full_sync", "0"))
+            if time.time() - last_full > self.full_sync_interval:
+                full = True
+            since = None if full else self._get_meta("watermark")
+
+            tasks = list(notion_tasks.query_changed_tasks(since))
+            watermark = since
+            with self._connect() as conn:
+                if full:
+                    seen = {t["id"] for t in tasks if not t["archived"]}
+                    existing = {r[0] for r in conn.execute("SELECT page_id FROM tasks")}
+                    conn.executemany("DELETE FROM tasks WHERE page_id = ?", [(i,) for i in existing - seen])
+                for t in tasks:
+                    if t["archived"]:
+                        conn.execute("DELETE FROM tasks WHERE page_id = ?", (t["id"],))
+                        continue
+                    conn.execute(
+                        "INSERT OR REPLACE INTO tasks (page_id, name, status, category, xp, roi, reason, last_edited_time) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (t["id"], t["name"], t["status"], t["category"], t["xp"], t["roi"], t["reason"],
+                         t["last_edited_time"]),
+                    )
+                    if t["last_edited_time"] and (watermark is None or t["last_edited_time"] > watermark):
+                        watermark = t["last_edited_time"]
+                if watermark:
+                    self._set_meta(conn, "watermark", watermark)
+                if full:
+                    self._set_meta(conn, "last_full_sync", str(time.time()))
+                self._set_meta(conn, "last_sync", datetime.datetime.now().isoformat(timespec="seconds"))
+            return {"mode": "full" if full else "delta", "changed": len(tasks),
+                    "seconds": round(time.perf_counter() - start, 3)}
+
+    # === Local writes ===
+    def set_status(self, page_id, status):
+        """Update a task's status locally (optimistic UI). Returns the previous status."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT status FROM tasks WHERE page_id = ?", (page_id,)).fetchone()
+            conn.execute("UPDATE tasks SET status = ? WHERE page_id = ?", (status, page_id))
+        return row[0] if row else None
+
+    # === Local reads ===
+    def tasks(self, category="All", status="All", sort_by="xp", include_done=False):
+        clauses, params = [], []
+        if category and category != "All":
+            clauses.append("category = ?")
+            params.append(category)
+        if status and status != "All":
+            clauses.append("status = ?")
+            params.append(status)
+        elif not include_done:
+            clauses.append("status != 'Done'")
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        order = SORT_COLUMNS.get(sort_by, SORT_COLUMNS["xp"])
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(
+                f"SELECT page_id AS id, name, status, category, xp, roi, reason FROM tasks {where} ORDER BY {order}",
+                params,
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def facets(self, include_done=False):
+        """{"category": {name: count}, "status": {name: count}} over the mirrored tasks."""
+        where = "" if include_done else "WHERE status != 'Done'"
+        result = {}
+        with self._connect() as conn:
+            for column in ("category", "status"):
+                rows = conn.execute(
+                    f"SELECT COALESCE({column}, 'None'), COUNT(*) FROM tasks {where} GROUP BY 1 ORDER BY 1"
+                )
+                result[column] = dict(rows.fetchall())
+        return result
+
+    def changed_since(self, watermark=None):
+        """Tasks (any status) edited at or after watermark, oldest edit first, with last_edited_time.
+
+        Notion rounds last_edited_time to the minute, so a task edited again within the
+        watermark's minute has the same time; >= re-yields the watermark's tasks instead
+        of missing that edit (their unchanged chunks are not embedded again).
+        """
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(
+                "SELECT page_id AS id, name, status, category, xp, roi, reason, last_edited_time FROM tasks "
+                "WHERE ? IS NULL OR last_edited_time >= ? ORDER BY last_edited_time",
+                (watermark, watermark),
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def page_ids(self):
+        with self._connect() as conn:
+            return {r[0] for r in conn.execute("SELECT page_id FROM tasks")}
+
+    def count(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+
+# === Process-wide mirror ===
+_mirrors = {}
+_mirrors_lock = threading.Lock()
+
+
+def get_mirror(db_path, **kwargs):
+    with _mirrors_lock:
+        if db_path not in _mirrors:
+            _mirrors[db_path] = NotionMirror(db_path, **kwargs)
+        return _mirrors[db_path]
@@ -1,27 +1,104 @@
 import os
-from notion_client import Client
-from dotenv import load_dotenv
+import queue
+import random
+import threading
+import time
 from pathlib import Path
 
-# === Load .env file ===
-dotenv_path = Path("notion.env")
-if dotenv_path.exists():
-    load_dotenv(dotenv_path=dotenv_path)
-else:
-    raise FileNotFoundError("Missing `notion.env` file in current directory.")
+import perf_trace
 
-# === Load Notion API credentials ===
-notion_token = os.getenv("NOTION_TOKEN")
-db_id = os.getenv("NOTION_DATABASE_ID")
+ENV_PATH = Path("notion.env")
+_notion = None
+_db_id = None
 
-if not notion_token or not db_id:
-    raise ValueError("NOTION_TOKEN or NOTION_DATABASE_ID is missing or invalid.")
 
-notion = Client(auth=notion_token)
+# === Load Notion API credentials (on first use, not at import) ===
+def get_client():
+    """Return (client, database_id), creating the Notion client the first time it is needed."""
+    global _notion, _db_id
+    if _notion is not None:
+        return _notion, _db_id
+
+    from dotenv import load_dotenv
+    from notion_client import Client
+
+    if ENV_PATH.exists():
+        load_dotenv(dotenv_path=ENV_PATH)
+    else:
+        raise FileNotFoundError("Missing `notion.env` file in current directory.")
+
+    notion_token = os.getenv("NOTION_TOKEN")
+    db_id = os.getenv("NOTION_DATABASE_ID")
+
+    if not notion_token or not db_id:
+        raise ValueError("NOTION_TOKEN or NOTION_DATABASE_ID is missing or invalid.")
+
+    _notion, _db_id = Client(auth=notion_token), db_id
+    return _notion, _db_id
+
+
+# === Parse one database row ===
+def parse_task(row):
+    props = row.get("properties", {})
+
+    task_name = props.get("task", {}).get("title", [])
+    name = task_name[0]["text"]["content"] if task_name else "Untitled"
+
+    status_name = (props.get("status", {}).get("select") or {}).get("name", "Unknown")
+    category_name = (props.get("category", {}).get("select") or {}).get("name", "Uncategorized")
+    xp_score = props.get("xp_score", {}).get("number") or 0
+    roi_score = props.get("roi_score", {}).get("number") or 0
+
+    reason_text = props.get("reason", {}).get("rich_text", [])
+    reason = reason_text[0]["text"]["content"] if reason_text else "No reason provided"
+
+    return {
+        "id": row.get("id"),
+        "name": name,
+        "status": status_name,
+        "category": category_name,
+        "xp": xp_score,
+        "roi": roi_score,
+        "reason": reason,
+        "last_edited_time": row.get("last_edited_time"),
+        "archived": bool(row.get("archived") or row.get("in_trash")),
+    }
+
+
+# === Query every page of results ===
+def query_pages(query, max_results=None):
+    """Yield raw rows from databases.query, following start_cursor/has_more."""
+    notion, _ = get_client()
+    query = dict(query)
+    returned = 0
+    while True:
+        if max_results:
+            query["page_size"] = min(100, max_results - returned)
+        with perf_trace.span("notion databases.query", "notion"):
+            result = notion.databases.query(**query)
+        for row in result["results"]:
+            yield row
+            returned += 1
+        if not result.get("has_more") or (max_results and returned >= max_results):
+            return
+        query["start_cursor"] = result["next_cursor"]
+
+
+def query_changed_tasks(since=None):
+    """Yield parsed tasks edited on or after the ISO timestamp `since` (all tasks when None)."""
+    _, db_id = get_client()
+    query = {"database_id": db_id, "page_size": 100}
+    if since:
+        query["filter"] = {"timestamp": "last_edited_time", "last_edited_time": {"on_or_after": since}}
+    for row in query_pages(query):
+        yield parse_task(row)
+
 
 # === Fetch tasks ===
+@perf_trace.traced("fetch_notion_tasks", "notion")
 def fetch_notion_tasks(limit=10, category=None, status=None, sort_by="xp"):
     try:
+        _, db_id = get_client()
         filters = []
 
         # Status filter
@@ -42,31 +119,9 @@ def fetch_notion_tasks(limit=10, category=None, status=None, sort_by="xp"):
         if filters:
             query["filter"] = {"and": filters}
 
-        result = notion.databases.query(**query)
-
         tasks = []
-        for row in result["results"]:
-            props = row.get("properties", {})
-
-            task_name = props.get("task", {}).get("title", [])
-            name = task_name[0]["text"]["content"] if task_name else "Untitled"
-
-            status_name = props.get("status", {}).get("select", {}).get("name", "Unknown")
-            category_name = props.get("category", {}).get("select", {}).get("name", "Uncategorized")
-            xp_score = props.get("xp_score", {}).get("number", 0)
-            roi_score = props.get("roi_score", {}).get("number", 0)
-
-            reason_text = props.get("reason", {}).get("rich_text", [])
-            reason = reason_text[0]["text"]["content"] if reason_text else "No reason provided"
-
-            tasks.append({
-                "name": name,
-                "status": status_name,
-                "category": category_name,
-                "xp": xp_score,
-                "roi": roi_score,
-                "reason": reason
-            })
+        for row in query_pages(query, max_results=limit):
+            tasks.append(parse_task(row))
 
         # Sort tasks
         sort_by = sort_by.lower()
@@ -79,21 +134,154 @@ def fetch_notion_tasks(limit=10, category=None, status=None, sort_by="xp"):
         return [{"name": f"Error: {str(e)}", "status": "Error"}]
 
 
+# === Rate limiting + retries ===
+class TokenBucket:
+    """Allow `rate` requests per second on average, with bursts up to `capacity`."""
+
+    def __init__(self, rate=3.0, capacity=3):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# Notion asks integrations to stay around 3 requests/second.
+rate_limiter = TokenBucket(rate=3.0, capacity=3)
+
+
+def _retry_delay(error, attempt):
+    """Seconds to wait before retrying, or None if the error is not retryable."""
+    status = getattr(error, "status", None)
+    if status is None and getattr(error, "code", None) in ("rate_limited", "internal_server_error", "service_unavailable"):
+        status = 429 if error.code == "rate_limited" else 503
+    if status is None or (status != 429 and status < 500):
+        return None
+    headers = getattr(error, "headers", None) or {}
+    retry_after = headers.get("retry-after") or headers.get("Retry-After")
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return min(30.0, 0.5 * 2 ** attempt) * (0.5 + random.random())
+
+
+def call_with_retry(fn, retries=5):
+    """Call fn() under the shared rate limiter, retrying 429 and 5xx responses with backoff."""
+    for attempt in range(retries + 1):
+        rate_limiter.acquire()
+        try:
+            return fn()
+        except Exception as e:
+            delay = _retry_delay(e, attempt)
+            if delay is None or attempt == retries:
+                raise
+            time.sleep(delay)
+
+
 # === Mark a task as complete ===
-def mark_task_complete(task_name):
+def _set_done(page_id):
+    notion, _ = get_client()
+    with perf_trace.span("notion pages.update", "notion"):
+        return call_with_retry(lambda: notion.pages.update(
+            page_id=page_id,
+            properties={"status": {"select": {"name": "Done"}}}
+        ))
+
+
+def mark_task_complete(page_id):
+    """Set a task's status to Done by its page id (no lookup query needed)."""
     try:
-        results = notion.databases.query(
-            database_id=db_id,
-            filter={"property": "task", "title": {"equals": task_name}},
-        )
-        if results["results"]:
-            task_id = results["results"][0]["id"]
-            notion.pages.update(
-                page_id=task_id,
-                properties={"status": {"select": {"name": "Done"}}}
-            )
-            return True
-        return False
+        _set_done(page_id)
+        return True
     except Exception as e:
         print(f"Error marking task complete: {e}")
         return False
+
+
+# === Background write queue ===
+class WriteQueue:
+    """Sends task completions from a worker thread so clicks never block on Notion.
+
+    Repeated clicks on the same page are coalesced, every request goes through the
+    shared token bucket and retry policy, and on_done(page_id, ok, error) is called
+    afterwards so the caller can confirm or roll back its optimistic update.
+    """
+
+    def __init__(self, batch_size=10):
+        self.batch_size = batch_size
+        self.failures = []
+        self.completed = 0
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="notion-writes", daemon=True)
+        self._thread.start()
+
+    @property
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def submit_complete(self, page_id, on_done=None):
+        with self._lock:
+            if page_id in self._pending:
+                return False
+            self._pending.add(page_id)
+        self._queue.put((page_id, on_done))
+        return True
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            for page_id, on_done in batch:
+                self._send(page_id, on_done)
+
+    def _send(self, page_id, on_done):
+        error = None
+        try:
+            _set_done(page_id)
+        except Exception as e:
+            error = e
+        with self._lock:
+            self._pending.discard(page_id)
+            if error:
+                self.failures.append((page_id, str(error)))
+                self.failures = self.failures[-20:]
+            else:
+                self.completed += 1
+        if on_done:
+            try:
+                on_done(page_id, error is None, error)
+            except Exception as e:
+                print(f"Write callback failed: {e}")
+
+
+_write_queue = None
+_write_queue_lock = threading.Lock()
+
+
+def get_write_queue():
+    global _write_queue
+    with _write_queue_lock:
+        if _write_queue is None:
+            _write_queue = WriteQueue()
+        return _write_queue
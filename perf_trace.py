@@ -0,0 +1,135 @@
+# perf_trace.py
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+MAX_SPANS = 5000
+
+# Finished spans, oldest first: dicts with name, cat, start (epoch s), dur (s), tid, thread, args.
+_spans = deque(maxlen=MAX_SPANS)
+_pid = os.getpid()
+# perf_counter has the resolution; this offset turns it into wall-clock time for the export.
+_epoch_offset = time.time() - time.perf_counter()
+
+
+def record(name, start, end, cat="app", **args):
+    """Add a finished span. start/end are time.perf_counter() values."""
+    thread = threading.current_thread()
+    _spans.append({
+        "name": name,
+        "cat": cat,
+        "start": start + _epoch_offset,
+        "dur": end - start,
+        "tid": thread.ident,
+        "thread": thread.name,
+        "args": args,
+    })
+
+
+@contextmanager
+def span(name, cat="app", **args):
+    """Time a block. Yields the args dict, so the block can attach results (counts, sizes)."""
+    start = time.perf_counter()
+    try:
+        yield args
+    except BaseException as e:
+        args["error"] = type(e).__name__
+        raise
+    finally:
+        record(name, start, time.perf_counter(), cat, **args)
+
+
+def traced(name, cat="app"):
+    """Decorator form of span()."""
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*a, **kw):
+            with span(name, cat):
+                return func(*a, **kw)
+        return wrapper
+    return decorate
+
+
+# === Reading ===
+def spans(name=None, since=None):
+    items = list(_spans)
+    if name is not None:
+        items = [s for s in items if s["name"] == name]
+    if since is not None:
+        items = [s for s in items if s["start"] >= since]
+    return items
+
+
+def _percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def stage_stats():
+    """Per span name: count, p50/p95/max in ms and total seconds, busiest stage first."""
+    by_name = {}
+    for s in list(_spans):
+        by_name.setdefault((s["cat"], s["name"]), []).append(s["dur"])
+    rows = []
+    for (cat, name), durations in by_name.items():
+        durations.sort()
+        rows.append({
+            "stage": name,
+            "category": cat,
+            "count": len(durations),
+            "p50_ms": round(_percentile(durations, 0.5) * 1000, 1),
+            "p95_ms": round(_percentile(durations, 0.95) * 1000, 1),
+            "max_ms": round(durations[-1] * 1000, 1),
+            "total_s": round(sum(durations), 3),
+        })
+    return sorted(rows, key=lambda r: r["total_s"], reverse=True)
+
+
+def histogram(name, bins=20):
+    """(bucket start in ms, count) pairs of one stage's durations."""
+    durations = [s["dur"] * 1000 for s in spans(name)]
+    if not durations:
+        return []
+    low, high = min(durations), max(durations)
+    width = (high - low) / bins or 1.0
+    counts = [0] * bins
+    for d in durations:
+        counts[min(bins - 1, int((d - low) / width))] += 1
+    return [(round(low + i * width, 1), c) for i, c in enumerate(counts)]
+
+
+def clear():
+    _spans.clear()
+
+
+# === Chrome trace export ===
+def chrome_trace():
+    """The spans as a Trace Event Format dict (chrome://tracing, Perfetto, speedscope)."""
+    events, threads = [], {}
+    for s in list(_spans):
+        threads[s["tid"]] = s["thread"]
+        events.append({
+            "name": s["name"],
+            "cat": s["cat"],
+            "ph": "X",
+            "ts": round(s["start"] * 1e6),
+            "dur": round(s["dur"] * 1e6),
+            "pid": _pid,
+            "tid": s["tid"],
+            "args": s["args"],
+        })
+    for tid, thread_name in threads.items():
+        events.append({"name": "thread_name", "ph": "M", "pid": _pid, "tid": tid, "args": {"name": thread_name}})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def export_chrome_trace(path):
+    tmp = str(path) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(chrome_trace(), f, default=str)
+    os.replace(tmp, path)
+    return path
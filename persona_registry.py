@@ -0,0 +1,178 @@
+# persona_registry.py
+#
+# Personas are prompts/personas/<name>.txt, with optional metadata in a JSON sidecar
+# prompts/personas/<name>.json:
+#
+#   {"model": "llama3", "temperature": 0.4, "budget": 4096, "options": {"top_p": 0.9}}
+#
+# model is the default model when the persona is picked, budget the prompt token
+# budget for its chat session, and temperature/options are passed to Ollama.
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+import perf_trace
+from chat_session import estimate_tokens
+
+CHECK_INTERVAL_S = 2.0
+# A reply counts as a prefix-cache hit when Ollama evaluated fewer prompt tokens than the
+# prompt minus this share of the persona prefix (token counts here are estimates).
+PREFIX_HIT_SHARE = 0.5
+
+
+def normalize_prompt_text(text):
+    """Byte-stable form of a persona file: the same prompt must always produce the same prefix."""
+    return "\n".join(line.rstrip() for line in text.replace("\r\n", "\n").split("\n")).strip()
+
+
+class Persona:
+    def __init__(self, name, prompt, meta=None, version=None):
+        self.name = name
+        self.prompt = prompt
+        self.meta = meta or {}
+        self.version = version
+        self.prefix_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+    @property
+    def model(self):
+        return self.meta.get("model")
+
+    @property
+    def budget(self):
+        return self.meta.get("budget")
+
+    def options(self):
+        """Ollama options for this persona (temperature plus any extra options)."""
+        options = dict(self.meta.get("options") or {})
+        if self.meta.get("temperature") is not None:
+            options["temperature"] = self.meta["temperature"]
+        return options
+
+
+class PersonaRegistry:
+    """Personas loaded once per process and reloaded file by file when they change.
+
+    refresh() only stats the directory (at most every check_interval seconds) and
+    re-reads the personas whose .txt or .json changed, so calling it on every
+    Streamlit rerun is cheap.
+    """
+
+    def __init__(self, directory, check_interval=CHECK_INTERVAL_S):
+        self.directory = str(directory)
+        self.check_interval = check_interval
+        self.personas = {}
+        self.errors = {}   # name -> sidecar error, the persona still loads without metadata
+        self.reloads = 0
+        self._signatures = {}  # name -> ((mtime_ns, size) of .txt, of .json or None)
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self.refresh(force=True)
+
+    def _scan(self):
+        files = {}
+        if not os.path.isdir(self.directory):
+            return {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                stem, ext = os.path.splitext(entry.name)
+                if ext in (".txt", ".json") and entry.is_file():
+                    st = entry.stat()
+                    files.setdefault(stem, {})[ext] = (st.st_mtime_ns, st.st_size)
+        return {stem: (f[".txt"], f.get(".json")) for stem, f in files.items() if ".txt" in f}
+
+    def _load(self, name, signature):
+        base = os.path.join(self.directory, name)
+        with open(base + ".txt", "r", encoding="utf-8") as f:
+            prompt = normalize_prompt_text(f.read())
+        meta = {}
+        self.errors.pop(name, None)
+        if signature[1] is not None:
+            try:
+                with open(base + ".json", "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+            except ValueError as e:
+                self.errors[name] = f"{name}.json: {e}"
+        return Persona(name, prompt, meta, version=signature)
+
+    def refresh(self, force=False):
+        """Reload changed persona files. Returns the names that were (re)loaded or removed."""
+        now = time.monotonic()
+        if not force and now - self._checked < self.check_interval:
+            return []
+        with self._lock, perf_trace.span("persona refresh", "dashboard") as span_args:
+            self._checked, initial = now, not self._signatures
+            current = self._scan()
+            changed = [name for name, sig in current.items() if self._signatures.get(name) != sig]
+            removed = [name for name in self._signatures if name not in current]
+            for name in changed:
+                try:
+                    self.personas[name] = self._load(name, current[name])
+                    self._signatures[name] = current[name]
+                except OSError:
+                    continue  # mid-save or just deleted; picked up on the next refresh
+            for name in removed:
+                self.personas.pop(name, None)
+                self._signatures.pop(name, None)
+                self.errors.pop(name, None)
+            if not initial:
+                self.reloads += len(changed) + len(removed)
+            span_args.update(reloaded=len(changed), removed=len(removed))
+        return changed + removed
+
+    def names(self):
+        return sorted(self.personas)
+
+    def get(self, name):
+        return self.personas.get(name)
+
+
+class PrefixCacheStats:
+    """Tracks how often Ollama could reuse the KV-cache for a persona's system prefix.
+
+    Ollama keeps the last prompt's KV-cache per loaded model and only evaluates the
+    tokens after the longest common prefix, which shows up as a prompt_eval_count well
+    below the prompt's size. A hit is *expected* when the model's previous request
+    used the same persona prefix.
+    """
+
+    def __init__(self):
+        self.last_prefix = {}  # model -> prefix hash of its last request
+        self.counts = {"hits": 0, "misses": 0, "expected": 0, "tokens_saved": 0}
+        self._lock = threading.Lock()
+
+    def record(self, model, persona, prompt_tokens_est, prompt_eval_count):
+        """Record one reply; returns True/False for a measured hit, or None without a measurement."""
+        prefix_tokens = estimate_tokens(persona.prompt)
+        with self._lock:
+            expected = self.last_prefix.get(model) == persona.prefix_hash
+            self.last_prefix[model] = persona.prefix_hash
+            if not prompt_eval_count:
+                return None
+            hit = prompt_eval_count < prompt_tokens_est - prefix_tokens * PREFIX_HIT_SHARE
+            self.counts["hits" if hit else "misses"] += 1
+            self.counts["expected"] += expected
+            if hit:
+                self.counts["tokens_saved"] += max(0, prompt_tokens_est - prompt_eval_count)
+        return hit
+
+    @property
+    def hit_rate(self):
+        total = self.counts["hits"] + self.counts["misses"]
+        return self.counts["hits"] / total if total else None
+
+
+# === Process-wide registry ===
+_registries = {}
+_registries_lock = threading.Lock()
+prefix_cache_stats = PrefixCacheStats()
+
+
+def get_persona_registry(directory, **kwargs):
+    key = str(directory)
+    with _registries_lock:
+        if key not in _registries:
+            _registries[key] = PersonaRegistry(directory, **kwargs)
+        return _registries[key]
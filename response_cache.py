@@ -0,0 +1,137 @@
+# response_cache.py
+
+import array
+import re
+import sqlite3
+import threading
+import time
+
+from embedding_service import text_hash
+
+_PUNCT_RE = re.compile(r"[^\w\s]+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt):
+    """Case, punctuation and whitespace-insensitive form of a prompt: "Plan my day!" == "plan  my day"."""
+    return _SPACE_RE.sub(" ", _PUNCT_RE.sub(" ", prompt.lower())).strip()
+
+
+def _dot(a, b):
+    return sum(x * y for x, y in zip(a, b))
+
+
+class ResponseCache:
+    """Persistent cache of model replies keyed on (model, persona, mood, normalized prompt).
+
+    The scope also holds the persona's prefix_hash, so editing a persona's prompt stops
+    serving replies written under the old one, and the retrieval setting (rag), since a
+    reply built with memory context is not an answer to the same request without it.
+
+    Entries expire after ttl seconds and the least-recently-used ones are evicted beyond
+    max_entries. When an embed callable (text -> normalized vector) is passed to get/put,
+    a miss on the exact key falls back to the most similar cached prompt in the same
+    scope if its cosine similarity reaches similarity_threshold.
+    """
+
+    def __init__(self, path, ttl=7 * 24 * 3600, max_entries=500, similarity_threshold=0.92):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.stats = {"hits": 0, "similar_hits": 0, "misses": 0, "bypassed": 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, scope TEXT NOT NULL, prompt TEXT NOT NULL, response TEXT NOT NULL, "
+            "embedding BLOB, created REAL NOT NULL, last_used REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_scope ON responses(scope)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses(last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def _scope(model, persona, mood, prefix_hash=None, rag=None):
+        return f"{model}\x1f{persona}\x1f{prefix_hash or ''}\x1f{mood}\x1f{rag or 'off'}"
+
+    def get(self, model, persona, mood, prompt, embed=None, prefix_hash=None, rag=None):
+        """Return (response, similarity) for a cached reply, or None. similarity is 1.0 for exact hits."""
+        scope, normalized = self._scope(model, persona, mood, prefix_hash, rag), normalize_prompt(prompt)
+        now = time.time()
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+            row = self._conn.execute("SELECT key, response FROM responses WHERE key = ?",
+                                     (text_hash(f"{scope}\x1f{normalized}"),)).fetchone()
+            self._conn.commit()
+        similarity, exact = 1.0, row is not None
+        if row is None and embed is not None:
+            vector = embed(normalized)  # runs the embedding model, so not under the lock
+            with self._lock:
+                row, similarity = self._most_similar(scope, vector)
+        with self._lock:
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, row[0]))
+            self._conn.commit()
+        self.stats["hits" if exact else "similar_hits"] += 1
+        return row[1], similarity
+
+    def _most_similar(self, scope, vector):
+        best, best_score = None, self.similarity_threshold
+        rows = self._conn.execute(
+            "SELECT key, response, embedding FROM responses WHERE scope = ? AND embedding IS NOT NULL", (scope,))
+        for key, response, blob in rows:
+            score = _dot(vector, array.array("f", blob))
+            if score >= best_score:
+                best, best_score = (key, response), score
+        return best, (best_score if best else None)
+
+    def put(self, model, persona, mood, prompt, response, embed=None, prefix_hash=None, rag=None):
+        scope, normalized = self._scope(model, persona, mood, prefix_hash, rag), normalize_prompt(prompt)
+        vector = array.array("f", embed(normalized)).tobytes() if embed is not None else None
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, scope, prompt, response, embedding, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (text_hash(f"{scope}\x1f{normalized}"), scope, normalized, response, vector, now, now),
+            )
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+            self._conn.commit()
+
+    def bypass(self):
+        """Count a request that skipped the cache on purpose."""
+        self.stats["bypassed"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    @property
+    def hit_rate(self):
+        hits = self.stats["hits"] + self.stats["similar_hits"]
+        lookups = hits + self.stats["misses"]
+        return hits / lookups if lookups else None
+
+
+# === Process-wide cache ===
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_response_cache(path, **kwargs):
+    key = str(path)
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = ResponseCache(path, **kwargs)
+        return _caches[key]
@@ -0,0 +1,361 @@
+# compact_vectorstore.py
+#
+# Maintenance for the Chroma collection behind the memory engine:
+#
+#   python scripts/compact_vectorstore.py                                  # size / HNSW report
+#   python scripts/compact_vectorstore.py --dedupe                         # dry run: what would go
+#   python scripts/compact_vectorstore.py --dedupe --apply --M 16 --construction-ef 200 --search-ef 64
+#   python scripts/compact_vectorstore.py --quantize int8
+#   python scripts/compact_vectorstore.py --benchmark -k 5 --queries 200
+#
+# --apply rebuilds the collection into a fresh directory (dropping the HNSW index's
+# tombstones and setting the chosen HNSW parameters, which Chroma only accepts at
+# creation) and swaps it in, keeping the old directory as <persist_dir>.bak-<time>.
+# Close the dashboard first so nothing holds the store open.
+
+import argparse
+import datetime
+import hashlib
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from memory_engine import COLLECTION_NAME, EMBED_MODEL_NAME, _query_instruction
+
+PERSIST_DIR = "F:/OllamaModels/memory/vectorstore/"
+DEDUPE_THRESHOLD = 0.985  # cosine similarity at or above which two chunks count as the same
+READ_BATCH = 5000
+WRITE_BATCH = 1000
+BLOCK = 256
+HNSW_KEYS = ("hnsw:space", "hnsw:M", "hnsw:construction_ef", "hnsw:search_ef")
+CHROMA_DEFAULTS = {"hnsw:space": "l2", "hnsw:M": 16, "hnsw:construction_ef": 100, "hnsw:search_ef": 10}
+
+
+# === Loading ===
+def open_collection(persist_dir, name):
+    import chromadb
+    client = chromadb.PersistentClient(path=persist_dir)
+    return client, client.get_collection(name)
+
+
+def load_all(collection):
+    """Every id, vector (float32 N x d), document and metadata in the collection."""
+    ids, vectors, documents, metadatas = [], [], [], []
+    offset = 0
+    while True:
+        batch = collection.get(include=["embeddings", "documents", "metadatas"], limit=READ_BATCH, offset=offset)
+        if not batch["ids"]:
+            break
+        ids += batch["ids"]
+        vectors += list(batch["embeddings"])
+        documents += batch["documents"]
+        metadatas += batch["metadatas"]
+        offset += len(batch["ids"])
+    return ids, np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1), documents, metadatas
+
+
+def hnsw_settings(collection):
+    meta = collection.metadata or {}
+    return {key: meta.get(key, CHROMA_DEFAULTS[key]) for key in HNSW_KEYS}
+
+
+def _unit(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, fn)) for root, _, files in os.walk(path) for fn in files)
+
+
+# === Dedupe ===
+def find_duplicates(ids, documents, vectors, threshold=DEDUPE_THRESHOLD):
+    """Map each duplicate chunk id to the id of the chunk it duplicates.
+
+    Identical text (ignoring whitespace) is always a duplicate; otherwise a chunk is one
+    when its cosine similarity to an already kept chunk reaches threshold. Longer chunks
+    are considered first, so the most complete copy of a passage is the one kept.
+    """
+    duplicates, first_by_text = {}, {}
+    order = sorted(range(len(ids)), key=lambda i: -len(documents[i] or ""))
+    unit = _unit(vectors[order])
+    kept = np.zeros(len(order), dtype=bool)
+    for start in range(0, len(order), BLOCK):
+        sims = unit[start:start + BLOCK] @ unit[:start + BLOCK].T
+        for row in range(sims.shape[0]):
+            pos = start + row
+            chunk_id = ids[order[pos]]
+            text_key = hashlib.sha256(" ".join((documents[order[pos]] or "").split()).encode("utf-8")).digest()
+            if text_key in first_by_text:
+                duplicates[chunk_id] = first_by_text[text_key]
+                continue
+            scores = np.where(kept[:pos], sims[row, :pos], -1.0)
+            best = int(np.argmax(scores)) if pos else -1
+            if best >= 0 and scores[best] >= threshold:
+                duplicates[chunk_id] = ids[order[best]]
+            else:
+                kept[pos] = True
+                first_by_text[text_key] = chunk_id
+    return duplicates
+
+
+# === Compaction ===
+def _release(client):
+    """Drop chromadb's cached handles so the directory can be renamed (needed on Windows)."""
+    clear = getattr(type(client), "clear_system_cache", None)
+    if clear:
+        clear()
+
+
+def prune_llama_storage(storage_dir, removed_ids):
+    """Remove deleted node ids from llama_index's docstore / index store next to the collection."""
+    if not removed_ids or not os.path.exists(os.path.join(storage_dir, "docstore.json")):
+        return
+    from llama_index.core import StorageContext
+    storage = StorageContext.from_defaults(persist_dir=storage_dir)
+    for node_id in removed_ids:
+        storage.docstore.delete_document(node_id, raise_error=False)
+    for struct in storage.index_store.index_structs():
+        nodes = getattr(struct, "nodes_dict", None)
+        if nodes:
+            for node_id in removed_ids:
+                nodes.pop(node_id, None)
+            storage.index_store.add_index_struct(struct)
+    storage.persist(persist_dir=storage_dir)
+
+
+def rebuild(persist_dir, name, ids, vectors, documents, metadatas, collection_meta, removed_ids=()):
+    """Write the kept chunks into a fresh store and swap it in. Returns the backup directory."""
+    import chromadb
+    persist_dir = os.path.normpath(persist_dir)
+    tmp_dir = persist_dir + ".compacting"
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+    # llama_index's storage files live next to Chroma's; carry them over, minus the removed nodes.
+    for fn in os.listdir(persist_dir):
+        if fn.endswith(".json"):
+            shutil.copy2(os.path.join(persist_dir, fn), tmp_dir)
+    prune_llama_storage(tmp_dir, set(removed_ids))
+
+    client = chromadb.PersistentClient(path=tmp_dir)
+    collection = client.create_collection(name, metadata=collection_meta)
+    for start in range(0, len(ids), WRITE_BATCH):
+        end = start + WRITE_BATCH
+        collection.add(ids=ids[start:end], embeddings=vectors[start:end].tolist(),
+                       documents=documents[start:end], metadatas=metadatas[start:end])
+    if collection.count() != len(ids):
+        raise RuntimeError(f"rebuilt collection has {collection.count()} chunks, expected {len(ids)}")
+    del collection
+    _release(client)
+
+    backup = f"{persist_dir}.bak-{datetime.datetime.now():%Y%m%d-%H%M%S}"
+    os.rename(persist_dir, backup)
+    os.rename(tmp_dir, persist_dir)
+    return backup
+
+
+# === Quantized copy ===
+def quantize(vectors, dtype):
+    """(quantized vectors, per-vector scales or None). int8 is symmetric per vector."""
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+
+def dequantize(q, scales):
+    return q.astype(np.float32) * (scales[:, None] if scales is not None else 1.0)
+
+
+def exact_top_k(base, queries, k, space):
+    """Brute-force neighbours under the collection's distance."""
+    if space == "l2":
+        scores = -(np.sum(base ** 2, axis=1)[None, :] - 2 * queries @ base.T)
+    elif space == "cosine":
+        scores = _unit(queries) @ _unit(base).T
+    else:
+        scores = queries @ base.T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return [set(row) for row in top]
+
+
+def recall(found, truth):
+    return float(np.mean([len(f & t) / len(t) for f, t in zip(found, truth)]))
+
+
+def write_quantized(path, ids, vectors, dtype, space, k=10, n_queries=200, seed=0):
+    q, scales = quantize(vectors, dtype)
+    np.savez(path, ids=np.asarray(ids), vectors=q, scales=scales if scales is not None else np.ones(0))
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(len(ids), size=min(n_queries, len(ids)), replace=False)
+    k = min(k, len(ids))
+    truth = exact_top_k(vectors, vectors[sample], k, space)
+    found = exact_top_k(dequantize(q, scales), vectors[sample], k, space)
+    return {"path": path, "bytes": os.path.getsize(path), "float32_bytes": vectors.nbytes,
+            f"recall@{k}": round(recall(found, truth), 4)}
+
+
+# === HNSW benchmark ===
+def benchmark(vectors, space, k=5, n_queries=200, Ms=(8, 16, 32), construction_ef=200,
+              search_efs=(10, 20, 40, 80, 160), seed=0, queries=None):
+    """recall@k / latency / index size per HNSW setting, on this collection's vectors.
+
+    Chroma's index is hnswlib, so the same library is used here directly: one index per
+    M, then every search ef on it. Without a query set, a sample of stored chunks is held
+    out of the index and used as queries.
+    """
+    import hnswlib
+    rng = np.random.default_rng(seed)
+    if queries is None:
+        held_out = rng.choice(len(vectors), size=min(n_queries, len(vectors) // 10 or 1), replace=False)
+        mask = np.ones(len(vectors), dtype=bool)
+        mask[held_out] = False
+        base, queries = vectors[mask], vectors[held_out]
+    else:
+        base = vectors
+    k = min(k, len(base))
+    truth = exact_top_k(base, queries, k, space)
+    rows = []
+    for M in Ms:
+        index = hnswlib.Index(space=space, dim=base.shape[1])
+        index.init_index(max_elements=len(base), M=M, ef_construction=construction_ef, random_seed=seed)
+        start = time.perf_counter()
+        index.add_items(base, np.arange(len(base)))
+        build_s = time.perf_counter() - start
+        with tempfile.TemporaryDirectory() as tmp:
+            index_path = os.path.join(tmp, "index.bin")
+            index.save_index(index_path)
+            index_bytes = os.path.getsize(index_path)
+        for ef in search_efs:
+            index.set_ef(max(ef, k))
+            latencies, found = [], []
+            for q in queries:
+                start = time.perf_counter()
+                labels, _ = index.knn_query(q, k=k, num_threads=1)
+                latencies.append(time.perf_counter() - start)
+                found.append(set(labels[0]))
+            latencies.sort()
+            rows.append({
+                "M": M, "construction_ef": construction_ef, "search_ef": ef,
+                f"recall@{k}": round(recall(found, truth), 4),
+                "p50_ms": round(latencies[len(latencies) // 2] * 1000, 3),
+                "p95_ms": round(latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] * 1000, 3),
+                "index_mb": round(index_bytes / 1024 ** 2, 1),
+                "build_s": round(build_s, 2),
+            })
+    return rows
+
+
+def recommend(rows, k, target_recall):
+    """Smallest index, then fastest p95, among the settings that reach target_recall."""
+    good = [r for r in rows if r[f"recall@{k}"] >= target_recall]
+    return min(good, key=lambda r: (r["index_mb"], r["p95_ms"])) if good else None
+
+
+def embed_queries(path):
+    from embedding_service import EmbeddingService
+    with open(path, "r", encoding="utf-8") as f:
+        texts = [line.strip() for line in f if line.strip()]
+    service = EmbeddingService(EMBED_MODEL_NAME, trust_remote_code=True, normalize=True,
+                               query_instruction=_query_instruction(EMBED_MODEL_NAME))
+    return np.asarray([service.embed_query(t) for t in texts], dtype=np.float32)
+
+
+def _int_list(text):
+    return [int(x) for x in re.split(r"[,\s]+", text.strip()) if x]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dedupe, compact, quantize and benchmark the memory vectorstore.")
+    parser.add_argument("--persist-dir", default=PERSIST_DIR)
+    parser.add_argument("--collection", default=COLLECTION_NAME)
+    parser.add_argument("--dedupe", action="store_true", help="find near-identical chunks")
+    parser.add_argument("--threshold", type=float, default=DEDUPE_THRESHOLD)
+    parser.add_argument("--apply", action="store_true", help="rebuild the store without duplicates")
+    parser.add_argument("--M", type=int, help="HNSW M for the rebuilt collection")
+    parser.add_argument("--construction-ef", type=int, help="HNSW construction ef for the rebuilt collection")
+    parser.add_argument("--search-ef", type=int, help="HNSW search ef for the rebuilt collection")
+    parser.add_argument("--quantize", choices=["int8", "float16"], help="write a quantized copy of the vectors")
+    parser.add_argument("--benchmark", action="store_true", help="recall@k vs latency over HNSW settings")
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200, help="held-out chunks used as benchmark queries")
+    parser.add_argument("--queries-file", help="real queries, one per line, instead of held-out chunks")
+    parser.add_argument("--bench-M", default="8,16,32")
+    parser.add_argument("--bench-ef", default="10,20,40,80,160")
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    args = parser.parse_args()
+
+    client, collection = open_collection(args.persist_dir, args.collection)
+    settings = hnsw_settings(collection)
+    start = time.perf_counter()
+    ids, vectors, documents, metadatas = load_all(collection)
+    print(f"📦 {args.collection}: {len(ids)} chunks x {vectors.shape[1] if len(ids) else 0} dims "
+          f"loaded in {time.perf_counter() - start:.1f}s | on disk {dir_size(args.persist_dir) / 1024 ** 2:.1f} MB | "
+          f"float32 vectors {vectors.nbytes / 1024 ** 2:.1f} MB")
+    print("⚙️ HNSW " + ", ".join(f"{key.split(':')[1]}={value}" for key, value in settings.items()))
+    if not ids:
+        sys.exit(0)
+
+    duplicates = {}
+    if args.dedupe or args.apply:
+        start = time.perf_counter()
+        duplicates = find_duplicates(ids, documents, vectors, args.threshold)
+        print(f"🧹 {len(duplicates)} duplicate chunks (threshold {args.threshold}) "
+              f"found in {time.perf_counter() - start:.1f}s")
+        by_id = dict(zip(ids, documents))
+        for dup, kept in list(duplicates.items())[:5]:
+            print(f"   {dup} ≈ {kept}: {(by_id[dup] or '')[:80]!r}")
+
+    if args.apply:
+        keep = [i for i, chunk_id in enumerate(ids) if chunk_id not in duplicates]
+        meta = dict(collection.metadata or {})
+        for key, value in (("hnsw:M", args.M), ("hnsw:construction_ef", args.construction_ef),
+                           ("hnsw:search_ef", args.search_ef)):
+            if value is not None:
+                meta[key] = value
+        del collection
+        _release(client)
+        start = time.perf_counter()
+        backup = rebuild(args.persist_dir, args.collection, [ids[i] for i in keep], vectors[keep],
+                         [documents[i] for i in keep], [metadatas[i] for i in keep], meta or None,
+                         removed_ids=list(duplicates))
+        print(f"✅ Rebuilt with {len(keep)} chunks in {time.perf_counter() - start:.1f}s; "
+              f"now {dir_size(args.persist_dir) / 1024 ** 2:.1f} MB (previous store kept at {backup})")
+        ids, vectors = [ids[i] for i in keep], vectors[keep]
+
+    space = settings["hnsw:space"]
+    if args.quantize:
+        path = os.path.join(os.path.dirname(os.path.normpath(args.persist_dir)), f"vectors_{args.quantize}.npz")
+        result = write_quantized(path, ids, vectors, args.quantize, space, k=args.k)
+        print(f"🗜 {args.quantize} copy: {result['bytes'] / 1024 ** 2:.1f} MB "
+              f"(float32 {result['float32_bytes'] / 1024 ** 2:.1f} MB), "
+              f"recall@{args.k} vs float32 {result[f'recall@{args.k}']} -> {path}")
+
+    if args.benchmark:
+        try:
+            import hnswlib  # noqa: F401  (ships with chromadb as chroma-hnswlib)
+        except ImportError:
+            sys.exit("hnswlib is not installed; pip install chroma-hnswlib")
+        queries = embed_queries(args.queries_file) if args.queries_file else None
+        rows = benchmark(vectors, space, k=args.k, n_queries=args.queries, Ms=_int_list(args.bench_M),
+                         construction_ef=args.construction_ef or 200, search_efs=_int_list(args.bench_ef),
+                         queries=queries)
+        print(f"\n{'M':>4} {'ef':>5} {'recall@' + str(args.k):>9} {'p50 ms':>8} {'p95 ms':>8} {'index MB':>9} {'build s':>8}")
+        for r in rows:
+            print(f"{r['M']:>4} {r['search_ef']:>5} {r[f'recall@{args.k}']:>9} {r['p50_ms']:>8} "
+                  f"{r['p95_ms']:>8} {r['index_mb']:>9} {r['build_s']:>8}")
+        best = recommend(rows, args.k, args.target_recall)
+        if best:
+            print(f"\n💡 Smallest setting with recall@{args.k} >= {args.target_recall}: M={best['M']}, "
+                  f"search_ef={best['search_ef']} ({best['p95_ms']} ms p95). Apply with "
+                  f"--apply --M {best['M']} --construction-ef {best['construction_ef']} --search-ef {best['search_ef']}")
+        else:
+            print(f"\n⚠️ No setting reached recall@{args.k} >= {args.target_recall}; try larger --bench-ef values.")
@@ -0,0 +1,28 @@
+# convert_md_logs.py
+#
+# One-off migration of the old <persona>_<date>.md chat logs into the JSONL
+# conversation store (logs/conversations/chat_<date>_<seq>.jsonl).
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from conversation_store import ConversationLog, convert_markdown_logs
+
+LOG_DIR = "F:/Important Projects/Local Ai Dashboard/logs"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert USER:/AI: markdown chat logs to JSONL.")
+    parser.add_argument("--logs-dir", default=LOG_DIR)
+    parser.add_argument("--keep", action="store_true",
+                        help="leave the .md files in place instead of moving them to logs/imported_md")
+    args = parser.parse_args()
+
+    store = ConversationLog(os.path.join(args.logs_dir, "conversations"))
+    archive_dir = None if args.keep else os.path.join(args.logs_dir, "imported_md")
+    files, turns = convert_markdown_logs(args.logs_dir, store, archive_dir=archive_dir)
+    store.close()
+    print(f"✅ Converted {turns} turns from {files} markdown logs.")
+    if args.keep:
+        print("⚠️ The .md files were kept, so the history viewer will list those turns twice.")
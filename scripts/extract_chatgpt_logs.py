@@ -1,40 +1,208 @@
 import json
 import re
+import time
+import argparse
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+try:
+    import ijson  # optional: faster C-backed streaming parser
+except ImportError:
+    ijson = None
+
+INPUT_PATH = "F:/OllamaModels/memory/chatgpt/conversations.json"
+OUTPUT_DIR = "F:/OllamaModels/memory/chatgpt-extracted/"
+PROGRESS_NAME = ".extract_progress"
+
+
 def clean_filename(text):
     # Remove illegal characters for Windows filenames
     return re.sub(r'[<>:"/\\|?*\']', '', text)[:50]
 
-# Load your exported ChatGPT file
-with open("F:/OllamaModels/memory/chatgpt/conversations.json", "r", encoding="utf-8") as f:
-    data = json.load(f)
-
-output_dir = Path("F:/OllamaModels/memory/chatgpt-extracted/")
-output_dir.mkdir(parents=True, exist_ok=True)
 
-skipped = 0
+# === Streaming parse: one conversation at a time ===
+def iter_conversations(path, chunk_size=1 << 20):
+    """Yield the items of a top-level JSON array without loading the whole file."""
+    if ijson is not None:
+        with open(path, "rb") as f:
+            yield from ijson.items(f, "item")
+        return
 
-for i, conv in enumerate(data):
-    title = clean_filename(conv.get("title", f"conversation_{i}"))
-    messages = conv.get("mapping", {})
-    
-    log = []
-    for msg in messages.values():
-        if msg.get("message"):
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf, pos, read_size = f.read(chunk_size), 0, chunk_size
+        buf = buf.lstrip()
+        if not buf.startswith("["):
+            raise ValueError("Expected a JSON array of conversations.")
+        pos = 1
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buf):
+                more = f.read(read_size)
+                if not more:
+                    raise ValueError("Unexpected end of file inside the conversation array.")
+                buf, pos = more, 0
+                continue
+            if buf[pos] == "]":
+                return
             try:
-                role = msg["message"]["author"]["role"]
-                parts = msg["message"]["content"].get("parts", [])
-                if parts:
-                    content = parts[0]
-                    log.append(f"{role.upper()}: {content}\n")
-            except Exception:
-                skipped += 1
+                obj, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # The current conversation spans past the buffer: read more, growing the
+                # read size so one huge conversation doesn't cause quadratic re-parsing.
+                more = f.read(read_size)
+                if not more:
+                    raise
+                buf, pos = buf[pos:] + more, 0
+                read_size *= 2
+                continue
+            yield obj
+            # Just move past it; the buffer is only trimmed when it is refilled above.
+            pos, read_size = end, chunk_size
+
+
+# === Thread reconstruction ===
+def thread_node_ids(mapping, current_node=None):
+    """Node ids of the conversation in order, root first.
+
+    Follows parent links back from current_node (the branch the user last saw);
+    without one, walks down from the root taking the newest child at each fork.
+    """
+    if current_node in mapping:
+        ids, seen, node_id = [], set(), current_node
+        while node_id in mapping and node_id not in seen:
+            seen.add(node_id)
+            ids.append(node_id)
+            node_id = mapping[node_id].get("parent")
+        return ids[::-1]
+
+    roots = [k for k, v in mapping.items() if v.get("parent") not in mapping]
+    ids, seen = [], set()
+    node_id = roots[0] if roots else None
+    while node_id in mapping and node_id not in seen:
+        seen.add(node_id)
+        ids.append(node_id)
+        children = [c for c in mapping[node_id].get("children", []) if c in mapping]
+        node_id = children[-1] if children else None
+    return ids
+
+
+def message_text(message):
+    """Return (text, skip_reason). Joins every text part instead of keeping only parts[0]."""
+    content = message.get("content") or {}
+    parts = content.get("parts")
+    if parts is None:
+        text = content.get("text")
+        if isinstance(text, str) and text.strip():
+            return text, None
+        return None, f"no_text:{content.get('content_type', 'unknown')}"
+    texts = [p for p in parts if isinstance(p, str) and p.strip()]
+    if not texts:
+        return None, "non_text_parts" if parts else "empty_parts"
+    return "\n".join(texts), None
+
+
+def conversation_log(conv):
+    """Return (lines, skip_counter) for one conversation."""
+    skipped = Counter()
+    mapping = conv.get("mapping") or {}
+    lines = []
+    for node_id in thread_node_ids(mapping, conv.get("current_node")):
+        msg = mapping[node_id].get("message")
+        if not msg:
+            continue  # structural root/placeholder nodes carry no message
+        try:
+            role = msg["author"]["role"]
+            text, reason = message_text(msg)
+        except (KeyError, TypeError, AttributeError):
+            skipped["malformed"] += 1
+            continue
+        if reason:
+            skipped[reason] += 1
+            continue
+        lines.append(f"{role.upper()}: {text}\n")
+    return lines, skipped
+
+
+# === Resume support ===
+def load_progress(path):
+    if not path.exists():
+        return set()
+    return {line.strip() for line in path.read_text(encoding="utf-8").splitlines() if line.strip()}
+
+
+def conversation_key(conv, i):
+    return conv.get("id") or conv.get("conversation_id") or f"index:{i}"
+
+
+# === Extraction ===
+def extract(input_path=INPUT_PATH, output_dir=OUTPUT_DIR, workers=4, restart=False, max_pending=64):
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    progress_path = output_dir / PROGRESS_NAME
+    if restart and progress_path.exists():
+        progress_path.unlink()
+    done = load_progress(progress_path)
+
+    stats = Counter()
+    skipped = Counter()
+    lock = threading.Lock()
+    pending = threading.BoundedSemaphore(max_pending)  # bounds conversations held in memory
+    start = time.perf_counter()
+
+    def write_one(i, key, conv):
+        try:
+            title = clean_filename(conv.get("title") or f"conversation_{i}")
+            lines, conv_skipped = conversation_log(conv)
+            if lines:
+                filename = output_dir / f"{i:03d}_{title}.txt"
+                with open(filename, "w", encoding="utf-8") as f:
+                    f.writelines(lines)
+            with lock:
+                skipped.update(conv_skipped)
+                stats["messages"] += len(lines)
+                stats["written" if lines else "empty"] += 1
+                with open(progress_path, "a", encoding="utf-8") as f:
+                    f.write(key + "\n")
+        except Exception:
+            with lock:
+                stats["failed"] += 1  # not recorded as done, so the next run retries it
+        finally:
+            pending.release()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for i, conv in enumerate(iter_conversations(input_path)):
+            key = conversation_key(conv, i)
+            stats["seen"] += 1
+            if key in done:
+                stats["resumed"] += 1
                 continue
-    
-    if log:
-        filename = output_dir / f"{i:03d}_{title}.txt"
-        with open(filename, "w", encoding="utf-8") as f:
-            f.writelines(log)
+            pending.acquire()
+            pool.submit(write_one, i, key, conv)
+
+    elapsed = time.perf_counter() - start
+    return {"elapsed": elapsed, "stats": dict(stats), "skipped": dict(skipped)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract ChatGPT conversations.json into per-thread text files.")
+    parser.add_argument("--input", default=INPUT_PATH)
+    parser.add_argument("--output", default=OUTPUT_DIR)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--restart", action="store_true", help="ignore progress from an earlier run")
+    args = parser.parse_args()
 
-print(f"✅ Export complete. Skipped {skipped} problematic messages.")
+    result = extract(args.input, args.output, workers=args.workers, restart=args.restart)
+    stats, elapsed = result["stats"], result["elapsed"]
+    processed = stats.get("written", 0) + stats.get("empty", 0)
+    print(f"✅ Export complete: {stats.get('written', 0)} written, {stats.get('resumed', 0)} already done, "
+          f"{stats.get('empty', 0)} empty, {stats.get('failed', 0)} failed in {elapsed:.1f}s "
+          f"({processed / elapsed if elapsed else 0:.1f} conv/s, "
+          f"{stats.get('messages', 0) / elapsed if elapsed else 0:.0f} msg/s).")
+    total_skipped = sum(result["skipped"].values())
+    print(f"Skipped {total_skipped} problematic messages.")
+    for reason, count in sorted(result["skipped"].items(), key=lambda kv: -kv[1]):
+        print(f"  {reason}: {count}")
@@ -0,0 +1,129 @@
+# fake_calendar_server.py
+#
+# Minimal local stand-in for the Google Calendar v3 events API, for exercising
+# calendar_utils without a Google account:
+#
+#   python scripts/fake_calendar_server.py --events 2000 --latency-ms 80
+#   CalendarClient(api_endpoint="http://127.0.0.1:8765/", credentials=AnonymousCredentials())
+
+import argparse
+import datetime
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+EVENTS_PATH = "/calendar/v3/calendars/primary/events"
+
+
+class FakeCalendar:
+    def __init__(self, n_events=500, page_size=250, latency_ms=0):
+        self.page_size = page_size
+        self.latency_ms = latency_ms
+        self.version = 0
+        self.events = {}  # id -> (version, event)
+        self.lock = threading.Lock()
+        self.calls = 0
+        today = datetime.date.today()
+        for i in range(n_events):
+            day = today + datetime.timedelta(days=i % 120 - 30)
+            self.insert({
+                "summary": f"Event {i}",
+                "start": {"dateTime": f"{day.isoformat()}T{9 + i % 8:02d}:00:00Z"},
+                "end": {"dateTime": f"{day.isoformat()}T{10 + i % 8:02d}:00:00Z"},
+            })
+
+    def insert(self, body):
+        with self.lock:
+            self.version += 1
+            event = dict(body, id=uuid.uuid4().hex, status="confirmed",
+                         updated=datetime.datetime.utcnow().isoformat() + "Z")
+            self.events[event["id"]] = (self.version, event)
+            return event
+
+    def cancel(self, event_id):
+        with self.lock:
+            self.version += 1
+            _, event = self.events[event_id]
+            self.events[event_id] = (self.version, dict(event, status="cancelled"))
+
+    def list(self, params):
+        since = int(params.get("syncToken", "0") or 0)
+        offset = int(params.get("pageToken", "0") or 0)
+        page_size = min(int(params.get("maxResults", self.page_size)), self.page_size)
+        with self.lock:
+            changed = [e for v, e in sorted(self.events.values(), key=lambda ve: ve[0]) if v > since]
+            if not since:
+                changed = [e for e in changed if e["status"] != "cancelled"]
+            version = self.version
+        page = changed[offset:offset + page_size]
+        body = {"kind": "calendar#events", "items": page}
+        if offset + page_size < len(changed):
+            body["nextPageToken"] = str(offset + page_size)
+        else:
+            body["nextSyncToken"] = str(version)
+        return body
+
+
+def make_handler(calendar):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+        def _send(self, status, body):
+            if calendar.latency_ms:
+                time.sleep(calendar.latency_ms / 1000)
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            calendar.calls += 1
+            if url.path != EVENTS_PATH:
+                return self._send(404, {"error": {"code": 404, "message": "not found"}})
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+            self._send(200, calendar.list(params))
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            calendar.calls += 1
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if url.path != EVENTS_PATH:
+                return self._send(404, {"error": {"code": 404, "message": "not found"}})
+            self._send(200, calendar.insert(body))
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def serve(port=8765, n_events=500, page_size=250, latency_ms=0):
+    """Start the fake API on a background thread. Returns (server, calendar)."""
+    calendar = FakeCalendar(n_events=n_events, page_size=page_size, latency_ms=latency_ms)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(calendar))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, calendar
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Google Calendar events API.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--events", type=int, default=500)
+    parser.add_argument("--page-size", type=int, default=250)
+    parser.add_argument("--latency-ms", type=int, default=0)
+    args = parser.parse_args()
+
+    server, _ = serve(args.port, args.events, args.page_size, args.latency_ms)
+    print(f"📅 Fake Calendar API on http://127.0.0.1:{args.port}/ (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
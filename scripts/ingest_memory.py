@@ -0,0 +1,78 @@
+# ingest_memory.py
+#
+# Incrementally ingest every memory source into the memory engine's collection:
+#
+#   python scripts/ingest_memory.py --persist-dir memory/vectorstore --logs-dir logs \
+#       --chatgpt-dir memory/chatgpt-extracted --plans plans.md \
+#       --notion-db memory/notion_tasks.sqlite --calendar-store memory/calendar_store.json
+#
+# Sources left out are skipped. Only --full drops the collection and rebuilds it from
+# the given sources. When the embedding model changed, or the collection was built
+# without ingest_state.json (e.g. by an earlier ingest), a normal run changes nothing
+# and exits with REBUILD_REQUIRED_EXIT until it is run once with --full.
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ingest_pipeline import (IngestPipeline, ChatLogLoader, ChatGPTExportLoader, PlansLoader, NotionLoader,
+                             CalendarLoader, RebuildRequired, REBUILD_REQUIRED_EXIT)
+
+
+def build_loaders(args):
+    loaders = []
+    if args.logs_dir:
+        loaders.append(ChatLogLoader(args.logs_dir))
+    if args.chatgpt_dir:
+        loaders.append(ChatGPTExportLoader(args.chatgpt_dir))
+    if args.plans:
+        loaders.append(PlansLoader(args.plans))
+    if args.notion_db:
+        loaders.append(NotionLoader(args.notion_db))
+    if args.calendar_store:
+        loaders.append(CalendarLoader(args.calendar_store))
+    if args.only:
+        loaders = [l for l in loaders if l.name in args.only]
+    return loaders
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chunk, embed and upsert memory sources into one Chroma collection.")
+    parser.add_argument("--persist-dir", default="F:/OllamaModels/memory/vectorstore/")
+    parser.add_argument("--logs-dir", help="dashboard logs (conversations/*.jsonl and legacy .md/.txt/.json)")
+    parser.add_argument("--chatgpt-dir", help="output directory of extract_chatgpt_logs.py")
+    parser.add_argument("--plans", help="plans.md")
+    parser.add_argument("--notion-db", help="Notion mirror SQLite file")
+    parser.add_argument("--calendar-store", help="calendar store JSON file")
+    parser.add_argument("--only", nargs="+", help="run only these loaders (chat_logs chatgpt plans notion calendar)")
+    parser.add_argument("--full", action="store_true", help="drop the collection and re-ingest everything")
+    parser.add_argument("--workers", type=int, default=2, help="embedding processes (0 = embed in this process)")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--max-pending", type=int, default=4, help="embedding batches in flight at once")
+    parser.add_argument("--threads", type=int, default=None, help="torch CPU threads per process")
+    args = parser.parse_args()
+
+    loaders = build_loaders(args)
+    if not loaders:
+        parser.error("give at least one source")
+    pipeline = IngestPipeline(args.persist_dir, workers=args.workers, batch_size=args.batch_size,
+                              max_pending=args.max_pending, num_threads=args.threads)
+    start = time.perf_counter()
+    try:
+        results = pipeline.run(loaders, full=args.full)
+    except RebuildRequired as e:
+        print(f"🛑 Nothing ingested: {e}.")
+        sys.exit(REBUILD_REQUIRED_EXIT)
+    if results is None:
+        print("⏳ Another ingestion run is in progress; skipping.")
+        sys.exit(0)
+    print(json.dumps(results, indent=2))
+    failed = [name for name, r in results.items() if "error" in r]
+    added = sum(r.get("chunks_added", 0) for r in results.values())
+    removed = sum(r.get("chunks_removed", 0) for r in results.values())
+    print(f"✅ {len(loaders) - len(failed)}/{len(loaders)} sources, +{added} -{removed} chunks "
+          f"in {time.perf_counter() - start:.1f}s.")
+    sys.exit(1 if failed else 0)
@@ -1,43 +1,41 @@
 # memory_retriever.py
 
-from llama_index.core import StorageContext, load_index_from_storage
-from llama_index.core.query_engine import RetrieverQueryEngine
-from llama_index.vector_stores.chroma import ChromaVectorStore
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
-import chromadb
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from memory_engine import get_memory_engine, synthesize_answer
 
 # === Configure Paths ===
 persist_dir = "F:/OllamaModels/memory/vectorstore/"
 collection_name = "chatgpt-index"
 
-# === Connect to Chroma vector store ===
-chroma_client = chromadb.PersistentClient(path=persist_dir)
-chroma_collection = chroma_client.get_or_create_collection(collection_name)
-vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
-
-# === Load embedding model ===
-embed_model = HuggingFaceEmbedding(
-    model_name="nomic-ai/nomic-embed-text-v1",
-    trust_remote_code=True
-)
-
-# === Rebuild index from storage ===
-storage_context = StorageContext.from_defaults(persist_dir=persist_dir)
-index = load_index_from_storage(
-    storage_context=storage_context,
-    embed_model=embed_model,
-    vector_store=vector_store
-)
-
-# === Create retriever query engine ===
-query_engine = RetrieverQueryEngine.from_index(index)
+# === Load the shared memory engine (embedding model + Chroma-backed index) ===
+memory_engine = get_memory_engine(persist_dir, collection_name=collection_name)
 
 # === Example CLI usage ===
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search your memory vectorstore.")
+    parser.add_argument("-k", type=int, default=5, help="number of chunks to return")
+    parser.add_argument("--cutoff", type=float, default=0.0, help="minimum similarity score")
+    parser.add_argument("--synthesize", action="store_true", help="also answer with a local Ollama model")
+    parser.add_argument("--model", default="mistral", help="Ollama model used by --synthesize")
+    args = parser.parse_args()
+
+    memory_engine.get_index()
     while True:
         query = input("\n🔍 Ask your memory: ")
         if query.lower() in {"exit", "quit"}:
             break
 
-        response = query_engine.query(query)
-        print("\n🧠 Memory says:\n", str(response))
+        start = time.perf_counter()
+        hits = memory_engine.retrieve(query, k=args.k, score_cutoff=args.cutoff)
+        print(f"\n🧠 {len(hits)} matches in {(time.perf_counter() - start) * 1000:.0f} ms")
+        for hit in hits:
+            score = f"{hit['score']:.3f}" if hit["score"] is not None else "n/a"
+            print(f"\n[{hit['rank']}] {score}  {hit['source']}\n{hit['text'][:500]}")
+
+        if args.synthesize and hits:
+            print("\n🧠 Memory says:\n", synthesize_answer(query, hits, model=args.model))
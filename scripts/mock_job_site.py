@@ -0,0 +1,184 @@
+# mock_job_site.py
+#
+# Minimal local stand-in for Indeed's search result pages, for exercising
+# job_scraper without hitting the real site:
+#
+#   python scripts/mock_job_site.py --per-query 35 --latency-ms 150 --render-delay-ms 300
+#   python scripts/mock_job_site.py --save-fixtures fixtures/jobs --query "IT Support@Remote"
+#   python scripts/mock_job_site.py --fixtures fixtures/jobs      # serve saved pages instead
+#
+# Cards are rendered with Indeed's markup (see job_scraper.SELECTORS). With a render
+# delay the cards are inserted by script after the page loads, like the real site,
+# so scrapers that don't wait explicitly come back empty.
+
+import argparse
+import hashlib
+import html
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, urlencode
+
+RESULTS_PER_PAGE = 10
+COMPANIES = ["Acme Corp", "Globex", "Initech", "Umbrella", "Hooli", "Stark Industries", "Wayne Enterprises"]
+
+
+def slug(text):
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-") or "any"
+
+
+def fixture_name(title, location, start):
+    return f"{slug(title)}__{slug(location)}__{start}.html"
+
+
+class FakeJobBoard:
+    def __init__(self, per_query=25, latency_ms=0, render_delay_ms=0, fixtures_dir=None):
+        self.per_query = per_query
+        self.latency_ms = latency_ms
+        self.render_delay_ms = render_delay_ms
+        self.fixtures_dir = fixtures_dir
+        self.extra = {}  # (title, location) -> listings posted since startup, newest first
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def _listings(self, title, location):
+        """Newest first: anything posted via post(), then a deterministic set per query."""
+        base = []
+        for i in range(self.per_query):
+            jk = hashlib.sha1(f"{title}|{location}|{i}".encode()).hexdigest()[:16]
+            base.append({
+                "jk": jk,
+                "title": f"{title or 'Job'} {['I', 'II', 'III', 'Lead'][i % 4]}",
+                "company": COMPANIES[i % len(COMPANIES)],
+                "location": location or "Remote",
+                "snippet": f"Listing {i} for {title} in {location}.",
+            })
+        with self.lock:
+            return list(self.extra.get((title, location), [])) + base
+
+    def post(self, title, location, job_title=None):
+        """Add a new listing at the top of a search, shifting every page's listing set."""
+        with self.lock:
+            n = sum(len(v) for v in self.extra.values())
+            listing = {"jk": hashlib.sha1(f"new|{n}|{time.time()}".encode()).hexdigest()[:16],
+                       "title": job_title or f"{title} (new)", "company": COMPANIES[n % len(COMPANIES)],
+                       "location": location or "Remote", "snippet": "Just posted."}
+            self.extra.setdefault((title, location), []).insert(0, listing)
+            return listing
+
+    def page(self, title, location, start):
+        listings = self._listings(title, location)
+        chunk = listings[start:start + RESULTS_PER_PAGE]
+        if not chunk:
+            body = '<div class="jobsearch-NoResult-messageContainer">No jobs found.</div>'
+            return _document(title, body)
+        cards = "\n".join(_card(l) for l in chunk)
+        results = f'<div id="mosaic-provider-jobcards"><ul>\n{cards}\n</ul></div>'
+        if start + RESULTS_PER_PAGE < len(listings):
+            query = urlencode({"q": title, "l": location, "start": start + RESULTS_PER_PAGE})
+            results += f'\n<nav><a data-testid="pagination-page-next" href="/jobs?{query}">Next</a></nav>'
+        if self.render_delay_ms:
+            results = (f'<template id="results">{results}</template>\n<div id="root"></div>\n<script>'
+                       f'setTimeout(() => document.getElementById("root").appendChild('
+                       f'document.getElementById("results").content.cloneNode(true)), {self.render_delay_ms});'
+                       f'</script>')
+        return _document(title, results)
+
+    def fixture(self, title, location, start):
+        path = os.path.join(self.fixtures_dir, fixture_name(title, location, start))
+        if not os.path.exists(path):
+            return _document(title, '<div class="jobsearch-NoResult-messageContainer">No jobs found.</div>')
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def save_fixtures(self, directory, searches):
+        """Write every result page of each (title, location) search as an HTML file."""
+        os.makedirs(directory, exist_ok=True)
+        written = 0
+        for title, location in searches:
+            for start in range(0, max(1, len(self._listings(title, location))), RESULTS_PER_PAGE):
+                with open(os.path.join(directory, fixture_name(title, location, start)), "w", encoding="utf-8") as f:
+                    f.write(self.page(title, location, start))
+                written += 1
+        return written
+
+
+def _card(l):
+    e = html.escape
+    return (f'<li><div class="job_seen_beacon">'
+            f'<h2 class="jobTitle"><a class="jcs-JobTitle" href="/viewjob?jk={l["jk"]}"><span>{e(l["title"])}</span></a></h2>'
+            f'<span data-testid="company-name">{e(l["company"])}</span>'
+            f'<div data-testid="text-location">{e(l["location"])}</div>'
+            f'<div class="job-snippet">{e(l["snippet"])}</div></div></li>')
+
+
+def _document(title, body):
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{html.escape(title)} Jobs</title></head>'
+            f'<body>\n{body}\n</body></html>')
+
+
+def make_handler(board):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status, text):
+            if board.latency_ms:
+                time.sleep(board.latency_ms / 1000)
+            data = text.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            board.calls += 1
+            if url.path != "/jobs":
+                return self._send(404, _document("Not found", "<p>Not found</p>"))
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+            title, location = params.get("q", ""), params.get("l", "")
+            start = int(params.get("start", "0") or 0)
+            render = board.fixture if board.fixtures_dir else board.page
+            self._send(200, render(title, location, start))
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def serve(port=8766, per_query=25, latency_ms=0, render_delay_ms=0, fixtures_dir=None):
+    """Start the fake job board on a background thread. Returns (server, board)."""
+    board = FakeJobBoard(per_query=per_query, latency_ms=latency_ms, render_delay_ms=render_delay_ms,
+                         fixtures_dir=fixtures_dir)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(board))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, board
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Indeed search result pages.")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--per-query", type=int, default=25)
+    parser.add_argument("--latency-ms", type=int, default=0)
+    parser.add_argument("--render-delay-ms", type=int, default=0)
+    parser.add_argument("--fixtures", help="serve saved pages from this directory")
+    parser.add_argument("--save-fixtures", help="write result pages for --query searches here and exit")
+    parser.add_argument("--query", action="append", default=[], help="'title@location'; repeatable")
+    args = parser.parse_args()
+
+    if args.save_fixtures:
+        board = FakeJobBoard(per_query=args.per_query)
+        searches = [tuple(p.strip() for p in q.partition("@")[::2]) for q in args.query] or [("IT Support", "Remote")]
+        print(f"💾 Wrote {board.save_fixtures(args.save_fixtures, searches)} pages to {args.save_fixtures}")
+    else:
+        server, _ = serve(args.port, args.per_query, args.latency_ms, args.render_delay_ms, args.fixtures)
+        print(f"💼 Fake job board on http://127.0.0.1:{args.port}/jobs?q=IT+Support&l=Remote (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            server.shutdown()
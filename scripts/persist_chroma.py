@@ -1,25 +1,149 @@
 # persist_chroma.py
-import os, json
+import os, sys, json, time, argparse
 from langchain.schema import Document
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain.vectorstores import Chroma
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from embedding_service import EmbeddingService
+from conversation_store import conversation_files, format_turn, iter_records
+from ingest_pipeline import acquire_lock, chunk_ids, chunk_text, read_chat_json, sha256
+
+EMBED_MODEL = "sentence-transformers/all-mpnet-base-v2"
+COLLECTION_NAME = "langchain"  # the collection Chroma.from_documents created for earlier full rebuilds
+MANIFEST_NAME = "ingest_manifest.json"
+LOCK_NAME = "ingest.lock"
+
+
 def load_docs(logs_dir="..\\logs"):
     docs = []
     for fn in os.listdir(logs_dir):
         if fn.endswith((".json", ".md", ".txt")):
             path = os.path.join(logs_dir, fn)
             if fn.endswith(".json"):
-                msgs = json.load(open(path))
-                text = "\n".join(f"{m['role']}: {m['content']}" for m in msgs)
+                text = read_chat_json(path)
+                if not text:
+                    continue  # not a chat log
             else:
                 text = open(path, encoding="utf-8").read()
             docs.append(Document(page_content=text, metadata={"source": fn}))
+    # Structured chat turns from the dashboard's JSONL store
+    for path in conversation_files(os.path.join(logs_dir, "conversations")):
+        text = "\n".join(format_turn(record) for _, _, record in iter_records(path))
+        if text:
+            docs.append(Document(page_content=text, metadata={"source": f"conversations/{os.path.basename(path)}"}))
     return docs
 
+
+# === Manifest + lock ===
+def load_manifest(path):
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"embed_model": EMBED_MODEL, "files": {}}
+
+
+def save_manifest(path, manifest):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, path)
+
+
+# === Incremental ingestion ===
+def ingest(logs_dir="..\\logs", persist_dir="../chroma_db", full=False, chunk_size=1000, emb=None):
+    """Embed only new or changed chunks and drop vectors for deleted files or chunks."""
+    os.makedirs(persist_dir, exist_ok=True)
+    lock_path = os.path.join(persist_dir, LOCK_NAME)
+    if not acquire_lock(lock_path):
+        print("⏳ Another ingestion run is in progress; skipping.")
+        return None
+
+    try:
+        manifest_path = os.path.join(persist_dir, MANIFEST_NAME)
+        manifest = load_manifest(manifest_path)
+        if manifest.get("embed_model") != EMBED_MODEL:
+            full = True  # vectors from another model can't be mixed with new ones
+        if full:
+            manifest = {"embed_model": EMBED_MODEL, "files": {}}
+        emb = emb or EmbeddingService(EMBED_MODEL, cache_path=os.path.join(persist_dir, "embedding_cache.sqlite"))
+        vectordb = Chroma(collection_name=COLLECTION_NAME, embedding_function=emb, persist_directory=persist_dir)
+        if full:
+            existing = vectordb.get(include=[])["ids"]
+            if existing:
+                vectordb.delete(ids=existing)
+
+        stats = {"files_seen": 0, "files_changed": 0, "files_deleted": 0, "chunks_added": 0, "chunks_removed": 0}
+        current = {}
+        for doc in load_docs(logs_dir):
+            source = doc.metadata["source"]
+            current[source] = doc
+        stats["files_seen"] = len(current)
+
+        for source, doc in current.items():
+            file_hash = sha256(doc.page_content)
+            entry = manifest["files"].get(source)
+            if entry and entry["hash"] == file_hash:
+                continue
+
+            chunks = chunk_text(doc.page_content, chunk_size)
+            ids = chunk_ids(source, chunks)
+            old_ids = set(entry["chunks"]) if entry else set()
+            new = [(i, c) for i, c in zip(ids, chunks) if i not in old_ids]
+            removed = old_ids - set(ids)
+
+            if removed:
+                vectordb.delete(ids=list(removed))
+            if new:
+                vectordb.add_texts(
+                    texts=[c for _, c in new],
+                    metadatas=[{"source": source, "chunk_hash": i.split(":")[1]} for i, _ in new],
+                    ids=[i for i, _ in new],
+                )
+
+            # Save after every file so an interrupted run resumes where it stopped.
+            manifest["files"][source] = {"hash": file_hash, "chunks": ids}
+            save_manifest(manifest_path, manifest)
+            stats["files_changed"] += 1
+            stats["chunks_added"] += len(new)
+            stats["chunks_removed"] += len(removed)
+
+        for source in [s for s in manifest["files"] if s not in current]:
+            old_ids = manifest["files"].pop(source)["chunks"]
+            if old_ids:
+                vectordb.delete(ids=old_ids)
+            save_manifest(manifest_path, manifest)
+            stats["files_deleted"] += 1
+            stats["chunks_removed"] += len(old_ids)
+
+        save_manifest(manifest_path, manifest)
+        if hasattr(vectordb, "persist"):
+            vectordb.persist()
+        return stats
+    finally:
+        os.remove(lock_path)
+
+
 if __name__ == "__main__":
-    docs = load_docs()
-    emb = HuggingFaceEmbeddings(model_name="sentence-transformers/all-mpnet-base-v2")
-    vectordb = Chroma.from_documents(docs=docs, embedding_function=emb, persist_directory="../chroma_db")
-    vectordb.persist()
-    print(f"✅ Persisted {len(docs)} docs.")
+    parser = argparse.ArgumentParser(description="Incrementally embed chat logs into Chroma.")
+    parser.add_argument("--logs-dir", default="..\\logs")
+    parser.add_argument("--persist-dir", default="../chroma_db")
+    parser.add_argument("--full", action="store_true", help="drop everything and re-embed all logs")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=None, help="torch CPU threads per process")
+    parser.add_argument("--workers", type=int, default=1, help="embedding processes")
+    args = parser.parse_args()
+
+    os.makedirs(args.persist_dir, exist_ok=True)
+    emb = EmbeddingService(EMBED_MODEL, batch_size=args.batch_size, num_threads=args.threads,
+                           num_workers=args.workers,
+                           cache_path=os.path.join(args.persist_dir, "embedding_cache.sqlite"))
+    start = time.perf_counter()
+    try:
+        stats = ingest(args.logs_dir, args.persist_dir, full=args.full, emb=emb)
+    finally:
+        emb.close()
+    print(f"⚙️ {emb.report()}")
+    if stats is not None:
+        print(f"✅ {stats['files_changed']} changed / {stats['files_seen']} files, "
+              f"+{stats['chunks_added']} -{stats['chunks_removed']} chunks, "
+              f"{stats['files_deleted']} deleted files in {time.perf_counter() - start:.1f}s.")
@@ -1,7 +1,8 @@
 # test_calendar_fetch.py
 
-from calendar_utils import fetch_upcoming_events
+from calendar_utils import fetch_upcoming_events, get_client
 
+get_client().connect()  # signs in through the browser on the first run
 events = fetch_upcoming_events(5)
 print("📅 Upcoming events:")
 for e in events:
@@ -0,0 +1,45 @@
+# startup_profiler.py
+
+import importlib
+import sys
+import time
+from contextlib import contextmanager
+
+# (subsystem, phase) -> seconds. Filled the first time each subsystem is imported or
+# initialized in this process, so it shows what a cold start actually paid for.
+timings = {}
+
+
+def record(subsystem, phase, seconds):
+    timings.setdefault((subsystem, phase), seconds)
+
+
+@contextmanager
+def timed(subsystem, phase="init"):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(subsystem, phase, time.perf_counter() - start)
+
+
+def lazy_import(module_name, subsystem=None):
+    """Import a module on first use and record how long the import took."""
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    with timed(subsystem or module_name.split(".")[0], "import"):
+        return importlib.import_module(module_name)
+
+
+def report():
+    """Rows of (subsystem, import_s, init_s) sorted by total cost."""
+    rows = {}
+    for (subsystem, phase), seconds in timings.items():
+        row = rows.setdefault(subsystem, {"subsystem": subsystem, "import_s": 0.0, "init_s": 0.0})
+        key = "import_s" if phase == "import" else "init_s"
+        row[key] += seconds
+    result = sorted(rows.values(), key=lambda r: r["import_s"] + r["init_s"], reverse=True)
+    for row in result:
+        row["import_s"] = round(row["import_s"], 3)
+        row["init_s"] = round(row["init_s"], 3)
+    return result